@@ -0,0 +1,120 @@
+"""Contains an elevation source caching the elevations of another one.
+"""
+from collections import OrderedDict
+import dbm
+import threading
+import networkx as nx
+
+from backend.elevation_sources.elevation_source import ElevationSource
+from backend.elevation_sources.google_elevation_source import GoogleElevationSource
+
+
+class CachedElevationSource(ElevationSource):
+    """Elevation source answering from a cache before asking another source.
+
+    Elevations are cached under quantized coordinates, so nodes at the same
+    rounded latitude/longitude share an entry no matter which graph or request
+    they come from. The in-memory cache holds a bounded number of entries and
+    evicts the least recently used ones; it can optionally be backed by an
+    on-disk store which keeps every elevation ever fetched.
+
+    Attributes:
+        source: The ElevationSource queried for cache misses.
+        capacity: The maximum number of entries kept in memory.
+        precision: The number of decimals coordinates are rounded to.
+        disk_path: Optional; the path of the on-disk store, or None.
+        hits: The number of node lookups answered by the cache.
+        misses: The number of node lookups forwarded to the source.
+    """
+
+    def __init__(self, source, capacity=200000, precision=5, disk_path=None):
+        self.source = source
+        self.capacity = capacity
+        self.precision = precision
+        self.disk_path = disk_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._disk = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, node_data):
+        """Quantize the coordinates of a node into a cache key."""
+        scale = 10 ** self.precision
+        return (round(node_data['y'] * scale), round(node_data['x'] * scale))
+
+    def _get_disk(self):
+        """Open the on-disk store on first use, or return None if there is none."""
+        if self._disk is None and self.disk_path is not None:
+            self._disk = dbm.open(self.disk_path, 'c')
+        return self._disk
+
+    def _lookup(self, key):
+        """Look up a key in memory and then on disk, or return None."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        disk = self._get_disk()
+        if disk is not None:
+            value = disk.get(f"{key[0]},{key[1]}".encode())
+            if value is not None:
+                elevation = float(value)
+                self._insert(key, elevation)
+                return elevation
+        return None
+
+    def _insert(self, key, elevation):
+        """Insert a key in memory, evicting the least recently used if full."""
+        self._entries[key] = elevation
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def close(self):
+        """Close the on-disk store, if open. It is reopened on next use."""
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+    def add_node_elevations(self, graph):
+        missed = {}
+        with self._lock:
+            for node, data in graph.nodes(data=True):
+                key = self._key(data)
+                elevation = self._lookup(key)
+                if elevation is None:
+                    missed.setdefault(key, []).append(node)
+                else:
+                    data['elevation'] = elevation
+                    self.hits += 1
+        if len(missed) == 0:
+            return
+
+        # Only ask the source about one node per missing key
+        missed_graph = nx.MultiDiGraph()
+        for key, nodes in missed.items():
+            node_data = graph.nodes[nodes[0]]
+            missed_graph.add_node(key, x=node_data['x'], y=node_data['y'])
+        self.source.add_node_elevations(missed_graph)
+
+        with self._lock:
+            disk = self._get_disk()
+            for key, nodes in missed.items():
+                elevation = missed_graph.nodes[key]['elevation']
+                self._insert(key, elevation)
+                if disk is not None:
+                    disk[f"{key[0]},{key[1]}".encode()] = repr(elevation).encode()
+                for node in nodes:
+                    graph.nodes[node]['elevation'] = elevation
+                self.misses += len(nodes)
+
+
+# Process-wide cache in front of the Google Elevation API, shared by default
+# by every graph provider. It only keeps elevations in memory: to keep every
+# elevation across restarts, set its disk_path before the first elevations
+# are fetched
+google_elevation_cache = CachedElevationSource(GoogleElevationSource())
@@ -0,0 +1,99 @@
+"""Contains an elevation source reading local digital elevation model tiles.
+"""
+import math
+import os
+import numpy as np
+
+from backend.elevation_sources.elevation_source import ElevationSource
+
+# Value marking missing data in SRTM tiles
+SRTM_VOID = -32768
+
+
+class DemElevationSource(ElevationSource):
+    """Elevation source sampling local SRTM .hgt tiles, no network necessary.
+
+    Each tile covers one degree of latitude and longitude and is named after
+    its southwest corner (e.g. N42W073.hgt covers latitudes 42 to 43 and
+    longitudes -73 to -72). A tile is a square grid of big-endian 16-bit
+    elevations in meters, listed row by row from north to south; both the
+    1201x1201 (3 arc-second) and 3601x3601 (1 arc-second) sizes are accepted.
+    Tiles are memory-mapped on first use and kept open for later requests.
+
+    Attributes:
+        directory: The directory containing the .hgt tiles.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._tiles = {}
+
+    def _tile_name(self, lat, lng):
+        """Get the file name of the tile whose southwest corner is (lat, lng)."""
+        ns = 'N' if lat >= 0 else 'S'
+        ew = 'E' if lng >= 0 else 'W'
+        return f"{ns}{abs(lat):02d}{ew}{abs(lng):03d}.hgt"
+
+    def _get_tile(self, lat, lng):
+        """Memory-map the tile whose southwest corner is (lat, lng).
+
+        Raises:
+            FileNotFoundError: If the tile is not in the directory.
+            ValueError: If the tile is not a square grid.
+        """
+        if (lat, lng) not in self._tiles:
+            path = os.path.join(self.directory, self._tile_name(lat, lng))
+            side = math.isqrt(os.path.getsize(path) // 2)
+            if 2 * side * side != os.path.getsize(path):
+                raise ValueError(f"'{path}' is not a square grid of 16-bit samples")
+            self._tiles[(lat, lng)] = np.memmap(path, dtype='>i2', mode='r', shape=(side, side))
+        return self._tiles[(lat, lng)]
+
+    def get_elevations(self, lats, lngs):
+        """Sample elevations at many coordinates at once.
+
+        Coordinates are grouped by tile, and each group is bilinearly
+        interpolated in a single vectorized pass.
+
+        Args:
+            lats: A sequence of latitudes.
+            lngs: A sequence of longitudes, of the same length as 'lats'.
+
+        Returns:
+            An array of elevations in meters, NaN wherever the tile has no data.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        elevations = np.empty(len(lats))
+        tile_lats = np.floor(lats).astype(np.int64)
+        tile_lngs = np.floor(lngs).astype(np.int64)
+        tiles, tile_of_point = np.unique(np.stack([tile_lats, tile_lngs], axis=1), axis=0, return_inverse=True)
+        tile_of_point = tile_of_point.reshape(-1)
+        for t, (tile_lat, tile_lng) in enumerate(tiles.tolist()):
+            in_tile = tile_of_point == t
+            grid = self._get_tile(tile_lat, tile_lng)
+            last = grid.shape[0] - 1
+            # Fractional grid positions; row 0 is the northern edge of the tile
+            rows = (tile_lat + 1 - lats[in_tile]) * last
+            cols = (lngs[in_tile] - tile_lng) * last
+            r0 = np.clip(np.floor(rows).astype(np.int64), 0, last)
+            c0 = np.clip(np.floor(cols).astype(np.int64), 0, last)
+            r1 = np.minimum(r0 + 1, last)
+            c1 = np.minimum(c0 + 1, last)
+            dr = rows - r0
+            dc = cols - c0
+            corners = [grid[r0, c0], grid[r0, c1], grid[r1, c0], grid[r1, c1]]
+            corners = [np.where(c == SRTM_VOID, np.nan, c.astype(np.float64)) for c in corners]
+            top = corners[0] * (1 - dc) + corners[1] * dc
+            bottom = corners[2] * (1 - dc) + corners[3] * dc
+            elevations[in_tile] = top * (1 - dr) + bottom * dr
+        return elevations
+
+    def add_node_elevations(self, graph):
+        nodes = list(graph.nodes)
+        lats = [graph.nodes[node]['y'] for node in nodes]
+        lngs = [graph.nodes[node]['x'] for node in nodes]
+        elevations = self.get_elevations(lats, lngs)
+        # Round like osmnx does for elevations from the Google API
+        for node, elevation in zip(nodes, np.round(elevations, 3).tolist()):
+            graph.nodes[node]['elevation'] = elevation
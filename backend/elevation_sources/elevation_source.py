@@ -0,0 +1,21 @@
+from abc import ABC, abstractmethod
+
+
+class ElevationSource(ABC):
+    """Abstract class that all elevation sources must subclass.
+
+    This is the Strategy pattern 'interface' that each of the elevation source
+    strategies must implement, allowing graph providers to have a 'has-a'
+    relationship to ElevationSource instead of to a concrete elevation service.
+    """
+
+    @abstractmethod
+    def add_node_elevations(self, graph):
+        """Add elevation data into each node of a graph, in place.
+
+        Args:
+            graph: A networkx graph whose nodes carry 'x' (longitude) and
+                'y' (latitude) attributes. An 'elevation' attribute, in meters,
+                is set on every node.
+        """
+        pass
@@ -0,0 +1,15 @@
+import osmnx
+
+from backend.elevation_sources.elevation_source import ElevationSource
+
+
+class GoogleElevationSource(ElevationSource):
+    """Elevation source querying the Google Elevation API through osmnx.
+
+    The API key is read from backend/keys.py, which is only required when
+    this elevation source is actually used.
+    """
+
+    def add_node_elevations(self, graph):
+        from backend.keys import api_key
+        osmnx.elevation.add_node_elevations(graph, api_key=api_key)
@@ -0,0 +1,382 @@
+"""Contains a graph provider which stores a frozen graph in compact NumPy arrays.
+"""
+from collections.abc import Mapping
+import math
+import numpy as np
+
+from backend.graph_providers.graph_provider import GraphProvider
+from backend.graph_providers.utils.snapshot import write_snapshot, read_snapshot
+
+
+class ArrayGraphProvider(GraphProvider):
+    """Graph provider backed by a compressed sparse row (CSR) adjacency.
+
+    OSM node ids are remapped to dense integer indices, so that the outgoing
+    edges of the node with index i are stored at positions
+    offsets[i]:offsets[i + 1] of the 'targets' and 'lengths' arrays. Parallel
+    edges are resolved to the shortest one when the graph is frozen. The
+    public interface still speaks in OSM node ids, so search algorithms run
+    on this provider unchanged.
+
+    Searches read the edges of one node at a time, for which slicing the
+    arrays costs more than the few edges are worth. The first time the edges
+    of a node are asked for, the edges of every node are therefore grouped
+    into a list of (neighbor, length, gain) tuples, which each later hop
+    looks up in a dict. The lists are returned as they are, like the default
+    get_predecessor_edges does, so callers must not modify them.
+
+    Attributes:
+        start: The origin node (its OSM id), or None.
+        end: The destination node (its OSM id), or None.
+        node_ids: Array mapping dense indices to OSM node ids.
+        offsets: Array of length n + 1 delimiting each node's outgoing edges.
+        targets: Array of dense indices of the head node of each edge.
+        lengths: Array of the length of each edge, in meters.
+        x: Array of node longitudes.
+        y: Array of node latitudes.
+        z: Array of node elevations.
+        gains: Array of the elevation gained along each edge.
+        losses: Array of the elevation lost along each edge.
+        snapshot_path: The path of a snapshot holding the same graph, which
+            other processes can load, or None.
+    """
+
+    def __init__(self, node_ids, offsets, targets, lengths, x, y, z, start=None, end=None,
+                 gains=None, losses=None, sorted_ids=None, sorted_index=None):
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.z = np.asarray(z, dtype=np.float64)
+        if len(self.offsets) != len(self.node_ids) + 1:
+            raise ValueError("'offsets' must contain exactly one more entry than 'node_ids'")
+        if len(self.targets) != len(self.lengths):
+            raise ValueError("'targets' and 'lengths' must have the same length")
+        if gains is None or losses is None:
+            # Elevation changes along each edge, with unknown elevations counting as flat
+            sources = np.repeat(np.arange(len(self.node_ids)), np.diff(self.offsets))
+            diffs = self.z[self.targets] - self.z[sources]
+            gains = np.fmax(diffs, 0.)
+            losses = np.fmax(-diffs, 0.)
+        self.gains = np.asarray(gains, dtype=np.float64)
+        self.losses = np.asarray(losses, dtype=np.float64)
+        if len(self.gains) != len(self.targets) or len(self.losses) != len(self.targets):
+            raise ValueError("'gains' and 'losses' must have one entry per edge")
+        if sorted_ids is None or sorted_index is None:
+            # Map OSM ids back to dense indices
+            self._index = {node: i for i, node in enumerate(self.node_ids.tolist())}
+        else:
+            self._index = _SortedIndex(self.node_ids, sorted_ids, sorted_index)
+        # Outgoing and incoming edges of each node, built on first use
+        self._adjacency = None
+        self._reverse = None
+        self.start = start
+        self.end = end
+        self.snapshot_path = None
+
+    @classmethod
+    def from_graph(cls, graph, start=None, end=None):
+        """Freeze a networkx graph (as built by osmnx) into arrays.
+
+        Args:
+            graph: A networkx MultiDiGraph whose nodes carry 'x', 'y' and
+                'elevation' attributes and whose edges carry 'length'.
+            start: Optional; the origin node (its OSM id).
+            end: Optional; the destination node (its OSM id).
+
+        Returns:
+            An ArrayGraphProvider describing the same graph.
+        """
+        index = {node: i for i, node in enumerate(graph.nodes)}
+        n = len(index)
+        node_ids = np.fromiter(index.keys(), dtype=np.int64, count=n)
+        x = np.empty(n)
+        y = np.empty(n)
+        z = np.empty(n)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        targets = []
+        lengths = []
+        for node, i in index.items():
+            node_data = graph.nodes[node]
+            x[i] = node_data['x']
+            y[i] = node_data['y']
+            z[i] = node_data.get('elevation', math.nan)
+            # Keep only the shortest of any parallel edges
+            for neighbor, edges in graph.adj[node].items():
+                targets.append(index[neighbor])
+                lengths.append(min(data['length'] for data in edges.values()))
+            offsets[i + 1] = len(targets)
+        return cls(node_ids, offsets, targets, lengths, x, y, z, start=start, end=end)
+
+    @classmethod
+    def from_provider(cls, graph_provider):
+        """Freeze the graph currently held by another provider into arrays.
+
+        Lazy loading is disabled while the graph is traversed, so only what
+        the provider has already loaded is frozen.
+
+        Args:
+            graph_provider: Any GraphProvider, such as a BoundedGraphProvider
+                or a LoadingGraphProvider.
+
+        Returns:
+            An ArrayGraphProvider describing the same graph, with the same
+            start and end nodes.
+        """
+        lazy_loading_enabled = getattr(graph_provider, 'lazy_loading_enabled', None)
+        graph_provider.lazy_loading_enabled = False
+        try:
+            index = {node: i for i, node in enumerate(graph_provider.get_all_nodes())}
+            n = len(index)
+            node_ids = np.fromiter(index.keys(), dtype=np.int64, count=n)
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            targets = []
+            lengths = []
+            x, y, z = graph_provider.get_xyz(list(index))
+            for node, i in index.items():
+                for neighbor in graph_provider.get_neighbors(node):
+                    # Neighbors outside the frozen node set cannot be expanded
+                    if neighbor in index:
+                        targets.append(index[neighbor])
+                        lengths.append(graph_provider.get_edge_distance(node, neighbor))
+                offsets[i + 1] = len(targets)
+        finally:
+            if lazy_loading_enabled is None:
+                del graph_provider.lazy_loading_enabled
+            else:
+                graph_provider.lazy_loading_enabled = lazy_loading_enabled
+        array_provider = cls(node_ids, offsets, targets, lengths, x, y, z,
+                             start=getattr(graph_provider, 'start', None),
+                             end=getattr(graph_provider, 'end', None))
+        array_provider.geographic = graph_provider.geographic
+        return array_provider
+
+    @classmethod
+    def from_snapshot(cls, path, start=None, end=None, verify=True):
+        """Start from a snapshot written by save_snapshot, without parsing it.
+
+        The arrays are memory-mapped from the file, so worker processes
+        loading the same snapshot share its pages. Nothing is computed per
+        node or edge either: elevation changes are read from the snapshot,
+        and node ids are looked up in its sorted array of ids instead of a
+        dict. Only the edges searches read are grouped per node, when the
+        first search needs them.
+
+        Args:
+            path: The path of the snapshot file.
+            start: Optional; the origin node (its OSM id).
+            end: Optional; the destination node (its OSM id).
+            verify: If True, check the snapshot against its checksum.
+
+        Returns:
+            An ArrayGraphProvider backed by the snapshot.
+
+        Raises:
+            ValueError: If the file is not a valid snapshot.
+        """
+        arrays = read_snapshot(path, verify=verify)
+        graph_provider = cls(arrays['node_ids'], arrays['offsets'], arrays['targets'], arrays['lengths'],
+                             arrays['x'], arrays['y'], arrays['z'], start=start, end=end,
+                             gains=arrays['gains'], losses=arrays['losses'],
+                             sorted_ids=arrays['sorted_ids'], sorted_index=arrays['sorted_index'])
+        graph_provider.snapshot_path = path
+        return graph_provider
+
+    def save_snapshot(self, path):
+        """Write the graph arrays to a versioned, checksummed binary snapshot.
+
+        Args:
+            path: The path of the snapshot file.
+        """
+        order = np.argsort(self.node_ids, kind='stable')
+        write_snapshot(path, {
+            'node_ids': self.node_ids,
+            'offsets': self.offsets,
+            'targets': self.targets,
+            'lengths': self.lengths,
+            'x': self.x,
+            'y': self.y,
+            'z': self.z,
+            'gains': self.gains,
+            'losses': self.losses,
+            'sorted_ids': self.node_ids[order],
+            'sorted_index': order
+        })
+        self.snapshot_path = path
+
+    @property
+    def nbytes(self):
+        """The number of bytes held by the graph arrays.
+
+        This does not count the dicts built from the arrays for lookups,
+        which hold Python objects and are typically several times larger.
+        """
+        arrays = [self.node_ids, self.offsets, self.targets, self.lengths, self.gains, self.losses,
+                  self.x, self.y, self.z]
+        return sum(array.nbytes for array in arrays)
+
+    def get_all_nodes(self):
+        return self._index.keys()
+
+    def find_nodes_near(self, points):
+        """Snap many coordinates to their nearest nodes at once.
+
+        Args:
+            points: A sequence of (latitude, longitude) tuples.
+
+        Returns:
+            A list containing the id of the nearest node to each point.
+        """
+        nearest = []
+        for lat, lng in points:
+            i = int(np.argmin(np.hypot(self.x - lng, self.y - lat)))
+            nearest.append(self.node_ids[i].item())
+        return nearest
+
+    def _group_edges(self, offsets, ends, lengths, gains):
+        """Group the edges of a CSR adjacency into a tuple per node.
+
+        Args:
+            offsets: Array of length n + 1 delimiting each node's edges.
+            ends: Array of dense indices of the other end of each edge.
+            lengths: Array of the length of each edge.
+            gains: Array of the elevation gained along each edge.
+
+        Returns:
+            A dict mapping each OSM id to a list of (neighbor, length, gain)
+            tuples.
+        """
+        ends = self.node_ids[ends].tolist()
+        lengths = lengths.tolist()
+        gains = gains.tolist()
+        offsets = offsets.tolist()
+        return {
+            node: list(zip(ends[begin:end], lengths[begin:end], gains[begin:end]))
+            for node, begin, end in zip(self.node_ids.tolist(), offsets[:-1], offsets[1:])
+        }
+
+    def _forward_adjacency(self):
+        """Get the outgoing edges of each node, grouping them the first time."""
+        if self._adjacency is None:
+            self._adjacency = self._group_edges(self.offsets, self.targets, self.lengths, self.gains)
+        return self._adjacency
+
+    def _reverse_adjacency(self):
+        """Get the incoming edges of each node, grouping them the first time."""
+        if self._reverse is None:
+            n = len(self.node_ids)
+            sources = np.repeat(np.arange(n), np.diff(self.offsets))
+            # Sort the edges by head node, keeping each node's incoming edges in order
+            order = np.argsort(self.targets, kind='stable')
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(np.bincount(self.targets, minlength=n))
+            self._reverse = self._group_edges(offsets, sources[order], self.lengths[order], self.gains[order])
+        return self._reverse
+
+    def get_neighbors(self, node):
+        return [neighbor for neighbor, _, _ in self._forward_adjacency()[node]]
+
+    def get_neighbor_edges(self, node):
+        adjacency = self._adjacency
+        if adjacency is None:
+            adjacency = self._forward_adjacency()
+        return adjacency[node]
+
+    def get_predecessor_edges(self, node):
+        return self._reverse_adjacency()[node]
+
+    def get_distance_estimate(self, n1, n2):
+        """Estimate the distance between any two nodes, no edge necessary.
+
+        This is useful as a heuristic. Using simple trigonometry, it
+        calculates the distance as the crow flies.
+
+        Args:
+            n1: The first node (its integer id).
+            n2: The second node (its integer id).
+
+        Returns:
+            The estimated distance between the nodes expressed as a number.
+        """
+        i = self._index[n1]
+        j = self._index[n2]
+        # d = sqrt((x - x')^2 + (y - y')^2 + (z - z')^2)
+        return math.sqrt(
+            (self.x[i] - self.x[j]) ** 2 +
+            (self.y[i] - self.y[j]) ** 2 +
+            (self.z[i] - self.z[j]) ** 2
+        )
+
+    def _find_edge(self, n1, n2):
+        """Find the edge from n1 to n2 among the outgoing edges of n1.
+
+        Returns:
+            The position of the edge among the outgoing edges of n1, and its
+            (neighbor, length, gain) tuple.
+
+        Raises:
+            KeyError: If there is no edge from n1 to n2.
+        """
+        for k, edge in enumerate(self._forward_adjacency()[n1]):
+            if edge[0] == n2:
+                return k, edge
+        raise KeyError(f"There is no edge from {n1} to {n2}")
+
+    # Parallel edges were already resolved to the shortest one
+    def get_edge_distance(self, n1, n2):
+        return self._find_edge(n1, n2)[1][1]
+
+    def get_edge_gain(self, n1, n2):
+        return self._find_edge(n1, n2)[1][2]
+
+    def get_edge_loss(self, n1, n2):
+        k, _ = self._find_edge(n1, n2)
+        return float(self.losses[self.offsets[self._index[n1]] + k])
+
+    # Get x, y, and z coordinates from a node id
+    def get_coords(self, node):
+        i = self._index[node]
+        return {
+            'x': float(self.x[i]),
+            'y': float(self.y[i]),
+            'z': float(self.z[i])
+        }
+
+    def get_elevation(self, node):
+        return float(self.z[self._index[node]])
+
+    def get_position(self, node):
+        i = self._index[node]
+        return float(self.x[i]), float(self.y[i])
+
+    def get_xyz(self, nodes):
+        indices = np.fromiter((self._index[node] for node in nodes), dtype=np.int64)
+        return self.x[indices], self.y[indices], self.z[indices]
+
+
+class _SortedIndex(Mapping):
+    """Read-only map of OSM ids to dense indices, searching a sorted array of the ids.
+
+    Unlike a dict, it takes no time to build, and no memory of its own when
+    the arrays are memory-mapped from a snapshot. It iterates over the ids
+    in the order of their dense indices, like the dict it replaces.
+    """
+
+    def __init__(self, node_ids, sorted_ids, sorted_index):
+        self._node_ids = node_ids
+        self._sorted_ids = sorted_ids
+        self._sorted_index = sorted_index
+
+    def __getitem__(self, node):
+        k = int(np.searchsorted(self._sorted_ids, node))
+        if k == len(self._sorted_ids) or self._sorted_ids[k] != node:
+            raise KeyError(node)
+        return int(self._sorted_index[k])
+
+    def __iter__(self):
+        return iter(self._node_ids.tolist())
+
+    def __len__(self):
+        return len(self._node_ids)
@@ -1,8 +1,16 @@
 import osmnx
 import math
+import numpy as np
 
 from backend.graph_providers.graph_provider import GraphProvider
-from backend.keys import api_key
+from backend.graph_providers.utils.spatial_index import GridSpatialIndex
+from backend.graph_providers.utils.region_cache import RegionCache
+from backend.elevation_sources.cached_elevation_source import google_elevation_cache
+
+# Maximum number of downloaded regions kept for reuse by later requests
+REGION_CACHE_SIZE = 8
+
+region_cache = RegionCache(REGION_CACHE_SIZE)
 
 
 class BoundedGraphProvider(GraphProvider):
@@ -11,10 +19,14 @@ class BoundedGraphProvider(GraphProvider):
     Attributes:
         start: The origin node.
         end: The destination node.
-        graph: The constructed bounding-box graph.
+        graph: The constructed bounding-box graph, possibly a read-only view of a cached region.
+        elevation_source: The ElevationSource used to add elevations to the graph.
     """
 
-    def __init__(self, start, end):
+    geographic = True
+
+    def __init__(self, start, end, elevation_source=None):
+        self.elevation_source = elevation_source if elevation_source is not None else google_elevation_cache
         # Get the bounding box of start/end points
         n = max(start[0], end[0])
         s = min(start[0], end[0])
@@ -22,16 +34,51 @@ class BoundedGraphProvider(GraphProvider):
         w = min(start[1], end[1])
         # Compute a reasonable margin to load around the bounding box
         longer_diff = max([abs(e - w), abs(n - s)])
-        # Load the map inside the bounding box coordinates into a networkx MultiDiGraph
-        self.graph = osmnx.graph.graph_from_bbox(n + longer_diff, s - longer_diff, e + longer_diff, w - longer_diff, simplify=False, network_type='walk')
-        # Add elevation data into each node
-        osmnx.elevation.add_node_elevations(self.graph, api_key=api_key)
+        bbox = (n + longer_diff, s - longer_diff, e + longer_diff, w - longer_diff)
+        region = self._find_region(bbox)
+        # Restrict the region to the bounding box, which is free if they are the same
+        self.graph = region.subgraph(bbox)
+        # Resolve parallel edges once, keeping the shortest, with their elevation changes
+        self._edge_lengths = region.edge_table.lengths
+        self._edge_gains = region.edge_table.gains
+        self._edge_losses = region.edge_table.losses
+        # Index the nodes so that coordinates can be snapped to them quickly
+        self._spatial_index = GridSpatialIndex()
+        self._spatial_index.insert_graph(self.graph)
         # Find the ids of the nodes in the graph closest to the start and end coordinates
-        self.start = self._find_node_near(start)
-        self.end = self._find_node_near(end)
+        self.start, self.end = self.find_nodes_near([start, end])
+
+    def _find_region(self, bbox):
+        """Get a region covering a bounding box, downloading it if no cached region does.
+
+        Args:
+            bbox: The (north, south, east, west) bounding box to cover.
+
+        Returns:
+            A Region containing the bounding box.
+        """
+        region = region_cache.find(bbox, self.elevation_source)
+        if region is None:
+            # Load the map inside the bounding box coordinates into a networkx MultiDiGraph
+            graph = osmnx.graph.graph_from_bbox(*bbox, simplify=False, network_type='walk')
+            # Add elevation data into each node
+            self.elevation_source.add_node_elevations(graph)
+            region = region_cache.add(bbox, graph, self.elevation_source)
+        return region
 
     def _find_node_near(self, node):
-        return osmnx.distance.get_nearest_node(self.graph, node, method='euclidean')
+        return self._spatial_index.nearest(node)
+
+    def find_nodes_near(self, points):
+        """Snap many coordinates to their nearest nodes at once.
+
+        Args:
+            points: A sequence of (latitude, longitude) tuples.
+
+        Returns:
+            A list containing the id of the nearest node to each point.
+        """
+        return self._spatial_index.nearest_many(points)
 
     def get_all_nodes(self):
         return self.graph.nodes
@@ -39,6 +86,17 @@ class BoundedGraphProvider(GraphProvider):
     def get_neighbors(self, node):
         return self.graph.neighbors(node)
 
+    # The edge table covers the whole region, so follow the (possibly restricted) graph
+    def get_neighbor_edges(self, node):
+        lengths = self._edge_lengths[node]
+        gains = self._edge_gains[node]
+        return [(neighbor, lengths[neighbor], gains[neighbor]) for neighbor in self.graph.neighbors(node)]
+
+    def get_predecessor_edges(self, node):
+        lengths = self._edge_lengths
+        gains = self._edge_gains
+        return [(pred, lengths[pred][node], gains[pred][node]) for pred in self.graph.predecessors(node)]
+
     # Compute Euclidian distance between two nodes
     def get_distance_estimate(self, n1, n2):
         """Estimate the distance between any two nodes, no edge necessary.
@@ -62,9 +120,15 @@ class BoundedGraphProvider(GraphProvider):
             (p1['z'] - p2['z']) ** 2
         )
 
-    # Compute actual distance between two adjacent nodes
+    # Compute actual distance between two adjacent nodes, using the shortest parallel edge
     def get_edge_distance(self, n1, n2):
-        return self.graph.get_edge_data(n1, n2)[0]['length']
+        return self._edge_lengths[n1][n2]
+
+    def get_edge_gain(self, n1, n2):
+        return self._edge_gains[n1][n2]
+
+    def get_edge_loss(self, n1, n2):
+        return self._edge_losses[n1][n2]
 
     # Get x, y, and z coordinates from a node id
     def get_coords(self, node):
@@ -74,3 +138,17 @@ class BoundedGraphProvider(GraphProvider):
             'y': node_data['y'],
             'z': node_data['elevation']
         }
+
+    def get_elevation(self, node):
+        return self.graph.nodes[node]['elevation']
+
+    def get_position(self, node):
+        node_data = self.graph.nodes[node]
+        return node_data['x'], node_data['y']
+
+    def get_xyz(self, nodes):
+        node_data = [self.graph.nodes[node] for node in nodes]
+        x = np.fromiter((data['x'] for data in node_data), dtype=np.float64, count=len(node_data))
+        y = np.fromiter((data['y'] for data in node_data), dtype=np.float64, count=len(node_data))
+        z = np.fromiter((data['elevation'] for data in node_data), dtype=np.float64, count=len(node_data))
+        return x, y, z
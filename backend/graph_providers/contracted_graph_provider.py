@@ -0,0 +1,259 @@
+import math
+
+from backend.graph_providers.graph_provider import GraphProvider
+
+
+class ContractedGraphProvider(GraphProvider):
+    """Graph provider wrapping another one, with chains of degree-2 nodes contracted.
+
+    Graphs loaded with simplify=False split every footpath into many nodes
+    joined in a chain. A node whose only neighbors are the previous and next
+    nodes of such a chain is removed, and the chain is replaced by a single
+    edge carrying its total length. Chains are split wherever elevation
+    turns from rising to falling or back, so that elevation is monotonic
+    along every contracted edge: the elevation gain between its ends, as
+    search algorithms compute it, is then exactly the gain along the chain.
+    The removed nodes can be recovered with expand_path.
+
+    The wrapped provider's graph is contracted once, when this provider is
+    built, so it should not grow afterwards (lazy loading is disabled while
+    it is read).
+
+    Attributes:
+        graph_provider: The wrapped GraphProvider.
+        start: The origin node, which is never contracted.
+        end: The destination node, which is never contracted.
+    """
+
+    def __init__(self, graph_provider, keep=()):
+        """Contract the graph of another provider.
+
+        Args:
+            graph_provider: The GraphProvider whose graph is contracted.
+            keep: Optional; nodes which must not be contracted, in addition
+                to the start and end nodes of the wrapped provider.
+        """
+        self.graph_provider = graph_provider
+        # Contracted edges are at least as long as the chains they replace
+        self.geographic = graph_provider.geographic
+        self.start = getattr(graph_provider, 'start', None)
+        self.end = getattr(graph_provider, 'end', None)
+        keep = set(keep).union([self.start, self.end])
+
+        lazy_loading_enabled = getattr(graph_provider, 'lazy_loading_enabled', None)
+        graph_provider.lazy_loading_enabled = False
+        try:
+            self._contract(keep)
+        finally:
+            if lazy_loading_enabled is None:
+                del graph_provider.lazy_loading_enabled
+            else:
+                graph_provider.lazy_loading_enabled = lazy_loading_enabled
+
+    def _is_chain_node(self, node, successors, predecessors):
+        """Check whether a node is in the middle of a two-way or one-way chain."""
+        succ = successors[node]
+        pred = predecessors[node]
+        if succ == pred and len(succ) == 2:
+            return True
+        return len(succ) == 1 and len(pred) == 1 and succ != pred
+
+    def _split_monotonic(self, chain, elevations):
+        """Find the nodes inside a chain where elevation turns from rising to falling or back.
+
+        Args:
+            chain: A list of nodes, starting and ending with a node which is
+                not contracted.
+            elevations: A dict mapping nodes to their elevation.
+
+        Returns:
+            The set of interior nodes to keep so that elevation is monotonic
+            between consecutive kept nodes.
+        """
+        turning = set()
+        direction = 0
+        for a, b in zip(chain[:-1], chain[1:]):
+            diff = elevations[b] - elevations[a]
+            sign = (diff > 0) - (diff < 0)
+            if sign == 0:
+                continue
+            if direction != 0 and sign != direction:
+                turning.add(a)
+            direction = sign
+        return turning
+
+    def _contract(self, keep):
+        """Build the contracted adjacency from the wrapped provider."""
+        provider = self.graph_provider
+        nodes = list(provider.get_all_nodes())
+        elevations = dict(zip(nodes, provider.get_xyz(nodes)[2].tolist()))
+        # Neighbors outside the node set cannot be expanded
+        successors = {
+            node: [n for n in dict.fromkeys(provider.get_neighbors(node)) if n in elevations]
+            for node in nodes
+        }
+        predecessors = {node: set() for node in nodes}
+        for node, neighbors in successors.items():
+            for neighbor in neighbors:
+                predecessors[neighbor].add(node)
+        successor_sets = {node: set(neighbors) for node, neighbors in successors.items()}
+
+        def walk(u, v, contractible):
+            """Follow a chain from u through v until a node which is not contracted."""
+            chain = [u]
+            prev = u
+            while v in contractible:
+                chain.append(v)
+                (next_node,) = successor_sets[v] - {prev}
+                prev, v = v, next_node
+            chain.append(v)
+            return chain
+
+        # Chains of nodes with a known elevation, not counting their ends
+        contractible = {
+            node for node in nodes
+            if node not in keep and not math.isnan(elevations[node])
+            and self._is_chain_node(node, successor_sets, predecessors)
+        }
+        # Keep the nodes where elevation changes direction along a chain
+        seen = set()
+        for u in nodes:
+            if u in contractible:
+                continue
+            for v in successors[u]:
+                if v in contractible and v not in seen:
+                    chain = walk(u, v, contractible)
+                    seen.update(chain[1:-1])
+                    contractible -= self._split_monotonic(chain, elevations)
+
+        while True:
+            # Map u -> v -> (length, gain, loss, interior nodes) of the shortest edge
+            edges = {}
+            visited = set()
+            for u in nodes:
+                if u in contractible:
+                    continue
+                edges[u] = {}
+                for v in successors[u]:
+                    chain = walk(u, v, contractible)
+                    interior = chain[1:-1]
+                    visited.update(interior)
+                    v = chain[-1]
+                    # A chain leading back to where it started is useless
+                    if v == u:
+                        continue
+                    length = sum(provider.get_edge_distance(a, b) for a, b in zip(chain[:-1], chain[1:]))
+                    if v not in edges[u] or length < edges[u][v][0]:
+                        diffs = [elevations[b] - elevations[a] for a, b in zip(chain[:-1], chain[1:])]
+                        gain = sum(max(0., diff) for diff in diffs)
+                        loss = sum(max(0., -diff) for diff in diffs)
+                        edges[u][v] = (length, gain, loss, interior)
+            # Cycles made only of contractible nodes are never reached from a
+            # kept node: keep them as they are
+            unreached = contractible - visited
+            if len(unreached) == 0:
+                break
+            contractible -= unreached
+
+        self._edges = edges
+        self._contracted = contractible
+        # Map v -> u -> edge from u to v, for searches going backward
+        self._reverse_edges = {v: {} for v in edges}
+        for u, row in edges.items():
+            for v, edge in row.items():
+                self._reverse_edges[v][u] = edge
+
+    @property
+    def num_contracted(self):
+        """The number of nodes removed by the contraction."""
+        return len(self._contracted)
+
+    def get_all_nodes(self):
+        return self._edges.keys()
+
+    def get_neighbors(self, node):
+        return list(self._edges[node])
+
+    def get_neighbor_edges(self, node):
+        return [(neighbor, edge[0], edge[1]) for neighbor, edge in self._edges[node].items()]
+
+    def get_predecessor_edges(self, node):
+        return [(pred, edge[0], edge[1]) for pred, edge in self._reverse_edges[node].items()]
+
+    # Contracted edges carry the total length of their chain
+    def get_edge_distance(self, n1, n2):
+        return self._edges[n1][n2][0]
+
+    def get_edge_gain(self, n1, n2):
+        """Get the elevation gain along the edge from n1 to n2, following its chain.
+
+        Args:
+            n1: The first node (its integer id).
+            n2: The second node (its integer id).
+
+        Returns:
+            The sum of the positive elevation differences along the chain.
+        """
+        return self._edges[n1][n2][1]
+
+    def get_edge_loss(self, n1, n2):
+        """Get the elevation loss along the edge from n1 to n2, following its chain.
+
+        Args:
+            n1: The first node (its integer id).
+            n2: The second node (its integer id).
+
+        Returns:
+            The sum of the negated negative elevation differences along the chain.
+        """
+        return self._edges[n1][n2][2]
+
+    def get_coords(self, node):
+        return self.graph_provider.get_coords(node)
+
+    def get_elevation(self, node):
+        return self.graph_provider.get_elevation(node)
+
+    def get_position(self, node):
+        return self.graph_provider.get_position(node)
+
+    def get_xyz(self, nodes):
+        return self.graph_provider.get_xyz(nodes)
+
+    def get_distance_estimate(self, n1, n2):
+        """Estimate the distance between any two nodes, no edge necessary.
+
+        Args:
+            n1: The first node (its integer id).
+            n2: The second node (its integer id).
+
+        Returns:
+            The estimated distance between the nodes expressed as a number.
+        """
+        p1 = self.get_coords(n1)
+        p2 = self.get_coords(n2)
+        return math.sqrt(
+            (p1['x'] - p2['x']) ** 2 +
+            (p1['y'] - p2['y']) ** 2 +
+            (p1['z'] - p2['z']) ** 2
+        )
+
+    def expand_path(self, path):
+        """Restore the nodes removed from a path by the contraction.
+
+        Args:
+            path: A list of node ids of the contracted graph.
+
+        Returns:
+            The same path as a list of node ids of the wrapped provider.
+        """
+        if len(path) == 0:
+            return []
+        expanded = [path[0]]
+        for u, v in zip(path[:-1], path[1:]):
+            expanded.extend(self._edges[u][v][3])
+            expanded.append(v)
+        return expanded
+
+    def release(self):
+        self.graph_provider.release()
@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import numpy as np
 
 
 class GraphProvider(ABC):
@@ -7,8 +9,16 @@ class GraphProvider(ABC):
     This is the Strategy pattern 'interface' that each of the graph provider
     strategies must implement, allowing PathFinder to have a 'has-a' relationship
     to GraphProvider instead of to concrete graph provider classes.
+
+    Attributes:
+        geographic: Whether node positions are longitudes and latitudes and
+            edges are streets measured in meters, as in the graphs osmnx
+            builds, so that no edge is shorter than the great-circle
+            distance between its ends.
     """
 
+    geographic = False
+
     @abstractmethod
     def get_neighbors(self, node):
         """Get all immediate neighbors to a specified node.
@@ -54,6 +64,122 @@ class GraphProvider(ABC):
         """
         pass
 
+    def get_elevation(self, node):
+        """Get the elevation of a node, without building a dict of its coordinates.
+
+        Providers should override this with a direct lookup.
+
+        Args:
+            node: The node of interest (its integer id).
+
+        Returns:
+            The elevation of the node, as in the 'z' of get_coords.
+        """
+        return self.get_coords(node)['z']
+
+    def get_position(self, node):
+        """Get the longitude and latitude of a node.
+
+        Providers should override this with a direct lookup.
+
+        Args:
+            node: The node of interest (its integer id).
+
+        Returns:
+            An (x, y) tuple, as in the 'x' and 'y' of get_coords.
+        """
+        coords = self.get_coords(node)
+        return coords['x'], coords['y']
+
+    def get_xyz(self, nodes):
+        """Get the coordinates of many nodes at once.
+
+        Providers should override this with a vectorized lookup.
+
+        Args:
+            nodes: A sequence of node ids.
+
+        Returns:
+            A tuple of three float arrays holding the 'x', 'y' and 'z'
+            coordinates of the nodes, in order.
+        """
+        coords = [self.get_coords(node) for node in nodes]
+        x = np.array([c['x'] for c in coords], dtype=np.float64)
+        y = np.array([c['y'] for c in coords], dtype=np.float64)
+        z = np.array([c['z'] for c in coords], dtype=np.float64)
+        return x, y, z
+
+    def get_neighbor_edges(self, node):
+        """Get the neighbors of a node together with the edges leading to them.
+
+        Searches call this in their inner loop, so providers should override
+        it to read all three values from their edge storage at once.
+
+        Args:
+            node: The node whose outgoing edges we want (its integer id).
+
+        Returns:
+            A list of (neighbor, length, gain) tuples, one per neighbor, as
+            get_neighbors, get_edge_distance and get_edge_gain would give.
+        """
+        return [
+            (neighbor, self.get_edge_distance(node, neighbor), self.get_edge_gain(node, neighbor))
+            for neighbor in self.get_neighbors(node)
+        ]
+
+    def get_predecessor_edges(self, node):
+        """Get the nodes with an edge to a node together with those edges.
+
+        Backward searches need this. The default inverts the whole graph the
+        first time it is called, so it assumes that the graph does not change
+        afterwards: providers should override it to follow incoming edges
+        directly.
+
+        Args:
+            node: The node whose incoming edges we want (its integer id).
+
+        Returns:
+            A list of (predecessor, length, gain) tuples, one per node with an
+            edge to 'node', where length and gain are those of the edge from
+            the predecessor to 'node'.
+        """
+        predecessor_edges = getattr(self, '_predecessor_edges', None)
+        if predecessor_edges is None:
+            predecessor_edges = {}
+            for u in self.get_all_nodes():
+                for v, length, gain in self.get_neighbor_edges(u):
+                    predecessor_edges.setdefault(v, []).append((u, length, gain))
+            self._predecessor_edges = predecessor_edges
+        return predecessor_edges.get(node, [])
+
+    def get_edge_gain(self, n1, n2):
+        """Get the elevation gained going along the edge from n1 to n2.
+
+        Providers should override this with a value computed once per edge.
+
+        Args:
+            n1: The first node (its integer id).
+            n2: The second node (its integer id).
+
+        Returns:
+            The elevation gain along the edge, never negative.
+        """
+        return max(0., self.get_elevation(n2) - self.get_elevation(n1))
+
+    def get_edge_loss(self, n1, n2):
+        """Get the elevation lost going along the edge from n1 to n2.
+
+        Providers should override this with a value computed once per edge.
+
+        Args:
+            n1: The first node (its integer id).
+            n2: The second node (its integer id).
+
+        Returns:
+            The elevation loss along the edge, never negative.
+        """
+        return max(0., self.get_elevation(n1) - self.get_elevation(n2))
+
     @abstractmethod
     def get_all_nodes(self):
         """Get all nodes in the existing graph.
@@ -62,3 +188,39 @@ class GraphProvider(ABC):
             A list of every node contained in the graph.
         """
         pass
+
+    def expand_path(self, path):
+        """Translate a path found by a search into the nodes of the underlying map.
+
+        Providers whose graph leaves out some nodes of the map, such as a
+        contracted graph, restore them here. By default paths are unchanged.
+
+        Args:
+            path: A list of node ids, as found by a search on this provider.
+
+        Returns:
+            A list of node ids whose coordinates trace the whole path.
+        """
+        return path
+
+    @contextmanager
+    def static_view(self):
+        """Read the whole graph as it is, without loading or holding on to anything.
+
+        Preprocessing which walks the whole graph, such as measuring it for a
+        heuristic, reads it through this view, so that it neither grows the
+        graph nor keeps parts of it from being released. By default the
+        provider is its own view.
+
+        Yields:
+            A GraphProvider over the graph, only valid within the block.
+        """
+        yield self
+
+    def release(self):
+        """Release what the provider holds on to for the current search.
+
+        Callers should invoke this once they are done searching with the
+        provider. By default there is nothing to release.
+        """
+        pass
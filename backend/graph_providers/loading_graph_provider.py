@@ -1,20 +1,65 @@
 import osmnx
 import networkx as nx
-from collections import defaultdict
+from collections import defaultdict, Counter, OrderedDict
+from contextlib import contextmanager
 import math
+import numpy as np
+import os
+import threading
 
-from backend.keys import api_key
 from backend.graph_providers.graph_provider import GraphProvider
+from backend.elevation_sources.cached_elevation_source import google_elevation_cache
+from backend.graph_providers.utils.chunk_store import ChunkStore
+from backend.graph_providers.utils.spatial_index import GridSpatialIndex
+from backend.graph_providers.utils.chunk_loader import ChunkLoader
+from backend.graph_providers.utils.edge_table import EdgeTable
+from backend.search_algorithms.utils.landmarks import Landmarks
 
 # Side length of chunk in degrees
 CHUNK_SIZE = 0.01
 
+# Directory where downloaded chunks are persisted across restarts
+CHUNK_STORE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'chunk_store')
+
+# Number of background threads prefetching chunks around the searched area
+PREFETCH_WORKERS = 4
+
+# Maximum number of prefetched chunks held until a search asks for them
+MAX_PREFETCHED_CHUNKS = 32
+
+# Maximum number of chunks kept in memory: beyond it, the least recently used
+# chunks which no active search has pinned are evicted
+MAX_LOADED_CHUNKS = 400
+
+# Number of landmarks whose distances are kept over the loaded graph to
+# guide searches, or 0 not to keep any. Off by default: every merge and
+# eviction of a chunk then updates tables covering the whole loaded graph
+# while holding the cache lock
+NUM_LANDMARKS = 0
+
 # The keys to the loaded_chunks dict are given as integers in units of CHUNK_SIZE
 # (e.g. if CHUNK_SIZE=0.01, then the bool describing whether chunk with...
 # ...northeast corner (12deg, 12deg) would be stored in loaded_chunks[1200][1200])
+# The loaded chunks are also kept in least recently used order in 'lru', and
+# 'pins' counts how many providers currently pin each chunk
+# 'frontier' holds the nodes with an outgoing edge into a chunk which is not
+# loaded: only those can require a chunk to be loaded when expanded
+# 'edges' is the EdgeTable of the shortest edge lengths between loaded nodes,
+# and of the elevation gained and lost along them
+# 'landmarks' holds the Landmarks of the loaded graph, kept up to date as
+# chunks are merged and evicted, or None: searches read a snapshot of it
 cache = {
     'loaded_chunks': defaultdict(lambda: defaultdict(lambda: False)),
-    'graph': nx.MultiDiGraph()
+    'lru': OrderedDict(),
+    'pins': Counter(),
+    'frontier': set(),
+    'edges': EdgeTable(),
+    'landmarks': Landmarks(NUM_LANDMARKS) if NUM_LANDMARKS > 0 else None,
+    'lock': threading.RLock(),
+    'graph': nx.MultiDiGraph(),
+    'index': GridSpatialIndex(CHUNK_SIZE),
+    'store': ChunkStore(CHUNK_STORE_DIR, CHUNK_SIZE),
+    'loader': ChunkLoader(PREFETCH_WORKERS, MAX_PREFETCHED_CHUNKS)
 }
 
 class LoadingGraphProvider(GraphProvider):
@@ -24,23 +69,44 @@ class LoadingGraphProvider(GraphProvider):
         start: the id of the node closest to the origin
         end: the id of the node closest to the destination
         lazy_loading_enabled: controls whether additional chunks should be automatically loaded
+        elevation_source: the ElevationSource used to add elevations to loaded chunks
     """
 
-    def __init__(self, origin_coords, destination_coords):
+    geographic = True
+
+    def __init__(self, origin_coords, destination_coords, elevation_source=None):
+        self.elevation_source = elevation_source if elevation_source is not None else google_elevation_cache
+        # Chunks this provider uses, which must not be evicted until release()
+        self._pinned = set()
         initial_chunks = self._compute_initial_area(origin_coords, destination_coords)
         self._load_chunk(initial_chunks['x'], initial_chunks['y'], initial_chunks['w'], initial_chunks['h'])
-        self.start = osmnx.distance.get_nearest_node(cache['graph'], origin_coords, method='euclidean')
-        self.end = osmnx.distance.get_nearest_node(cache['graph'], destination_coords, method='euclidean')
+        self.start, self.end = self.find_nodes_near([origin_coords, destination_coords])
         self.lazy_loading_enabled = True
 
     def get_all_nodes(self):
         return cache['graph'].nodes
+
+    def find_nodes_near(self, points):
+        """Snap many coordinates to their nearest loaded nodes at once.
+
+        Args:
+            points: A sequence of (latitude, longitude) tuples.
+
+        Returns:
+            A list containing the id of the nearest loaded node to each point.
+        """
+        return cache['index'].nearest_many(points)
     
     def get_neighbors(self, node):
         """Lazily load necessary chunks before returning neighbors of a node
 
         If the passed node has neighbors which are outside the currently loaded portion
-        of the map, this function will load the chunks they're in.
+        of the map, this function will load the chunks they're in. Only nodes on the
+        frontier of the loaded region can have such neighbors, so the chunks of the
+        neighbors are not checked for any other node.
+
+        The chunks of the neighbors are pinned along with the chunk of the node, so
+        that the nodes a search queues are still loaded when it expands them.
 
         Args:
             node: the id of the node to get the neighbors of
@@ -49,18 +115,64 @@ class LoadingGraphProvider(GraphProvider):
             The neighbors of the passed node.
 
         """
-        neighbors = list(cache['graph'].neighbors(node))
-        if self.lazy_loading_enabled:
+        with cache['lock']:
+            neighbors = list(cache['graph'].neighbors(node))
+            # Keep the chunks this search moves through from being evicted
+            self._pin_cells_of([node])
+            self._pin_cells_of(neighbors)
+        if self.lazy_loading_enabled and node in cache['frontier']:
             # If any of the node's neighbors fall outside the loaded chunks...
             # ...then load the chunk they belong to first
             for neighbor in neighbors:
-                coords = cache['graph'].nodes[neighbor]
-                cx = math.floor(coords['x'] / CHUNK_SIZE) * CHUNK_SIZE
-                cy = math.floor(coords['y'] / CHUNK_SIZE) * CHUNK_SIZE
+                cx, cy = cache['index'].cell_of(neighbor)
                 if not self._is_chunk_loaded(cx, cy):
                     self._load_chunk(cx, cy)
+                    self._prefetch_around(cx, cy)
         return neighbors
 
+    def get_neighbor_edges(self, node):
+        """Lazily load necessary chunks before returning the edges leaving a node
+
+        Args:
+            node: the id of the node to get the outgoing edges of
+
+        Returns:
+            A list of (neighbor, length, gain) tuples, one per neighbor of the passed node.
+        """
+        self.get_neighbors(node)
+        # Read the edges only once the chunks are loaded, as merging and
+        # evicting chunks can change them
+        lengths = cache['edges'].lengths[node]
+        gains = cache['edges'].gains[node]
+        return [(neighbor, length, gains[neighbor]) for neighbor, length in lengths.items()]
+
+    def get_predecessor_edges(self, node):
+        """Lazily load necessary chunks before returning the edges entering a node
+
+        The frontier only tracks outgoing edges, so the chunks of all the
+        predecessors of the passed node are checked.
+
+        Args:
+            node: the id of the node to get the incoming edges of
+
+        Returns:
+            A list of (predecessor, length, gain) tuples, one per node with an edge to the passed node.
+        """
+        graph = cache['graph']
+        with cache['lock']:
+            preds = list(graph.predecessors(node))
+            self._pin_cells_of([node])
+            self._pin_cells_of(preds)
+        if self.lazy_loading_enabled:
+            for pred in preds:
+                cx, cy = cache['index'].cell_of(pred)
+                if not self._is_chunk_loaded(cx, cy):
+                    self._load_chunk(cx, cy)
+                    self._prefetch_around(cx, cy)
+        lengths = cache['edges'].lengths
+        gains = cache['edges'].gains
+        return [(pred, lengths[pred][node], gains[pred][node]) for pred in graph.predecessors(node)]
+
     def get_distance_estimate(self, n1, n2):
         """Estimate the distance between any two nodes, no edge necessary.
 
@@ -83,9 +195,15 @@ class LoadingGraphProvider(GraphProvider):
             (p1['z'] - p2['z']) ** 2
         )
 
-    # Compute actual distance between two adjacent nodes
+    # Compute actual distance between two adjacent nodes, using the shortest parallel edge
     def get_edge_distance(self, n1, n2):
-        return cache['graph'].get_edge_data(n1, n2)[0]['length']
+        return cache['edges'].lengths[n1][n2]
+
+    def get_edge_gain(self, n1, n2):
+        return cache['edges'].gains[n1][n2]
+
+    def get_edge_loss(self, n1, n2):
+        return cache['edges'].losses[n1][n2]
 
     # Get x, y, and z coordinates from a node id
     def get_coords(self, node):
@@ -96,66 +214,283 @@ class LoadingGraphProvider(GraphProvider):
             'z': node_data['elevation']
         }
 
-    def _load_chunk(self, x, y, w = 1, h = 1):
-        """Download the map associated with the chunk at (x, y) and merge it into cache['graph']
+    def get_elevation(self, node):
+        return cache['graph'].nodes[node]['elevation']
+
+    def get_position(self, node):
+        node_data = cache['graph'].nodes[node]
+        return node_data['x'], node_data['y']
+
+    def get_xyz(self, nodes):
+        node_data = [cache['graph'].nodes[node] for node in nodes]
+        x = np.fromiter((data['x'] for data in node_data), dtype=np.float64, count=len(node_data))
+        y = np.fromiter((data['y'] for data in node_data), dtype=np.float64, count=len(node_data))
+        z = np.fromiter((data['elevation'] for data in node_data), dtype=np.float64, count=len(node_data))
+        return x, y, z
+
+    @contextmanager
+    def static_view(self):
+        """Read the loaded graph without loading or pinning chunks.
+
+        The graph cannot change while the view is in use, so other searches
+        wait for the block to end before merging or evicting chunks.
+        """
+        with cache['lock']:
+            yield _LoadedGraphView()
+
+    def _load_chunk(self, cx, cy, w = 1, h = 1):
+        """Download the map associated with the chunk at (cx, cy) and merge it into cache['graph']
+
+        Chunks which were downloaded before are read back from the chunk store
+        instead, even across restarts of the process, and chunks which are
+        already being fetched in the background are waited for instead of
+        being fetched again.
 
         Args:
-            x: The longitude of the chunk to load
-            y: The latitude of the chunk to load
+            cx: The longitude of the chunk to load, in units of CHUNK_SIZE
+            cy: The latitude of the chunk to load, in units of CHUNK_SIZE
             w: The width (in chunks) to load
             h: The height (in chunks) to load
         """
+        # Pin the chunks first, so that they cannot be evicted once loaded
+        for i in range(w):
+            for j in range(h):
+                self._pin((cx + i, cy + j))
         # Don't do anything if the chunks are already loaded
-        if self._is_chunk_loaded(x, y, w, h):
+        if self._is_chunk_loaded(cx, cy, w, h):
             return
-        # Get the northwest corner of the chunk
-        x1 = math.floor(x / CHUNK_SIZE) * CHUNK_SIZE
-        y1 = math.floor(y / CHUNK_SIZE) * CHUNK_SIZE
-        # Get the southeast corner of the chunk
-        x2 = x1 + CHUNK_SIZE * w
-        y2 = y1 + CHUNK_SIZE * h
-        compose = nx.algorithms.operators.binary.compose
+        chunks = [(cx + i, cy + j) for i in range(w) for j in range(h) if not self._is_chunk_loaded(cx + i, cy + j)]
+        loader = cache['loader']
+        subgraphs = loader.load(chunks, self._fetch_chunks, self.elevation_source)
+        with cache['lock']:
+            # Merge the loaded chunks into the current graph
+            for subgraph in subgraphs:
+                self._merge_subgraph(subgraph)
+            # Mark all the chunks as loaded
+            for chunk in chunks:
+                self._set_chunk_loaded(*chunk)
+            # Only the nodes of the new chunks and the nodes with edges into
+            # them, which the chunks contain too, can change frontier status
+            for subgraph in subgraphs:
+                self._update_frontier(subgraph.nodes)
+            # Lower the landmark distances which the new edges shorten
+            if cache['landmarks'] is not None:
+                merged = [node for subgraph in subgraphs for node in subgraph.nodes]
+                cache['landmarks'].update(_LoadedGraphView(), merged)
+            loader.forget(chunks)
+            self._evict_chunks()
+
+    def _fetch_chunks(self, chunks, elevation_source):
+        """Get the graph covering some chunks, without merging it.
+
+        This may run on a background thread, so it must not touch cache['graph'].
+
+        Args:
+            chunks: A list of (cx, cy) integer chunk coordinates.
+            elevation_source: The ElevationSource used if the chunks have to
+                be downloaded.
+
+        Returns:
+            A networkx MultiDiGraph covering the chunks, with elevations.
+        """
+        store = cache['store']
+        if all(store.contains(cx, cy) for cx, cy in chunks):
+            # Rebuild the chunks from disk instead of downloading them again
+            return store.load_graph(chunks)
+        # Get the corners of the area covering the chunks
+        x1 = min(cx for cx, _ in chunks) * CHUNK_SIZE
+        y1 = min(cy for _, cy in chunks) * CHUNK_SIZE
+        x2 = (max(cx for cx, _ in chunks) + 1) * CHUNK_SIZE
+        y2 = (max(cy for _, cy in chunks) + 1) * CHUNK_SIZE
         # Download the chunk as a graph, including edges that cross the chunk boundary
         subgraph = osmnx.graph.graph_from_bbox(y2, y1, x2, x1, simplify=False, truncate_by_edge=True)
         # Add elevation data to the loaded chunk
-        osmnx.elevation.add_node_elevations(subgraph, api_key)
-        # Merge the loaded chunk into the current graph
-        cache['graph'] = compose(cache['graph'], subgraph)
-        # Mark all the chunks as loaded
-        for i in range(w):
-            for j in range(h):
-                self._set_chunk_loaded(x1 + CHUNK_SIZE * i, y1 + CHUNK_SIZE * j)
+        elevation_source.add_node_elevations(subgraph)
+        # Persist the chunks so they survive a restart
+        store.save_graph(subgraph, chunks)
+        return subgraph
+
+    def _prefetch_around(self, cx, cy):
+        """Start fetching the unloaded chunks adjacent to a chunk in the background.
+
+        Chunks closer to the destination are fetched first, since the search
+        is most likely to move toward it.
+
+        Args:
+            cx: The integer longitude of the chunk, in units of CHUNK_SIZE.
+            cy: The integer latitude of the chunk, in units of CHUNK_SIZE.
+        """
+        target = cache['graph'].nodes[self.end]
+        candidates = []
+        for i in [-1, 0, 1]:
+            for j in [-1, 0, 1]:
+                if self._is_chunk_loaded(cx + i, cy + j):
+                    continue
+                center_x = (cx + i + 0.5) * CHUNK_SIZE
+                center_y = (cy + j + 0.5) * CHUNK_SIZE
+                priority = math.hypot(center_x - target['x'], center_y - target['y'])
+                candidates.append((priority, (cx + i, cy + j)))
+        cache['loader'].prefetch(candidates, self._fetch_chunks, self.elevation_source)
+
+    def _merge_subgraph(self, subgraph):
+        """Merge a loaded chunk into cache['graph'] in place.
+
+        Only the nodes and edges of the chunk are added, so the cost of a
+        merge does not depend on how much of the map is already loaded.
+        Attributes of nodes and edges present in both graphs are updated
+        from the chunk, as networkx's compose would do.
+
+        Args:
+            subgraph: The graph of the loaded chunk.
+        """
+        graph = cache['graph']
+        graph.add_nodes_from(subgraph.nodes(data=True))
+        graph.add_edges_from(subgraph.edges(keys=True, data=True))
+        cache['index'].insert_graph(subgraph)
+        # The chunk holds every edge leaving its nodes which could have changed
+        cache['edges'].update(graph, subgraph.nodes)
+
+    def _update_frontier(self, nodes):
+        """Recompute whether each of the given nodes is on the frontier of the loaded region
+
+        Args:
+            nodes: An iterable of ids of nodes in cache['graph'].
+        """
+        graph = cache['graph']
+        index = cache['index']
+        frontier = cache['frontier']
+        for node in nodes:
+            if any(not self._is_chunk_loaded(*index.cell_of(n)) for n in graph.successors(node)):
+                frontier.add(node)
+            else:
+                frontier.discard(node)
 
     # Helper methods for checking whether a chunk is loaded and marking it as loaded
 
-    def _is_chunk_loaded(self, x, y, w = 1, h = 1):
+    def _is_chunk_loaded(self, cx, cy, w = 1, h = 1):
         """Check whether a given area is loaded
 
         Args:
-            x: The longitude of the chunk to check
-            y: The latitude of the chunk to check
+            cx: The longitude of the chunk to check, in units of CHUNK_SIZE
+            cy: The latitude of the chunk to check, in units of CHUNK_SIZE
             w: The width (in chunks) to check
             h: The height (in chunks) to check
 
         Returns:
             True if all the chunks in the specified area are loaded
         """
-        cx = math.floor(x / CHUNK_SIZE)
-        cy = math.floor(y / CHUNK_SIZE)
         for i in range(w):
             for j in range(h):
                 if not cache['loaded_chunks'][cx + i][cy + j]:
                     return False
         return True
 
-    def _set_chunk_loaded(self, x, y):
-        """Marks the chunk at (x, y) as loaded"""
-        cx = math.floor(x / CHUNK_SIZE)
-        cy = math.floor(y / CHUNK_SIZE)
+    def _set_chunk_loaded(self, cx, cy):
+        """Marks the chunk at (cx, cy) as loaded"""
         cache['loaded_chunks'][cx][cy] = True
+        cache['lru'][(cx, cy)] = None
+        cache['lru'].move_to_end((cx, cy))
+
+    # Helper methods for pinning chunks and evicting unpinned ones
+
+    def _pin(self, chunk):
+        """Pin a chunk so that it cannot be evicted until this provider is released"""
+        with cache['lock']:
+            if chunk not in self._pinned:
+                self._pinned.add(chunk)
+                cache['pins'][chunk] += 1
+            if chunk in cache['lru']:
+                cache['lru'].move_to_end(chunk)
+
+    def _pin_cells_of(self, nodes):
+        """Pin the chunks containing some nodes, which must be loaded"""
+        index = cache['index']
+        for node in nodes:
+            chunk = index.cell_of(node)
+            if chunk not in self._pinned:
+                self._pin(chunk)
+
+    def release(self):
+        """Unpin all the chunks pinned by this provider, allowing their eviction
+
+        The provider can still be used afterwards, pinning chunks again as it goes.
+        """
+        with cache['lock']:
+            for chunk in self._pinned:
+                cache['pins'][chunk] -= 1
+                if cache['pins'][chunk] <= 0:
+                    del cache['pins'][chunk]
+            self._pinned.clear()
+            self._evict_chunks()
+
+    def _evict_chunks(self):
+        """Evict least recently used unpinned chunks until within MAX_LOADED_CHUNKS"""
+        with cache['lock']:
+            if len(cache['lru']) <= MAX_LOADED_CHUNKS:
+                return
+            unpinned = [chunk for chunk in cache['lru'] if chunk not in cache['pins']]
+            for chunk in unpinned[:len(cache['lru']) - MAX_LOADED_CHUNKS]:
+                self._evict_chunk(chunk)
+
+    def _evict_chunk(self, chunk):
+        """Remove a chunk's nodes and edges from cache['graph'] and mark it as not loaded
+
+        Nodes of the chunk adjacent to a node in a chunk which is still loaded
+        are kept, with only their edges to loaded nodes, like the nodes just
+        across the boundary of a freshly loaded area. That way the search still
+        sees edges leaving the loaded area, and loads the chunk again if needed.
+        Nodes kept that way by earlier evictions are removed once they lose
+        their last edge.
+
+        Args:
+            chunk: The (cx, cy) integer coordinates of the chunk to evict.
+        """
+        graph = cache['graph']
+        index = cache['index']
+        del cache['lru'][chunk]
+        cache['loaded_chunks'][chunk[0]][chunk[1]] = False
+
+        def is_loaded(node):
+            cx, cy = index.cell_of(node)
+            return cache['loaded_chunks'][cx][cy]
+
+        removed = []
+        # The nodes which lose edges, and the loaded neighbors of the kept
+        # nodes, which now have an edge into an unloaded chunk, can change
+        # frontier status and edge lengths
+        changed = set()
+        # Nodes of other unloaded chunks, kept by earlier evictions, which lose edges
+        stubs = set()
+        for node in index.nodes_in_cell(chunk):
+            adjacent = set(graph.successors(node)).union(graph.predecessors(node))
+            unloaded = [n for n in adjacent if not is_loaded(n)]
+            stubs.update(unloaded)
+            if len(unloaded) == len(adjacent):
+                removed.append(node)
+                changed.update(adjacent)
+                continue
+            for n in unloaded:
+                graph.remove_edges_from([(node, n, key) for key in list(graph[node].get(n, {}))])
+                graph.remove_edges_from([(n, node, key) for key in list(graph[n].get(node, {}))])
+            changed.update(unloaded)
+            changed.add(node)
+            changed.update(graph.predecessors(node))
+        graph.remove_nodes_from(removed)
+        # Stubs left without edges lead nowhere, and must not catch endpoints
+        isolated = [n for n in stubs if n in graph and graph.degree(n) == 0]
+        graph.remove_nodes_from(isolated)
+        removed.extend(isolated)
+        index.remove(removed)
+        changed.difference_update(removed)
+        cache['frontier'].difference_update(removed)
+        self._update_frontier(changed)
+        cache['edges'].remove(removed)
+        cache['edges'].update(graph, changed)
+        if cache['landmarks'] is not None:
+            cache['landmarks'].remove(removed)
 
     def _compute_initial_area(self, start, end):
-        """Computes the initial bounding box to load"""
+        """Computes the initial bounding box to load, in units of CHUNK_SIZE"""
         n = max(start[0], end[0])
         s = min(start[0], end[0])
         e = max(start[1], end[1])
@@ -166,8 +501,43 @@ class LoadingGraphProvider(GraphProvider):
         chunk_e = math.ceil((e + longer_diff) / CHUNK_SIZE)
         chunk_w = math.floor((w - longer_diff) / CHUNK_SIZE)
         return {
-            'x': chunk_w * CHUNK_SIZE,
-            'y': chunk_s * CHUNK_SIZE,
+            'x': chunk_w,
+            'y': chunk_s,
             'w': chunk_e - chunk_w,
             'h': chunk_n - chunk_s
-        }
\ No newline at end of file
+        }
+
+
+class _LoadedGraphView(GraphProvider):
+    """Read-only view of the loaded graph, which neither loads nor pins chunks.
+
+    Preprocessing the whole loaded graph goes through this view, so that it
+    does not make every chunk look recently used.
+    """
+
+    def get_all_nodes(self):
+        return cache['graph'].nodes
+
+    def get_neighbors(self, node):
+        return list(cache['graph'].neighbors(node))
+
+    def get_edge_distance(self, n1, n2):
+        return cache['edges'].lengths[n1][n2]
+
+    def get_coords(self, node):
+        node_data = cache['graph'].nodes[node]
+        return {
+            'x': node_data['x'],
+            'y': node_data['y'],
+            'z': node_data['elevation']
+        }
+
+    def get_neighbor_edges(self, node):
+        lengths = cache['edges'].lengths[node]
+        gains = cache['edges'].gains[node]
+        return [(neighbor, length, gains[neighbor]) for neighbor, length in lengths.items()]
+
+    def get_predecessor_edges(self, node):
+        lengths = cache['edges'].lengths
+        gains = cache['edges'].gains
+        return [(pred, lengths[pred][node], gains[pred][node]) for pred in cache['graph'].predecessors(node)]
@@ -0,0 +1,54 @@
+import os
+import threading
+
+from backend.graph_providers.bounded_graph_provider import BoundedGraphProvider
+from backend.graph_providers.utils.osm_file import read_osm_graph
+from backend.graph_providers.utils.region_cache import Region
+
+# Local OpenStreetMap extract (.osm XML, or .pbf with the 'osmium' package)
+OSM_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'map.osm')
+
+# A bounding box covering the whole world
+WORLD_BBOX = (90., -90., 180., -180.)
+
+# Map (path, elevation source id) -> Region of the whole parsed extract
+extracts = {}
+extracts_lock = threading.Lock()
+
+
+class OsmFileGraphProvider(BoundedGraphProvider):
+    """Graph provider implementation reading the map from a local OpenStreetMap extract.
+
+    It works like the BoundedGraphProvider, restricting the map to the same
+    bounding box around the endpoints, but without any request to Overpass.
+    The extract is parsed once per file and elevation source, and then
+    shared by every provider as a read-only graph.
+
+    Attributes:
+        start: The origin node.
+        end: The destination node.
+        graph: A read-only view of the extract restricted to the bounding box.
+        elevation_source: The ElevationSource used to add elevations to the graph.
+        path: The path to the extract.
+    """
+
+    def __init__(self, start, end, elevation_source=None, path=OSM_FILE):
+        self.path = path
+        super().__init__(start, end, elevation_source)
+
+    def _find_region(self, bbox):
+        """Get the region of the whole extract, parsing it on first use.
+
+        Args:
+            bbox: The (north, south, east, west) bounding box to cover.
+
+        Returns:
+            A Region containing the whole extract.
+        """
+        key = (os.path.abspath(self.path), id(self.elevation_source))
+        with extracts_lock:
+            if key not in extracts:
+                graph = read_osm_graph(self.path)
+                self.elevation_source.add_node_elevations(graph)
+                extracts[key] = Region(WORLD_BBOX, graph, self.elevation_source)
+            return extracts[key]
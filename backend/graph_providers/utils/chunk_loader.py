@@ -0,0 +1,179 @@
+"""Contains a loader fetching chunks of the map in the background.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future
+import itertools
+import queue
+import threading
+
+
+class ChunkLoader:
+    """Fetches chunks on background threads, never fetching a chunk twice.
+
+    Every chunk being fetched has exactly one Future, shared by whoever asks
+    for that chunk, so that concurrent searches never download the same chunk
+    twice. Prefetch requests wait in a priority queue for a worker thread,
+    but a foreground request for a chunk which no worker has started yet
+    fetches it right away on the calling thread instead of waiting its turn.
+
+    The loader only fetches chunk graphs: merging them into the loaded graph
+    is left to the caller, so the loaded graph is never modified from a
+    background thread.
+
+    Prefetched chunks are only guesses, so at most max_prefetched of them
+    are held until a foreground request asks for them. To make room for new
+    ones, the oldest prefetched chunks which no thread is fetching are
+    dropped, whether they are still queued or were fetched for nothing.
+
+    Attributes:
+        max_workers: The number of background threads used for prefetching.
+        max_prefetched: The number of prefetched chunks held at once.
+    """
+
+    def __init__(self, max_workers=4, max_prefetched=32):
+        self.max_workers = max_workers
+        self.max_prefetched = max_prefetched
+        # Map chunk -> Future of the graph containing that chunk
+        self._futures = {}
+        # Prefetched chunks no foreground request asked for yet, oldest first
+        self._prefetched = OrderedDict()
+        # Chunks whose fetch has been started by some thread
+        self._claimed = set()
+        self._queue = queue.PriorityQueue()
+        # Tie-breaker keeping equal priorities in submission order
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def __contains__(self, chunk):
+        return chunk in self._futures
+
+    def _start_workers(self):
+        """Start the background threads on first use."""
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            _, _, chunk, fetch, args = self._queue.get()
+            with self._lock:
+                # The chunk may have been fetched in the foreground meanwhile
+                if chunk not in self._futures or chunk in self._claimed:
+                    continue
+                self._claimed.add(chunk)
+            self._run(fetch, [chunk], args)
+
+    def _run(self, fetch, chunks, args):
+        """Fetch claimed chunks and resolve their futures."""
+        futures = [self._futures[chunk] for chunk in chunks]
+        try:
+            graph = fetch(chunks, *args)
+        except BaseException as e:
+            with self._lock:
+                # Forget failed chunks so that they can be requested again
+                for chunk in chunks:
+                    self._futures.pop(chunk, None)
+                    self._claimed.discard(chunk)
+                    self._prefetched.pop(chunk, None)
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future in futures:
+            future.set_result(graph)
+
+    def _make_room(self, keep):
+        """Drop the oldest prefetched chunk which is not being fetched.
+
+        Args:
+            keep: A set of chunks not to drop.
+
+        Returns:
+            True if a chunk was dropped, False if all are being fetched.
+        """
+        for chunk in self._prefetched:
+            if chunk in keep:
+                continue
+            if chunk not in self._claimed or self._futures[chunk].done():
+                # Workers skip queued chunks which have no future anymore
+                del self._prefetched[chunk]
+                del self._futures[chunk]
+                self._claimed.discard(chunk)
+                return True
+        return False
+
+    def prefetch(self, chunks, fetch, *args):
+        """Schedule chunks to be fetched in the background.
+
+        Chunks which are already scheduled or being fetched are skipped, as
+        are the chunks of highest priority values when max_prefetched chunks
+        are being fetched.
+
+        Args:
+            chunks: An iterable of (priority, chunk) pairs, where lower
+                priorities are fetched first.
+            fetch: A function taking a list of chunks followed by 'args' and
+                returning a graph containing those chunks.
+            *args: Additional arguments passed to 'fetch'.
+        """
+        with self._lock:
+            self._start_workers()
+            scheduled = set()
+            for priority, chunk in sorted(chunks):
+                if chunk in self._futures:
+                    continue
+                if len(self._prefetched) >= self.max_prefetched and not self._make_room(scheduled):
+                    break
+                self._futures[chunk] = Future()
+                self._prefetched[chunk] = None
+                scheduled.add(chunk)
+                self._queue.put((priority, next(self._counter), chunk, fetch, args))
+
+    def load(self, chunks, fetch, *args):
+        """Fetch chunks in the foreground, reusing any fetch already started.
+
+        Chunks not yet started are fetched together with a single call to
+        'fetch' on the calling thread; chunks being fetched by another
+        thread are waited for.
+
+        Args:
+            chunks: A list of chunks.
+            fetch: A function taking a list of chunks followed by 'args' and
+                returning a graph containing those chunks.
+            *args: Additional arguments passed to 'fetch'.
+
+        Returns:
+            A list of the distinct graphs containing the chunks.
+
+        Raises:
+            Any exception raised by 'fetch' for one of the chunks.
+        """
+        own_chunks = []
+        with self._lock:
+            for chunk in chunks:
+                # The caller now owns the chunk, and will forget it once merged
+                self._prefetched.pop(chunk, None)
+                if chunk not in self._futures:
+                    self._futures[chunk] = Future()
+                if chunk not in self._claimed:
+                    self._claimed.add(chunk)
+                    own_chunks.append(chunk)
+            futures = [self._futures[chunk] for chunk in chunks]
+        if len(own_chunks) > 0:
+            self._run(fetch, own_chunks, args)
+
+        graphs = {}
+        for future in futures:
+            graph = future.result()
+            graphs[id(graph)] = graph
+        return list(graphs.values())
+
+    def forget(self, chunks):
+        """Drop fetched chunks once they have been merged by the caller."""
+        with self._lock:
+            for chunk in chunks:
+                future = self._futures.get(chunk)
+                if future is not None and future.done():
+                    del self._futures[chunk]
+                    self._claimed.discard(chunk)
@@ -0,0 +1,154 @@
+"""Contains a persistent on-disk store for the chunks of the world map.
+"""
+import math
+import os
+import shutil
+import tempfile
+import numpy as np
+import networkx as nx
+
+# Bump whenever the on-disk layout of a chunk changes
+FORMAT_VERSION = 1
+
+
+class ChunkStore:
+    """Stores downloaded chunks of the map on local disk.
+
+    Each chunk is keyed by the integer chunk coordinates used by the
+    LoadingGraphProvider, and is saved as a directory of raw .npy arrays
+    which are memory-mapped when read back:
+
+        node_ids.npy: int64 OSM ids of the nodes, shape (n,).
+        node_coords.npy: float64 x, y and elevation of the nodes, shape (n, 3).
+        edge_nodes.npy: int64 tail, head and key of the edges, shape (m, 3).
+        edge_lengths.npy: float64 length of the edges, shape (m,).
+
+    A chunk holds every edge touching a node inside it, together with both
+    endpoints of such edges, so that edges crossing a chunk boundary are kept.
+
+    Attributes:
+        directory: The directory under which chunks of this size are stored.
+        chunk_size: Side length of a chunk in degrees.
+    """
+
+    def __init__(self, directory, chunk_size):
+        self.directory = os.path.join(directory, f"v{FORMAT_VERSION}", repr(chunk_size))
+        self.chunk_size = chunk_size
+
+    def _chunk_dir(self, cx, cy):
+        return os.path.join(self.directory, f"{cx}_{cy}")
+
+    def contains(self, cx, cy):
+        """Check whether the chunk at integer coordinates (cx, cy) is stored."""
+        return os.path.isdir(self._chunk_dir(cx, cy))
+
+    def save(self, cx, cy, graph):
+        """Write a graph to disk as the chunk at integer coordinates (cx, cy).
+
+        The arrays are first written to a temporary directory which is then
+        renamed into place, so readers never observe a partially written chunk.
+
+        Args:
+            cx: The integer longitude of the chunk, in units of chunk_size.
+            cy: The integer latitude of the chunk, in units of chunk_size.
+            graph: A networkx MultiDiGraph whose nodes carry 'x', 'y' and
+                'elevation' attributes and whose edges carry 'length'.
+        """
+        node_ids = np.fromiter(graph.nodes, dtype=np.int64, count=len(graph))
+        node_coords = np.array(
+            [(data['x'], data['y'], data['elevation']) for _, data in graph.nodes(data=True)],
+            dtype=np.float64
+        ).reshape(-1, 3)
+        edges = list(graph.edges(keys=True, data='length'))
+        edge_nodes = np.array([edge[:3] for edge in edges], dtype=np.int64).reshape(-1, 3)
+        edge_lengths = np.array([edge[3] for edge in edges], dtype=np.float64)
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=self.directory)
+        try:
+            np.save(os.path.join(tmp_dir, 'node_ids.npy'), node_ids)
+            np.save(os.path.join(tmp_dir, 'node_coords.npy'), node_coords)
+            np.save(os.path.join(tmp_dir, 'edge_nodes.npy'), edge_nodes)
+            np.save(os.path.join(tmp_dir, 'edge_lengths.npy'), edge_lengths)
+            os.rename(tmp_dir, self._chunk_dir(cx, cy))
+        except OSError:
+            # Most likely another process stored the same chunk first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not self.contains(cx, cy):
+                raise
+
+    def load(self, cx, cy):
+        """Memory-map the arrays of the chunk at integer coordinates (cx, cy).
+
+        Returns:
+            A dict mapping each array name (see class docstring) to a
+            read-only memory-mapped array.
+
+        Raises:
+            FileNotFoundError: If the chunk is not stored.
+        """
+        chunk_dir = self._chunk_dir(cx, cy)
+        names = ['node_ids', 'node_coords', 'edge_nodes', 'edge_lengths']
+        return {name: np.load(os.path.join(chunk_dir, f"{name}.npy"), mmap_mode='r') for name in names}
+
+    def save_graph(self, graph, chunks):
+        """Split a graph covering several chunks and save each of them.
+
+        Nodes are assigned to the chunk containing them; nodes falling outside
+        of the given chunks (e.g. those kept by truncate_by_edge) are assigned
+        to the nearest one.
+
+        Args:
+            graph: A networkx MultiDiGraph covering the given chunks.
+            chunks: A list of (cx, cy) integer chunk coordinates.
+        """
+        min_cx = min(cx for cx, _ in chunks)
+        max_cx = max(cx for cx, _ in chunks)
+        min_cy = min(cy for _, cy in chunks)
+        max_cy = max(cy for _, cy in chunks)
+
+        def chunk_of(data):
+            cx = math.floor(data['x'] / self.chunk_size)
+            cy = math.floor(data['y'] / self.chunk_size)
+            return (min(max(cx, min_cx), max_cx), min(max(cy, min_cy), max_cy))
+
+        node_chunks = {node: chunk_of(data) for node, data in graph.nodes(data=True)}
+        chunk_nodes = {chunk: set() for chunk in chunks}
+        for node, chunk in node_chunks.items():
+            if chunk in chunk_nodes:
+                chunk_nodes[chunk].add(node)
+        for u, v in graph.edges():
+            for chunk in {node_chunks[u], node_chunks[v]}:
+                if chunk in chunk_nodes:
+                    chunk_nodes[chunk].update((u, v))
+
+        for (cx, cy), nodes in chunk_nodes.items():
+            self.save(cx, cy, graph.subgraph(nodes))
+
+    def load_graph(self, chunks):
+        """Rebuild the graph covering several stored chunks.
+
+        Args:
+            chunks: A list of (cx, cy) integer chunk coordinates, all of which
+                must be stored.
+
+        Returns:
+            A networkx MultiDiGraph in the same shape as one downloaded by osmnx,
+            with 'x', 'y' and 'elevation' on the nodes and 'length' on the edges.
+        """
+        graph = nx.MultiDiGraph()
+        for cx, cy in chunks:
+            arrays = self.load(cx, cy)
+            node_ids = arrays['node_ids'].tolist()
+            node_coords = arrays['node_coords'].tolist()
+            graph.add_nodes_from(
+                (node, {'x': x, 'y': y, 'elevation': z})
+                for node, (x, y, z) in zip(node_ids, node_coords)
+            )
+            edge_nodes = arrays['edge_nodes'].tolist()
+            edge_lengths = arrays['edge_lengths'].tolist()
+            graph.add_edges_from(
+                (u, v, key, {'length': length})
+                for (u, v, key), length in zip(edge_nodes, edge_lengths)
+            )
+        return graph
@@ -0,0 +1,95 @@
+"""Contains a table of the shortest edge lengths between adjacent nodes.
+"""
+import math
+
+
+class EdgeTable:
+    """Flat lookup of the length of the shortest edge from a node to another.
+
+    osmnx graphs are MultiDiGraphs, so two nodes may be connected by several
+    parallel edges. The table resolves them once, keeping the shortest, so
+    that looking an edge length up during a search is two dict lookups
+    instead of a walk through the graph's nested edge data. The elevation
+    gained and lost along each edge is computed at the same time, so that
+    searches do not look up the elevations of both ends of every edge.
+
+    Attributes:
+        lengths: A dict mapping each node u to a dict mapping each successor
+            v of u to the length of the shortest edge from u to v.
+        gains: A dict mapping each node u to a dict mapping each successor
+            v of u to the elevation gained going from u to v.
+        losses: A dict mapping each node u to a dict mapping each successor
+            v of u to the elevation lost going from u to v.
+    """
+
+    def __init__(self):
+        self.lengths = {}
+        self.gains = {}
+        self.losses = {}
+
+    def __len__(self):
+        return sum(len(row) for row in self.lengths.values())
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Build the table of every edge of a networkx MultiDiGraph with 'length' and 'elevation' attributes."""
+        table = cls()
+        table.update(graph, graph.nodes)
+        return table
+
+    def length(self, u, v):
+        """Get the length of the shortest edge from u to v.
+
+        Raises:
+            KeyError: If there is no edge from u to v.
+        """
+        return self.lengths[u][v]
+
+    def gain(self, u, v):
+        """Get the elevation gained going from u to v, never negative.
+
+        Raises:
+            KeyError: If there is no edge from u to v.
+        """
+        return self.gains[u][v]
+
+    def loss(self, u, v):
+        """Get the elevation lost going from u to v, never negative.
+
+        Raises:
+            KeyError: If there is no edge from u to v.
+        """
+        return self.losses[u][v]
+
+    def update(self, graph, nodes):
+        """Recompute the outgoing edges of some nodes after the graph changed.
+
+        Nodes which are no longer in the graph are removed from the table.
+
+        Args:
+            graph: The networkx MultiDiGraph the table describes.
+            nodes: An iterable of the ids of the nodes whose outgoing edges
+                may have changed.
+        """
+        adjacency = graph.adj
+        node_data = graph.nodes
+        for u in nodes:
+            if u not in adjacency:
+                self.remove([u])
+                continue
+            self.lengths[u] = {
+                v: min(data['length'] for data in edges.values())
+                for v, edges in adjacency[u].items()
+            }
+            # Nodes without elevation count as flat, as max(0., nan) is 0.
+            z_u = node_data[u].get('elevation', math.nan)
+            diffs = {v: node_data[v].get('elevation', math.nan) - z_u for v in adjacency[u]}
+            self.gains[u] = {v: max(0., diff) for v, diff in diffs.items()}
+            self.losses[u] = {v: max(0., -diff) for v, diff in diffs.items()}
+
+    def remove(self, nodes):
+        """Remove the outgoing edges of some nodes from the table."""
+        for u in nodes:
+            self.lengths.pop(u, None)
+            self.gains.pop(u, None)
+            self.losses.pop(u, None)
@@ -0,0 +1,173 @@
+"""Contains functions building the walk network from a local OpenStreetMap extract.
+"""
+import itertools
+import re
+import xml.etree.ElementTree as ET
+import networkx as nx
+import numpy as np
+import osmnx
+
+# Tag filters of osmnx's 'walk' network type: a way is walkable if it has a
+# 'highway' tag and none of these tags matches its pattern
+WALK_EXCLUDED_TAGS = {
+    'area': re.compile('yes'),
+    'access': re.compile('private'),
+    'highway': re.compile('abandoned|construction|cycleway|motor|planned|platform|proposed|raceway'),
+    'foot': re.compile('no'),
+    'service': re.compile('private'),
+}
+
+# Way tags copied onto the edges, like osmnx does with its useful_tags_way
+EDGE_TAGS = ['highway', 'name']
+
+
+def is_walkable(tags):
+    """Check whether an OSM way belongs to the walk network.
+
+    Args:
+        tags: A dict of the way's tags.
+
+    Returns:
+        True if the way passes the filter of osmnx's 'walk' network type.
+    """
+    if 'highway' not in tags:
+        return False
+    return not any(
+        key in tags and pattern.search(tags[key])
+        for key, pattern in WALK_EXCLUDED_TAGS.items()
+    )
+
+
+def _iter_xml(path, tag):
+    """Stream the elements of an .osm XML file with a given tag, freeing them as it goes."""
+    context = ET.iterparse(path, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event != 'end' or elem.tag not in ('node', 'way', 'relation'):
+            continue
+        if elem.tag == tag:
+            yield elem
+        # Drop parsed elements so that memory does not grow with the file
+        elem.clear()
+        root.clear()
+
+
+def _iter_xml_ways(path):
+    for elem in _iter_xml(path, 'way'):
+        tags = {child.get('k'): child.get('v') for child in elem.iter('tag')}
+        if is_walkable(tags):
+            refs = [int(child.get('ref')) for child in elem.iter('nd')]
+            yield int(elem.get('id')), refs, tags
+
+
+def _iter_xml_nodes(path, needed):
+    for elem in _iter_xml(path, 'node'):
+        node_id = int(elem.get('id'))
+        if node_id in needed:
+            yield node_id, float(elem.get('lat')), float(elem.get('lon'))
+
+
+def _read_pbf(path, callback_name, convert):
+    """Read the elements of a .pbf file kept by 'convert' through a pyosmium handler."""
+    try:
+        import osmium
+    except ImportError:
+        raise ImportError("Reading .pbf files requires the 'osmium' package") from None
+
+    elements = []
+
+    def callback(handler, element):
+        # Convert each element right away: pyosmium objects are only valid
+        # inside the callback
+        converted = convert(element)
+        if converted is not None:
+            elements.append(converted)
+
+    handler_cls = type('Handler', (osmium.SimpleHandler,), {callback_name: callback})
+    handler_cls().apply_file(path, locations=False)
+    return elements
+
+
+def _iter_pbf_ways(path):
+    def convert(way):
+        tags = {tag.k: tag.v for tag in way.tags}
+        if is_walkable(tags):
+            return way.id, [nd.ref for nd in way.nodes], tags
+    return _read_pbf(path, 'way', convert)
+
+
+def _iter_pbf_nodes(path, needed):
+    def convert(node):
+        if node.id in needed:
+            return node.id, node.location.lat, node.location.lon
+    return _read_pbf(path, 'node', convert)
+
+
+def read_osm_graph(path, bbox=None, retain_all=False):
+    """Build the walk network contained in a local OpenStreetMap extract.
+
+    The file is streamed twice, filtering while parsing: first the walkable
+    ways are collected, then the coordinates of their nodes only, so that
+    memory use depends on the size of the walk network rather than on the
+    size of the extract. The
+    graph has the attributes of an osmnx 'walk' graph built with
+    simplify=False: nodes carry 'x' and 'y', and every way gives an edge in
+    both directions between consecutive nodes, with its 'osmid', 'oneway',
+    'length' in meters and some of its tags.
+
+    Args:
+        path: The path to a .osm XML file, or a .pbf file if the optional
+            'osmium' package is installed.
+        bbox: An optional (north, south, east, west) bounding box outside
+            of which nodes are dropped, like osmnx.graph.graph_from_bbox.
+        retain_all: If False, keep only the largest weakly connected
+            component, like osmnx does by default.
+
+    Returns:
+        A networkx MultiDiGraph of the walk network.
+    """
+    if path.endswith('.pbf'):
+        iter_ways, iter_nodes = _iter_pbf_ways, _iter_pbf_nodes
+    else:
+        iter_ways, iter_nodes = _iter_xml_ways, _iter_xml_nodes
+
+    # First pass: the walkable ways, without consecutive duplicate nodes
+    ways = []
+    needed = set()
+    for way_id, refs, tags in iter_ways(path):
+        refs = [ref for ref, _ in itertools.groupby(refs)]
+        ways.append((way_id, refs, {tag: tags[tag] for tag in EDGE_TAGS if tag in tags}))
+        needed.update(refs)
+
+    # Second pass: the coordinates of the nodes of those ways
+    graph = nx.MultiDiGraph(crs='epsg:4326')
+    for node_id, lat, lon in iter_nodes(path, needed):
+        if bbox is not None:
+            n, s, e, w = bbox
+            if not (s <= lat <= n and w <= lon <= e):
+                continue
+        graph.add_node(node_id, y=lat, x=lon)
+
+    edges = []
+    for way_id, refs, tags in ways:
+        for u, v in zip(refs[:-1], refs[1:]):
+            if u in graph and v in graph:
+                edges.append((u, v, way_id, tags))
+    if len(edges) > 0:
+        # Compute every edge length in one vectorized call
+        nodes = graph.nodes
+        coords = np.array([
+            (nodes[u]['y'], nodes[u]['x'], nodes[v]['y'], nodes[v]['x'])
+            for u, v, _, _ in edges
+        ])
+        lengths = np.round(osmnx.distance.great_circle_vec(*coords.T), 3).tolist()
+        for (u, v, way_id, tags), length in zip(edges, lengths):
+            # Walk networks are bidirectional, even along one-way streets
+            graph.add_edge(u, v, osmid=way_id, oneway=False, length=length, **tags)
+            graph.add_edge(v, u, osmid=way_id, oneway=False, length=length, **tags)
+
+    # Nodes of walkable ways which have no walkable edge left
+    graph.remove_nodes_from([node for node, degree in graph.degree() if degree == 0])
+    if not retain_all and len(graph) > 0:
+        graph = osmnx.utils_graph.get_largest_component(graph)
+    return graph
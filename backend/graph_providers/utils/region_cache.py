@@ -0,0 +1,130 @@
+"""Contains a cache of downloaded map regions, reused for the areas they cover.
+"""
+from collections import OrderedDict
+import threading
+import networkx as nx
+import numpy as np
+
+from backend.graph_providers.utils.edge_table import EdgeTable
+
+
+class Region:
+    """A downloaded graph together with the bounding box it covers.
+
+    Attributes:
+        bbox: The (north, south, east, west) bounding box of the region.
+        graph: The networkx MultiDiGraph of the region, with elevations.
+        elevation_source: The ElevationSource used to add the elevations.
+        edge_table: The EdgeTable of the graph, also valid for its subgraphs.
+    """
+
+    def __init__(self, bbox, graph, elevation_source):
+        self.bbox = bbox
+        self.graph = graph
+        self.elevation_source = elevation_source
+        self.edge_table = EdgeTable.from_graph(graph)
+        # Node coordinates as arrays, to select the nodes of a sub-area at once
+        nodes = list(graph.nodes(data=True))
+        self._node_ids = np.array([node for node, _ in nodes])
+        self._xs = np.array([data['x'] for _, data in nodes], dtype=np.float64)
+        self._ys = np.array([data['y'] for _, data in nodes], dtype=np.float64)
+
+    def contains(self, bbox):
+        """Check whether a (north, south, east, west) bounding box lies inside the region."""
+        n, s, e, w = bbox
+        region_n, region_s, region_e, region_w = self.bbox
+        return s >= region_s and n <= region_n and w >= region_w and e <= region_e
+
+    def subgraph(self, bbox):
+        """Get a read-only view of the region restricted to a bounding box.
+
+        Args:
+            bbox: A (north, south, east, west) bounding box inside the region.
+
+        Returns:
+            A networkx subgraph view containing the largest weakly connected
+            component of the nodes inside the bounding box, and the edges
+            between them, like the graph osmnx downloads for the bounding box.
+        """
+        if bbox == self.bbox:
+            return self.graph
+        n, s, e, w = bbox
+        inside = (self._ys >= s) & (self._ys <= n) & (self._xs >= w) & (self._xs <= e)
+        view = self.graph.subgraph(self._node_ids[inside].tolist())
+        if len(view) == 0:
+            return view
+        # Streets cut off by the bounding box would otherwise strand searches
+        return self.graph.subgraph(max(nx.weakly_connected_components(view), key=len))
+
+
+class RegionCache:
+    """Bounded cache of downloaded regions with least recently used eviction.
+
+    A request is served by any cached region containing its bounding box,
+    so that a search inside an area loaded shortly before does not download
+    it again.
+
+    Attributes:
+        capacity: The maximum number of regions kept.
+        hits: The number of lookups served by a cached region.
+        misses: The number of lookups no cached region could serve.
+    """
+
+    def __init__(self, capacity=8):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        # Regions in least recently used order
+        self._regions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._regions)
+
+    def find(self, bbox, elevation_source):
+        """Find a cached region containing a bounding box.
+
+        Args:
+            bbox: The (north, south, east, west) bounding box to cover.
+            elevation_source: The ElevationSource the region's elevations
+                must come from.
+
+        Returns:
+            The most recently used Region containing the bounding box, or
+            None if there is none.
+        """
+        with self._lock:
+            for key in reversed(self._regions):
+                region = self._regions[key]
+                if region.elevation_source is elevation_source and region.contains(bbox):
+                    self._regions.move_to_end(key)
+                    self.hits += 1
+                    return region
+            self.misses += 1
+            return None
+
+    def add(self, bbox, graph, elevation_source):
+        """Cache a downloaded region, evicting the least recently used ones if full.
+
+        Cached regions inside the new one are dropped, since the new region
+        can serve any request they could.
+
+        Args:
+            bbox: The (north, south, east, west) bounding box of the region.
+            graph: The graph of the region, with elevations.
+            elevation_source: The ElevationSource used to add the elevations.
+
+        Returns:
+            The new Region.
+        """
+        region = Region(bbox, graph, elevation_source)
+        with self._lock:
+            for key in list(self._regions):
+                cached = self._regions[key]
+                if cached.elevation_source is elevation_source and region.contains(cached.bbox):
+                    del self._regions[key]
+            self._regions[(bbox, id(elevation_source))] = region
+            self._regions.move_to_end((bbox, id(elevation_source)))
+            while len(self._regions) > self.capacity:
+                self._regions.popitem(last=False)
+        return region
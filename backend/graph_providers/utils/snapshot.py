@@ -0,0 +1,114 @@
+"""Contains a versioned, checksummed binary format for frozen graph arrays.
+"""
+import os
+import struct
+import zlib
+import numpy as np
+
+# Bump whenever the layout below changes, so that stale snapshots are rejected
+FORMAT_VERSION = 2
+
+MAGIC = b'ELENASNP'
+
+# Magic, format version, reserved, node count, edge count, CRC-32 of the payload
+HEADER = struct.Struct('<8sIIQQI')
+HEADER_SIZE = 64
+
+# Arrays in the order they are laid out after the header, with their
+# little-endian dtype and their length as a function of (nodes, edges)
+SECTIONS = [
+    ('node_ids', '<i8', lambda n, m: n),
+    ('offsets', '<i8', lambda n, m: n + 1),
+    ('targets', '<i4', lambda n, m: m),
+    ('lengths', '<f8', lambda n, m: m),
+    ('x', '<f8', lambda n, m: n),
+    ('y', '<f8', lambda n, m: n),
+    ('z', '<f8', lambda n, m: n),
+    ('gains', '<f8', lambda n, m: m),
+    ('losses', '<f8', lambda n, m: m),
+    # The node ids in increasing order, and the dense index of each
+    ('sorted_ids', '<i8', lambda n, m: n),
+    ('sorted_index', '<i4', lambda n, m: n),
+]
+
+
+def _layout(n, m):
+    """Compute the byte offset of each array, every array starting 8-byte aligned.
+
+    Returns:
+        A list of (name, dtype, offset, count) tuples and the total file size.
+    """
+    layout = []
+    position = HEADER_SIZE
+    for name, dtype, count in SECTIONS:
+        count = count(n, m)
+        layout.append((name, np.dtype(dtype), position, count))
+        position += count * np.dtype(dtype).itemsize
+        position += -position % 8
+    return layout, position
+
+
+def write_snapshot(path, arrays):
+    """Write graph arrays to a snapshot file.
+
+    The file is written next to its destination and then renamed, so that
+    readers never see a partially written snapshot.
+
+    Args:
+        path: The path of the snapshot file.
+        arrays: A dict holding every array named in SECTIONS.
+    """
+    n = len(arrays['node_ids'])
+    m = len(arrays['targets'])
+    layout, size = _layout(n, m)
+    payload = bytearray(size - HEADER_SIZE)
+    for name, dtype, offset, count in layout:
+        data = np.ascontiguousarray(arrays[name], dtype=dtype)
+        if len(data) != count:
+            raise ValueError(f"'{name}' must contain {count} entries")
+        begin = offset - HEADER_SIZE
+        payload[begin:begin + data.nbytes] = data.tobytes()
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, n, m, zlib.crc32(payload))
+    tmp_path = f'{path}.tmp.{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path, verify=True):
+    """Map the graph arrays of a snapshot file into memory.
+
+    The arrays are read-only views of a memory map of the file, so nothing
+    is parsed or copied, and processes mapping the same snapshot share the
+    same pages of the OS page cache.
+
+    Args:
+        path: The path of the snapshot file.
+        verify: If True, check the payload against its checksum, which reads
+            the whole file once.
+
+    Returns:
+        A dict holding every array named in SECTIONS.
+
+    Raises:
+        ValueError: If the file is not a snapshot, was written by another
+            version of the format, is truncated or is corrupted.
+    """
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"'{path}' is too short to be a graph snapshot")
+    magic, version, _, n, m, checksum = HEADER.unpack(data[:HEADER.size].tobytes())
+    if magic != MAGIC:
+        raise ValueError(f"'{path}' is not a graph snapshot")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"'{path}' has snapshot format version {version}, expected {FORMAT_VERSION}")
+    layout, size = _layout(n, m)
+    if len(data) != size:
+        raise ValueError(f"'{path}' has {len(data)} bytes, expected {size}")
+    if verify and zlib.crc32(data[HEADER_SIZE:]) != checksum:
+        raise ValueError(f"'{path}' does not match its checksum")
+    return {
+        name: data[offset:offset + count * dtype.itemsize].view(dtype)
+        for name, dtype, offset, count in layout
+    }
@@ -0,0 +1,147 @@
+"""Contains a uniform-grid spatial index for snapping coordinates to nodes.
+"""
+import math
+import numpy as np
+
+
+class GridSpatialIndex:
+    """Spatial index bucketing nodes into a uniform grid of square cells.
+
+    Cells use the same integer coordinates as the chunks of the
+    LoadingGraphProvider when built with the same cell size, so that the index
+    can grow one chunk at a time. Distances are Euclidean in degrees, like
+    osmnx.distance.get_nearest_node(..., method='euclidean').
+
+    Attributes:
+        cell_size: Side length of a cell in degrees.
+    """
+
+    def __init__(self, cell_size=0.01):
+        self.cell_size = cell_size
+        # Map (cx, cy) -> lists of node ids, longitudes and latitudes
+        self._cells = {}
+        # Map (cx, cy) -> the same data as arrays, rebuilt lazily after inserts
+        self._cell_arrays = {}
+        self._cell_of_node = {}
+
+    def __len__(self):
+        return len(self._cell_of_node)
+
+    def __contains__(self, node):
+        return node in self._cell_of_node
+
+    def insert(self, nodes):
+        """Add nodes to the index. Nodes already indexed are skipped.
+
+        Args:
+            nodes: An iterable of (node id, longitude, latitude) tuples.
+        """
+        for node, x, y in nodes:
+            if node in self._cell_of_node:
+                continue
+            cell = (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+            if cell not in self._cells:
+                self._cells[cell] = ([], [], [])
+            node_ids, xs, ys = self._cells[cell]
+            node_ids.append(node)
+            xs.append(x)
+            ys.append(y)
+            self._cell_of_node[node] = cell
+            self._cell_arrays.pop(cell, None)
+
+    def insert_graph(self, graph):
+        """Add every node of a networkx graph carrying 'x' and 'y' attributes."""
+        self.insert((node, data['x'], data['y']) for node, data in graph.nodes(data=True))
+
+    def remove(self, nodes):
+        """Remove nodes from the index. Nodes not indexed are skipped.
+
+        Args:
+            nodes: An iterable of node ids.
+        """
+        removed_by_cell = {}
+        for node in nodes:
+            cell = self._cell_of_node.pop(node, None)
+            if cell is not None:
+                removed_by_cell.setdefault(cell, set()).add(node)
+        for cell, removed in removed_by_cell.items():
+            kept = [entry for entry in zip(*self._cells[cell]) if entry[0] not in removed]
+            if len(kept) == 0:
+                del self._cells[cell]
+            else:
+                self._cells[cell] = tuple(list(values) for values in zip(*kept))
+            self._cell_arrays.pop(cell, None)
+
+    def cell_of(self, node):
+        """Get the (cx, cy) cell containing an indexed node, or None."""
+        return self._cell_of_node.get(node)
+
+    def nodes_in_cell(self, cell):
+        """Get the ids of the nodes indexed in the (cx, cy) cell."""
+        if cell not in self._cells:
+            return []
+        return list(self._cells[cell][0])
+
+    def _get_cell_arrays(self, cell):
+        if cell not in self._cell_arrays:
+            node_ids, xs, ys = self._cells[cell]
+            self._cell_arrays[cell] = (np.array(node_ids), np.array(xs), np.array(ys))
+        return self._cell_arrays[cell]
+
+    def nearest(self, point):
+        """Find the indexed node nearest to a point.
+
+        Args:
+            point: A (latitude, longitude) tuple.
+
+        Returns:
+            The id of the nearest node.
+        """
+        return self.nearest_many([point])[0]
+
+    def nearest_many(self, points):
+        """Find the indexed nodes nearest to many points at once.
+
+        The distance from every point to every non-empty cell is bounded from
+        below in one vectorized pass; each point then visits cells in order of
+        that bound and stops as soon as no closer node can remain.
+
+        Args:
+            points: A sequence of (latitude, longitude) tuples.
+
+        Returns:
+            A list containing the id of the nearest node to each point.
+
+        Raises:
+            ValueError: If the index is empty.
+        """
+        if len(self._cells) == 0:
+            raise ValueError("Cannot find nearest nodes in an empty spatial index")
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        lats = points[:, 0:1]
+        lngs = points[:, 1:2]
+        cells = list(self._cells)
+        cell_coords = np.array(cells, dtype=np.float64) * self.cell_size
+        west = cell_coords[:, 0]
+        south = cell_coords[:, 1]
+        # Distance from each point to the closest edge of each cell (0 if inside)
+        dx = np.maximum(np.maximum(west - lngs, lngs - (west + self.cell_size)), 0)
+        dy = np.maximum(np.maximum(south - lats, lats - (south + self.cell_size)), 0)
+        lower_bounds = np.hypot(dx, dy)
+        cell_orders = np.argsort(lower_bounds, axis=1, kind='stable')
+
+        nearest_nodes = []
+        for q, (lat, lng) in enumerate(points.tolist()):
+            best_dist = math.inf
+            best_node = None
+            for c in cell_orders[q].tolist():
+                if lower_bounds[q, c] > best_dist:
+                    break
+                node_ids, xs, ys = self._get_cell_arrays(cells[c])
+                dists = np.hypot(xs - lng, ys - lat)
+                i = int(np.argmin(dists))
+                if dists[i] < best_dist:
+                    best_dist = dists[i]
+                    best_node = node_ids[i].item()
+            nearest_nodes.append(best_node)
+        return nearest_nodes
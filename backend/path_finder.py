@@ -108,10 +108,10 @@ class PathFinder:
             A dict containing paths as sequences of (latitude, longitude)
             coordinates and statistics to display on the front end.
         """
-        # Convert list of node ids to (lat, lng) coordinates
-        get_coords = self.graph_provider.get_coords
-        shortest_coords = [(node['y'], node['x']) for node in map(get_coords, shortest_res.path)]
-        alternate_coords = [(node['y'], node['x']) for node in map(get_coords, alternate_res.path)]
+        # Convert list of node ids to (lat, lng) coordinates, restoring any
+        # nodes the graph provider left out of its graph
+        shortest_coords = self._path_coords(shortest_res.path)
+        alternate_coords = self._path_coords(alternate_res.path)
 
         # Return coordinate sequences and route statistics
         return {
@@ -128,3 +128,16 @@ class PathFinder:
                 }
             }
         }
+
+    def _path_coords(self, path):
+        """Look up the (latitude, longitude) coordinates of a whole path at once.
+
+        Args:
+            path: A list of node ids found by a search.
+
+        Returns:
+            A list of (latitude, longitude) tuples, including any nodes the
+            graph provider left out of its graph.
+        """
+        x, y, _ = self.graph_provider.get_xyz(self.graph_provider.expand_path(path))
+        return list(zip(y.tolist(), x.tolist()))
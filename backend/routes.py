@@ -3,17 +3,41 @@
 from flask import Blueprint, request, jsonify
 import osmnx
 import json
+import os
 
 from backend.path_request import PathRequest
 from backend.path_finder import PathFinder
 from backend.search_algorithms.a_star import AStar
+from backend.search_algorithms.bidirectional_a_star import BidirectionalAStar
 from backend.search_algorithms.dijkstra import Dijkstra
 from backend.search_algorithms.midpoint_miracle import MidpointMiracle
+from backend.graph_providers import loading_graph_provider
 from backend.graph_providers.loading_graph_provider import LoadingGraphProvider
 from backend.graph_providers.bounded_graph_provider import BoundedGraphProvider
+from backend.graph_providers.osm_file_graph_provider import OsmFileGraphProvider, OSM_FILE
+from backend.graph_providers.contracted_graph_provider import ContractedGraphProvider
+from backend.elevation_sources.dem_elevation_source import DemElevationSource
+from backend.elevation_sources.cached_elevation_source import google_elevation_cache
 
 routes = Blueprint('routes', __name__, template_folder='frontend')
 
+# Directory of local SRTM .hgt tiles: if present, elevations are sampled from
+# it instead of being requested from the (cached) Google Elevation API
+DEM_DIR = os.path.join(os.path.dirname(__file__), '..', 'dem')
+if os.path.isdir(DEM_DIR):
+    elevation_source = DemElevationSource(DEM_DIR)
+else:
+    elevation_source = google_elevation_cache
+
+# Whether to contract chains of degree-2 nodes before searching bounded graphs
+# (the lazily loaded graph keeps growing during the search, so it never is).
+# Off by default until contracted searches are checked against plain ones on
+# real bounded graphs
+CONTRACT_CHAINS = False
+
+# Whether to search for the shortest path from both endpoints at once
+BIDIRECTIONAL_SHORTEST_PATH = True
+
 
 @routes.route('/api', methods = ['POST'])
 def route():
@@ -45,13 +69,31 @@ def route():
 
     # Get graph provider
     if(path_request.graph_setting == 'bounded'):
-        graph_provider_cls = BoundedGraphProvider
+        # A local OpenStreetMap extract, if present, stands in for Overpass
+        if os.path.isfile(OSM_FILE):
+            graph_provider_cls = OsmFileGraphProvider
+        else:
+            graph_provider_cls = BoundedGraphProvider
     else:
         graph_provider_cls = LoadingGraphProvider
-    graph_provider = graph_provider_cls(path_request.origin, path_request.destination)
+    graph_provider = graph_provider_cls(path_request.origin, path_request.destination, elevation_source)
+    if CONTRACT_CHAINS and graph_provider_cls is not LoadingGraphProvider:
+        graph_provider = ContractedGraphProvider(graph_provider)
+
+    # Guide the shortest path search with the landmarks of the loaded graph, if any,
+    # frozen as they are now so that loads during the search do not change them.
+    # The path is only guaranteed to be the shortest if no chunk is loaded meanwhile
+    heuristic = None
+    landmarks = loading_graph_provider.cache['landmarks']
+    if graph_provider_cls is LoadingGraphProvider and landmarks is not None:
+        with loading_graph_provider.cache['lock']:
+            heuristic = landmarks.snapshot().heuristic
 
     # Get shortest path algorithm
-    shortest_path_algo = AStar(graph_provider)
+    if BIDIRECTIONAL_SHORTEST_PATH:
+        shortest_path_algo = BidirectionalAStar(graph_provider, heuristic)
+    else:
+        shortest_path_algo = AStar(graph_provider, heuristic)
 
     # Get elevation-based search algorithm
     if path_request.ele_setting == 'minimal':
@@ -63,7 +105,10 @@ def route():
 
     # Find path and handle timeout if necessary
     finder = PathFinder(shortest_path_algo, ele_search_algo, graph_provider)
-    results = finder.find_path(path_request)
+    try:
+        results = finder.find_path(path_request)
+    finally:
+        graph_provider.release()
     if results == None:
         return jsonify(error="timeout")
     else:
@@ -1,9 +1,8 @@
-import heapq
 import math
 
-from backend.keys import api_key
 from backend.search_algorithms.utils.node_data import NodeData
-from backend.search_algorithms.utils.node_id_wrapper import NodeIdWrapper, NodeIdWrapperFactory
+from backend.search_algorithms.utils.priority_queue import PriorityQueue
+from backend.search_algorithms.utils.metric_heuristic import MetricHeuristic
 from backend.search_algorithms.search_result import SearchResult
 from backend.search_algorithms.search_algorithm import SearchAlgorithm
 
@@ -14,10 +13,21 @@ class AStar(SearchAlgorithm):
     Attributes:
         graph_provider: The instance of the graph_provider used for fetching
             points and other information.
+        heuristic: The function estimating the distance from a node to
+            another, which must never overestimate it.
     """
 
-    def __init__(self, graph_provider):
+    def __init__(self, graph_provider, heuristic=None):
+        """Initializes an AStar search.
+
+        Args:
+            graph_provider: The graph provider to search.
+            heuristic: Optional; a function of two node ids giving a lower
+                bound on the length of a path between them, such as
+                Landmarks.heuristic. Defaults to the great-circle distance.
+        """
         self.graph_provider = graph_provider
+        self.heuristic = heuristic if heuristic is not None else MetricHeuristic(graph_provider).heuristic
 
     def _elevation_heuristic(self, node1, node2):
         """Calculate the elevation heuristic between the two given nodes.
@@ -29,10 +39,7 @@ class AStar(SearchAlgorithm):
         Returns:
             A value representing the heuristic for the elevation model between node1 and node2
         """
-        n1 = self.graph_provider.get_coords(node1)
-        n2 = self.graph_provider.get_coords(node2)
-        elevation_gain = max(0, (n2['z'] - n1['z'])**3)
-        return elevation_gain
+        return self._elevation_gain(node1, node2) ** 3
 
     def _elevation_gain(self, node1, node2):
         """Calculate the elevation gain between the two given nodes.
@@ -44,23 +51,7 @@ class AStar(SearchAlgorithm):
         Returns:
             A value representing the elevation gain from node1 to node2.
         """
-        n1 = self.graph_provider.get_coords(node1)
-        n2 = self.graph_provider.get_coords(node2)
-        return max(0, (n2['z'] - n1['z']))
-
-    def _distance_heuristic(self, node1, node2):
-        """Calculate the distance heuristic between the two given nodes.
-
-        Args:
-            node1: Node id of the source node.
-            node2: Node id of the target node.
-
-        Returns:
-            A value representing the euclidean distance between node1 and node2.
-        """
-        n1 = self.graph_provider.get_coords(node1)
-        n2 = self.graph_provider.get_coords(node2)
-        return math.sqrt((n1['x'] - n2['x']) ** 2 + (n1['y'] - n2['y']) ** 2)
+        return self.graph_provider.get_edge_gain(node1, node2)
 
     def _distance(self, node1, node2):
         """Lookup the distance between two nodes from the graph provider.
@@ -88,11 +79,11 @@ class AStar(SearchAlgorithm):
         use_elevation = max_path_len < math.inf
         visited_nodes = set()
         node_data_map = { start: NodeData(start) }
-        wrap_node_id = NodeIdWrapperFactory(node_data_map).make_wrapper
-        nodes_to_visit = [wrap_node_id(start)]
+        nodes_to_visit = PriorityQueue()
+        nodes_to_visit[start] = node_data_map[start].heuristic_dist
 
         while len(nodes_to_visit) > 0:
-            curr = heapq.heappop(nodes_to_visit).get_data()
+            curr = node_data_map[nodes_to_visit.popitem()[0]]
             visited_nodes.add(curr.id)
 
             if curr.id == end:
@@ -102,25 +93,26 @@ class AStar(SearchAlgorithm):
                     ele_gain=curr.elevation_gain
                 )
 
-            neighbors = self.graph_provider.get_neighbors(curr.id)
-            unvisited_neighbors = filter(lambda n: n not in visited_nodes, neighbors)
-            for n in unvisited_neighbors:
-                dist = curr.actual_dist + self._distance(curr.id, n)
+            # Each neighbor comes with the length and elevation gain of its edge
+            for n, length, elevation_gain in self.graph_provider.get_neighbor_edges(curr.id):
+                if n in visited_nodes:
+                    continue
+                dist = curr.actual_dist + length
                 if dist <= max_path_len:
-                    is_in_node_map = n in node_data_map
-                    dist_heuristic = dist + self._distance_heuristic(n, end)
-                    elevation_heuristic = curr.elevation_gain + self._elevation_heuristic(curr.id, n)
+                    if use_elevation:
+                        # The precomputed gain stands in for both elevation terms
+                        heuristic_dist = curr.elevation_gain + elevation_gain ** 3
+                    else:
+                        heuristic_dist = dist + self.heuristic(n, end)
                     node_data_map[n] = NodeData(
                         id=n,
                         parent=curr.id,
-                        heuristic_dist=elevation_heuristic if use_elevation else dist_heuristic,
+                        heuristic_dist=heuristic_dist,
                         actual_dist=dist,
-                        elevation_gain=curr.elevation_gain + self._elevation_gain(curr.id, n)
+                        elevation_gain=curr.elevation_gain + elevation_gain
                     )
-                    if is_in_node_map:
-                        heapq.heapify(nodes_to_visit)
-                    else:
-                        heapq.heappush(nodes_to_visit, wrap_node_id(n))
+                    # Unvisited nodes seen before are still queued: move them
+                    nodes_to_visit[n] = node_data_map[n].heuristic_dist
 
         return SearchResult()
 
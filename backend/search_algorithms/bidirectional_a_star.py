@@ -0,0 +1,162 @@
+"""Contains a class implementing a bidirectional A* search for shortest paths.
+"""
+import heapq
+import math
+
+from backend.search_algorithms.utils.metric_heuristic import MetricHeuristic
+from backend.search_algorithms.search_result import SearchResult
+from backend.search_algorithms.search_algorithm import SearchAlgorithm
+from backend.graph_providers.graph_provider import GraphProvider
+
+
+class BidirectionalAStar(SearchAlgorithm):
+    """Shortest-path search growing from both endpoints at once.
+
+    A forward search from the start node follows outgoing edges while a
+    backward search from the end node follows incoming edges, each guided
+    toward the other endpoint. Both use the average potential
+
+        pf(v) = (h(v, end) - h(start, v)) / 2
+
+    (the backward search using -pf), where h is the distance heuristic.
+    With this choice, both searches see the same reduced edge costs, and the
+    potential is consistent whenever h is, so each search settles nodes in
+    order of their reduced distance. Every time an edge joins the two
+    searches, the shortest path found so far, of length mu, is updated, and
+    the search stops once the smallest keys kf = d_f + pf and kb = d_b - pf
+    of the two queues satisfy kf + kb >= mu: no path through an unsettled
+    node can then be shorter.
+
+    Attributes:
+        graph_provider: A GraphProvider to facilitate the search, which
+            must provide the incoming edges of nodes.
+        heuristic: The function estimating the distance from a node to
+            another, which must be consistent.
+    """
+    def __init__(self, graph_provider, heuristic=None):
+        """Initializes a BidirectionalAStar search.
+
+        Args:
+            graph_provider: The graph provider to search.
+            heuristic: Optional; a function of two node ids giving a
+                consistent lower bound on the length of a path between them,
+                such as Landmarks.heuristic. Defaults to the great-circle
+                distance.
+        """
+        self.graph_provider = graph_provider
+        self.heuristic = heuristic if heuristic is not None else MetricHeuristic(graph_provider).heuristic
+
+    @property
+    def graph_provider(self):
+        return self._graph_provider
+
+    @graph_provider.setter
+    def graph_provider(self, graph_provider):
+        if not isinstance(graph_provider, GraphProvider):
+            raise ValueError("Graph provider must be a subclass of GraphProvider")
+        self._graph_provider = graph_provider
+
+    def _make_result(self, meeting_node, prev, succ, path_len):
+        """Join the halves of the path found by both searches at their meeting node.
+
+        Args:
+            meeting_node: The node through which the shortest path goes.
+            prev: The backpointers of the forward search.
+            succ: The forward pointers of the backward search.
+            path_len: The length of the path.
+
+        Returns:
+            A SearchResult describing the path from the start node to the end node.
+        """
+        path = []
+        node = meeting_node
+        while node is not None:
+            path.append(node)
+            node = prev[node]
+        path.reverse()
+        node = succ[meeting_node]
+        while node is not None:
+            path.append(node)
+            node = succ[node]
+        ele_gain = sum(self.graph_provider.get_edge_gain(u, v) for u, v in zip(path[:-1], path[1:]))
+        return SearchResult(path=path, path_len=path_len, ele_gain=ele_gain)
+
+    def search(self, start, end, max_path_len=math.inf):
+        """Search for the shortest path from 'start' to 'end'.
+
+        Args:
+            start: The start node of the path of interest.
+            end: The end node of the path of interest.
+            max_path_len: Optional; the maximum allowable length of a path.
+                This search only finds shortest paths, so it gives up as
+                soon as the shortest path is known to be longer.
+
+        Returns:
+            A SearchResult describing the shortest path, or a default
+            SearchResult in the event no path was found.
+        """
+        if start == end:
+            return SearchResult(path=[start], path_len=0., ele_gain=0.)
+
+        potentials = {}
+
+        def potential(node):
+            if node not in potentials:
+                potentials[node] = (self.heuristic(node, end) - self.heuristic(start, node)) / 2
+            return potentials[node]
+
+        # Distances and pointers of the forward (f) and backward (b) searches
+        dist_f = {start: 0.}
+        dist_b = {end: 0.}
+        prev = {start: None}
+        succ = {end: None}
+        settled_f = set()
+        settled_b = set()
+        queue_f = [(potential(start), start)]
+        queue_b = [(-potential(end), end)]
+        # The length of the shortest path found so far, and its meeting node
+        mu = math.inf
+        meeting_node = None
+
+        while len(queue_f) > 0 and len(queue_b) > 0:
+            # Drop queue entries superseded by a shorter distance
+            while len(queue_f) > 0 and queue_f[0][1] in settled_f:
+                heapq.heappop(queue_f)
+            while len(queue_b) > 0 and queue_b[0][1] in settled_b:
+                heapq.heappop(queue_b)
+            if len(queue_f) == 0 or len(queue_b) == 0:
+                break
+            # No path left to find can be shorter than the sum of the smallest keys
+            lower_bound = queue_f[0][0] + queue_b[0][0]
+            if lower_bound >= mu or lower_bound > max_path_len:
+                break
+
+            # Expand the search whose next node is closest
+            if queue_f[0][0] <= queue_b[0][0]:
+                _, curr = heapq.heappop(queue_f)
+                settled_f.add(curr)
+                for n, length, _ in self.graph_provider.get_neighbor_edges(curr):
+                    alt_dist = dist_f[curr] + length
+                    if alt_dist < dist_f.get(n, math.inf):
+                        dist_f[n] = alt_dist
+                        prev[n] = curr
+                        heapq.heappush(queue_f, (alt_dist + potential(n), n))
+                        if n in dist_b and alt_dist + dist_b[n] < mu:
+                            mu = alt_dist + dist_b[n]
+                            meeting_node = n
+            else:
+                _, curr = heapq.heappop(queue_b)
+                settled_b.add(curr)
+                for n, length, _ in self.graph_provider.get_predecessor_edges(curr):
+                    alt_dist = dist_b[curr] + length
+                    if alt_dist < dist_b.get(n, math.inf):
+                        dist_b[n] = alt_dist
+                        succ[n] = curr
+                        heapq.heappush(queue_b, (alt_dist - potential(n), n))
+                        if n in dist_f and dist_f[n] + alt_dist < mu:
+                            mu = dist_f[n] + alt_dist
+                            meeting_node = n
+
+        if meeting_node is None or mu > max_path_len:
+            return SearchResult()
+        return self._make_result(meeting_node, prev, succ, mu)
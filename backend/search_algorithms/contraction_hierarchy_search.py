@@ -0,0 +1,136 @@
+"""Contains a class answering shortest-path queries on a contraction hierarchy.
+"""
+import heapq
+import math
+
+from backend.search_algorithms.search_result import SearchResult
+from backend.search_algorithms.search_algorithm import SearchAlgorithm
+from backend.graph_providers.graph_provider import GraphProvider
+
+
+class ContractionHierarchySearch(SearchAlgorithm):
+    """Shortest-path search only climbing a contraction hierarchy.
+
+    A forward search from the start node follows upward edges while a
+    backward search from the end node follows downward edges in reverse,
+    so both only visit nodes of increasing rank. The shortest path is found
+    where the two searches meet at its highest-ranked node, and each search
+    stops once its smallest distance exceeds the shortest path found so far.
+    The path is then unpacked into edges of the original graph, and its
+    length and elevation gain are summed along them in order, as AStar does.
+
+    Attributes:
+        graph_provider: The GraphProvider whose graph the hierarchy was built on.
+        hierarchy: The ContractionHierarchy searched.
+    """
+    def __init__(self, graph_provider, hierarchy):
+        """Initializes a ContractionHierarchySearch.
+
+        Args:
+            graph_provider: The graph provider to search.
+            hierarchy: A ContractionHierarchy of the graph, typically loaded
+                at startup, or built with ContractionHierarchy.from_provider.
+        """
+        self.graph_provider = graph_provider
+        self.hierarchy = hierarchy
+
+    @property
+    def graph_provider(self):
+        return self._graph_provider
+
+    @graph_provider.setter
+    def graph_provider(self, graph_provider):
+        if not isinstance(graph_provider, GraphProvider):
+            raise ValueError("Graph provider must be a subclass of GraphProvider")
+        self._graph_provider = graph_provider
+
+    def _make_result(self, meeting_node, prev, succ):
+        """Unpack the path through the meeting node of both searches.
+
+        Args:
+            meeting_node: The highest-ranked node of the shortest path.
+            prev: The backpointers of the forward search.
+            succ: The forward pointers of the backward search.
+
+        Returns:
+            A SearchResult describing the path from the start node to the end node.
+        """
+        packed_path = []
+        node = meeting_node
+        while node is not None:
+            packed_path.append(node)
+            node = prev[node]
+        packed_path.reverse()
+        node = succ[meeting_node]
+        while node is not None:
+            packed_path.append(node)
+            node = succ[node]
+
+        path = packed_path[:1]
+        path_len = 0.
+        ele_gain = 0.
+        for _, v, length, gain in self.hierarchy.unpack_edges(packed_path):
+            path.append(v)
+            path_len += length
+            ele_gain += gain
+        return SearchResult(path=path, path_len=path_len, ele_gain=ele_gain)
+
+    def search(self, start, end, max_path_len=math.inf):
+        """Search for the shortest path from 'start' to 'end'.
+
+        Args:
+            start: The start node of the path of interest.
+            end: The end node of the path of interest.
+            max_path_len: Optional; the maximum allowable length of a path.
+                This search only finds shortest paths, so it gives up as
+                soon as the shortest path is known to be longer.
+
+        Returns:
+            A SearchResult describing the shortest path, or a default
+            SearchResult in the event no path was found.
+        """
+        rank = self.hierarchy.rank
+        if start not in rank or end not in rank:
+            return SearchResult()
+        if start == end:
+            return SearchResult(path=[start], path_len=0., ele_gain=0.)
+
+        # Distances and pointers of the forward (f) and backward (b) searches
+        dist_f = {start: 0.}
+        dist_b = {end: 0.}
+        prev = {start: None}
+        succ = {end: None}
+        queue_f = [(0., start)]
+        queue_b = [(0., end)]
+        # The length of the shortest path found so far, and its meeting node
+        mu = math.inf
+        meeting_node = None
+
+        while len(queue_f) > 0 or len(queue_b) > 0:
+            # Expand the search whose next node is closest
+            if len(queue_b) == 0 or (len(queue_f) > 0 and queue_f[0][0] <= queue_b[0][0]):
+                queue, dist, other_dist, pointers = queue_f, dist_f, dist_b, prev
+                edges_of = self.hierarchy.get_upward_edges
+            else:
+                queue, dist, other_dist, pointers = queue_b, dist_b, dist_f, succ
+                edges_of = self.hierarchy.get_downward_edges
+            d, curr = heapq.heappop(queue)
+            if d > dist[curr]:
+                continue
+            # Nodes beyond the shortest path found so far cannot improve it
+            if d >= mu or d > max_path_len:
+                queue.clear()
+                continue
+            if curr in other_dist and d + other_dist[curr] < mu:
+                mu = d + other_dist[curr]
+                meeting_node = curr
+            for n, length in edges_of(curr):
+                alt_dist = d + length
+                if alt_dist < dist.get(n, math.inf):
+                    dist[n] = alt_dist
+                    pointers[n] = curr
+                    heapq.heappush(queue, (alt_dist, n))
+
+        if meeting_node is None or mu > max_path_len:
+            return SearchResult()
+        return self._make_result(meeting_node, prev, succ)
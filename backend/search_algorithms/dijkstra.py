@@ -2,8 +2,8 @@
 """
 import math
 from collections import defaultdict
-from heapdict import heapdict
 
+from backend.search_algorithms.utils.priority_queue import PriorityQueue
 from backend.search_algorithms.search_result import SearchResult
 from backend.search_algorithms.search_algorithm import SearchAlgorithm
 from backend.graph_providers.graph_provider import GraphProvider
@@ -46,37 +46,47 @@ class Dijkstra(SearchAlgorithm):
         """
         return self.graph_provider.get_edge_distance(node1, node2)
 
-    def _elevation(self, node):
-        """Obtain the elevation of a given node.
+    def _elevation_diff(self, node1, node2):
+        """Obtain the signed elevation difference along an edge.
 
         Args:
-            node: The node whose elevation we want.
+            node1: Tail node in the directed edge.
+            node2: Head node in the directed edge.
 
         Returns:
-            The 'z' coordinate of the node, according to the graph provider.
+            The elevation gained minus the elevation lost along the edge.
         """
-        return self.graph_provider.get_coords(node)['z']
+        return self.graph_provider.get_edge_gain(node1, node2) - self.graph_provider.get_edge_loss(node1, node2)
 
-    def single_source(self, start):
+    def single_source(self, start, cutoff=math.inf):
         """Perform a single-source shortest paths search on the graph.
 
         Args:
             start: The source node for the search.
+            cutoff: Optional; the search does not go past nodes farther than
+                this from the source, so that it only covers the part of the
+                graph a path of bounded length can reach.
 
         Returns:
             A dict containing three mappings fully describing the results
             of the search in terms of backpointers ('prev'), distances ('dist'),
             and elevation differences ('ele_diff'). The keys to these mappings
-            are node ids.
+            are node ids. With a cutoff, they are plain dicts holding only the
+            nodes within the cutoff, otherwise 'prev' and 'dist' default to
+            None and infinity for unreached nodes.
         """
-        # A mapping from nodes to backpointers for reconstructing paths
-        self._prev = defaultdict(lambda: None)
-        # The distance of the current minimum-distance path to a node
-        self._dist = defaultdict(lambda: math.inf)
+        # A mapping from nodes to backpointers for reconstructing paths, and
+        # the distance of the current minimum-distance path to a node
+        if cutoff < math.inf:
+            self._prev = {}
+            self._dist = {}
+        else:
+            self._prev = defaultdict(lambda: None)
+            self._dist = defaultdict(lambda: math.inf)
         # Map a node 'n' to the (signed) elevation diff between n and prev[n]
         self._ele_diff = {}
         visited = set()
-        priority_queue = heapdict()
+        priority_queue = PriorityQueue()
 
         # Disable lazy loading to prevent infinite chunks from being loaded
         self.graph_provider.lazy_loading_enabled = False
@@ -88,15 +98,13 @@ class Dijkstra(SearchAlgorithm):
         while len(priority_queue) > 0:
             curr_node, curr_dist = priority_queue.popitem()
             visited.add(curr_node)
-            neighbors = list(self.graph_provider.get_neighbors(curr_node))
-            for n in neighbors:
+            for n, length, _ in self.graph_provider.get_neighbor_edges(curr_node):
                 if n in visited:
                     continue
-                alt_path_dist = self._dist[curr_node] + self._distance(curr_node, n)
-                curr_ele_diff = self._elevation(n) - self._elevation(curr_node)
+                alt_path_dist = self._dist[curr_node] + length
                 # Standard Dijkstra criterion for updating path
-                if alt_path_dist < self._dist[n]:
-                    self._ele_diff[n] = curr_ele_diff
+                if alt_path_dist <= cutoff and alt_path_dist < self._dist.get(n, math.inf):
+                    self._ele_diff[n] = self._elevation_diff(curr_node, n)
                     self._dist[n] = alt_path_dist
                     self._prev[n] = curr_node
                     priority_queue[n] = self._dist[n]
@@ -187,7 +195,7 @@ class Dijkstra(SearchAlgorithm):
         # Map a node 'n' to the (signed) elevation diff between n and prev[n]
         self._ele_diff = {}
         visited = set()
-        priority_queue = heapdict()
+        priority_queue = PriorityQueue()
 
         source = start if not end_is_source else end
 
@@ -208,25 +216,21 @@ class Dijkstra(SearchAlgorithm):
                 return self._reconstruct_result(end, end_is_source=end_is_source)
 
             # Explore neighbors to see if we have a new best path to them
-            neighbors = list(self.graph_provider.get_neighbors(curr_node))
-            for i, n in enumerate(neighbors):
+            for n, length, gain in self.graph_provider.get_neighbor_edges(curr_node):
                 if n in visited:
                     continue
 
-                alt_path_dist = self._dist[curr_node] + self._distance(curr_node, n)
-                ele_n = self._elevation(n)
-                curr_ele_diff = ele_n - self._elevation(curr_node)
+                alt_path_dist = self._dist[curr_node] + length
                 if minimize_ele:
                     # Heuristically weight the edges with positive ele gain
-                    heuristic_weight = max([0., curr_ele_diff])
-                    alt_path_weight = curr_weight + heuristic_weight
+                    alt_path_weight = curr_weight + gain
                 else:
                     alt_path_weight = alt_path_dist
 
                 # Outer 'if' trivially satisfied when max is math.inf
                 if alt_path_dist <= max_path_len:
                     if alt_path_weight < weight[n]:
-                        self._ele_diff[n] = curr_ele_diff
+                        self._ele_diff[n] = self._elevation_diff(curr_node, n)
                         self._dist[n] = alt_path_dist
                         weight[n] = alt_path_weight
                         self._prev[n] = curr_node
@@ -1,11 +1,42 @@
 """Contains a class used for finding an elevation-maximizing path.
 """
 import math
+import os
+import numpy as np
 
 from backend.search_algorithms.dijkstra import Dijkstra
 from backend.search_algorithms.search_result import SearchResult
 from backend.search_algorithms.search_algorithm import SearchAlgorithm
 from backend.graph_providers.graph_provider import GraphProvider
+from backend.graph_providers.array_graph_provider import ArrayGraphProvider
+
+# Graph providers loaded by the worker processes of a sweep executor, mapping
+# a snapshot path to the (modification time, size) of the file and its provider
+_snapshot_providers = {}
+
+
+def _snapshot_single_source(path, source, cutoff):
+    """Run single-source Dijkstra on the graph of a snapshot, in a worker process.
+
+    The snapshot is memory-mapped once per process, so the graph is shared
+    between processes through the page cache instead of being pickled. It
+    is loaded again if the file was replaced since.
+
+    Args:
+        path: The path of the snapshot file.
+        source: The source node for the search.
+        cutoff: The distance the search does not go past.
+
+    Returns:
+        The result of Dijkstra.single_source, with plain dicts as mappings
+        so that it can be sent back to the parent process.
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    if path not in _snapshot_providers or _snapshot_providers[path][0] != version:
+        _snapshot_providers[path] = (version, ArrayGraphProvider.from_snapshot(path))
+    result = Dijkstra(_snapshot_providers[path][1]).single_source(source, cutoff=cutoff)
+    return {name: dict(mapping) for name, mapping in result.items()}
 
 
 class MidpointMiracle(SearchAlgorithm):
@@ -19,11 +50,24 @@ class MidpointMiracle(SearchAlgorithm):
 
     Attributes:
         graph_provider: A GraphProvider to facilitate the search.
+        executor: A concurrent.futures.ProcessPoolExecutor running the
+            single-source searches from both ends at once, or None.
     """
     SS_NOT_COMPUTED_MSG = "We have not computed the single source data yet."
 
-    def __init__(self, graph_provider):
+    def __init__(self, graph_provider, executor=None):
+        """Initializes a MidpointMiracle search.
+
+        Args:
+            graph_provider: The graph provider to search.
+            executor: Optional; a process pool executor with at least two
+                workers. It is only used when the graph provider has a
+                snapshot_path, from which the workers load the graph, and
+                otherwise both searches run in this process, one after the
+                other.
+        """
         self.graph_provider = graph_provider
+        self.executor = executor
         self._single_source_data = None
 
     @property
@@ -45,9 +89,9 @@ class MidpointMiracle(SearchAlgorithm):
         Returns:
             The 'z' coordinate of the node, according to the graph provider.
         """
-        return self.graph_provider.get_coords(node)['z']
+        return self.graph_provider.get_elevation(node)
 
-    def _compute_single_source_data(self, start, end):
+    def _compute_single_source_data(self, start, end, max_path_len=math.inf):
         """Run single-source Dijkstra to get shortest-paths info we need.
 
         We need to know shortest paths from start to every other node in the
@@ -59,16 +103,34 @@ class MidpointMiracle(SearchAlgorithm):
         Args:
             start: The start node for the full paths interest.
             end: The end node for the full paths of interest.
+            max_path_len: Optional; the maximum allowable length of a path.
+                No node farther than this from start or end can be on a
+                path, so the searches stop there, and only hold the nodes
+                within that distance.
         """
         single_source_data = {}
-        dijkstra = Dijkstra(self.graph_provider)
-        single_source_data['start'] = dijkstra.single_source(start)
-        single_source_data['end'] = dijkstra.single_source(end)
+        snapshot_path = getattr(self.graph_provider, 'snapshot_path', None)
+        if self.executor is not None and snapshot_path is not None:
+            # Both searches are independent, so they run at once in the workers
+            futures = {
+                side: self.executor.submit(_snapshot_single_source, snapshot_path, source, max_path_len)
+                for side, source in [('start', start), ('end', end)]
+            }
+            for side, future in futures.items():
+                single_source_data[side] = future.result()
+        else:
+            dijkstra = Dijkstra(self.graph_provider)
+            single_source_data['start'] = dijkstra.single_source(start, cutoff=max_path_len)
+            single_source_data['end'] = dijkstra.single_source(end, cutoff=max_path_len)
 
         self._single_source_data = single_source_data
 
-    def _filter_func_factory(self, start, end, max_path_len):
-        """Creates a function for filtering midpoint nodes.
+    def _score_candidates(self, start, end, max_path_len):
+        """Filter candidate midpoints and score them, all at once.
+
+        Candidates are filtered and scored over arrays holding the distances
+        and elevation of the nodes both single-source searches reached, the
+        only ones which can be on a path short enough.
 
         Args:
             start: The start node for paths of interest.
@@ -76,81 +138,86 @@ class MidpointMiracle(SearchAlgorithm):
             max_path_len: The upper bound on acceptable path lengths.
 
         Returns:
-            A function which can be used to filter candidate midpoint
-            nodes along the path ultimately returned by the `search` method.
-            For example, it will filter out nodes for whom the full path
-            through that node (using paths from single-source step) is longer
-            than max_path_len.
+            A tuple of the list of candidate midpoints, in the order of
+            get_all_nodes, and an array of their scores. Nodes for whom the
+            full path through that node (using paths from single-source step)
+            is longer than max_path_len are filtered out. The score of a node
+            is a lower bound on the elevation gain achievable by having that
+            node on our path.
 
         Raises:
             An Exception if we have not yet computed the single source data.
         """
         if self._single_source_data is None:
-            raise Exception(SS_NOT_COMPUTED_MSG)
-
-        ele_start = self._elevation(start)
-        ele_end = self._elevation(end)
-
-        min_of_start_and_end = min([ele_start, ele_end])
-        def dips_below_min(node):
-            return self._elevation(node) < min_of_start_and_end
+            raise Exception(self.SS_NOT_COMPUTED_MSG)
 
         dists_from_start = self._single_source_data['start']['dist']
         dists_to_end = self._single_source_data['end']['dist']
-        def filter_func(node):
-            # We are only interested in intermediate nodes
-            #if node == start or node == end:
-            #    return False
+        reached = dists_from_start.keys() & dists_to_end.keys()
+        nodes = [node for node in self.graph_provider.get_all_nodes() if node in reached]
+        dist_from_start = np.array([dists_from_start[node] for node in nodes], dtype=np.float64)
+        dist_to_end = np.array([dists_to_end[node] for node in nodes], dtype=np.float64)
+        _, _, ele = self.graph_provider.get_xyz(nodes)
 
-            # Filter out nodes for which full path through that node (using
-            # paths from single-source step) is longer than maximum allowed
-            dist_from_start = dists_from_start[node]
-            dist_to_end = dists_to_end[node]
-            if dist_from_start + dist_to_end > max_path_len:
-                return False
-
-            # Check that there is at least a hope of elevation gain
-            if not dips_below_min(node) and self._elevation(node) < ele_start:
-                return False
-
-            return True
-
-        return filter_func
-
-    def _sort_func_factory(self, start, end):
-        """Creates a function used for sorting candidate midpoints.
+        ele_start = self._elevation(start)
+        ele_end = self._elevation(end)
+        min_of_start_and_end = min([ele_start, ele_end])
 
-        In particular, we seek to sort them in terms of a lower bound on the
-        elevation gain achievable by having that point on the path from start
-        to end.
+        # Filter out nodes for which full path through that node is longer than maximum allowed
+        keep = dist_from_start + dist_to_end <= max_path_len
+        # Check that there is at least a hope of elevation gain (comparisons
+        # are written so that unknown elevations keep the node)
+        hopeless = ~(ele < min_of_start_and_end) & (ele < ele_start)
+        keep &= ~hopeless
+        candidates = [node for node, kept in zip(nodes, keep.tolist()) if kept]
+        ele = ele[keep]
+
+        # Potential elevation gain for path segments from start to node and
+        # from node to end, unknown elevations giving none
+        potential_gain_prefix = np.fmax(0., ele - ele_start)
+        potential_gain_suffix = np.fmax(0., ele_end - ele)
+        return candidates, np.maximum(potential_gain_prefix, potential_gain_suffix)
+
+    def _rank_candidates(self, candidates, scores, batch_size):
+        """Yield candidate midpoints from the highest score down.
+
+        Only the candidates consumed are sorted: each batch is picked out
+        of the remaining candidates by a partial selection, and twice as
+        many are picked in the next batch. Candidates of equal score come
+        in their original order.
 
         Args:
-            start: The start node for paths of interest.
-            end: The end node for paths of interest.
+            candidates: A list of candidate midpoints.
+            scores: An array of the scores of the candidates.
+            batch_size: The number of candidates sorted first.
 
-        Returns:
-            A function that takes in a node and returns a lower bound on the
-            elevation gain achievable by having that node on our path. It can
-            therefore be used straightforwardly to sort the candidate
-            midpoints.
+        Yields:
+            The candidate midpoints, best first.
         """
-        ele_start = self._elevation(start)
-        ele_end = self._elevation(end)
-
-        def sort_func(node):
-            node_ele = self._elevation(node)
-            # Potential elevation gain for path segment from start to node
-            potential_gain_prefix = max([0., node_ele - ele_start])
-            # Potential elevation gain for path segment from node to end
-            potential_gain_suffix = max([0., ele_end - node_ele])
-            return max([potential_gain_prefix, potential_gain_suffix])
-
-        return sort_func
+        remaining = np.arange(len(candidates))
+        while len(remaining) > 0:
+            if batch_size < len(remaining):
+                remaining_scores = scores[remaining]
+                kth = len(remaining) - batch_size
+                threshold = np.partition(remaining_scores, kth)[kth]
+                # Ties with the threshold all go in this batch, to keep their order
+                batch = remaining[remaining_scores >= threshold]
+                remaining = remaining[remaining_scores < threshold]
+            else:
+                batch = remaining
+                remaining = remaining[:0]
+            # Indices are increasing, so a stable sort keeps ties in order
+            batch = batch[np.argsort(-scores[batch], kind='stable')]
+            for i in batch.tolist():
+                yield candidates[i]
+            batch_size *= 2
 
     def _select_and_prune(self, sorted_candidates, keep_n, prune_depth):
         """Given sorted candidate nodes, cleverly select high-quality ones.
 
         Args:
+            sorted_candidates: An iterable of candidate nodes, best first.
+                It is only consumed until enough candidates are selected.
             keep_n: The maximum number of candidates to select. We may select
                 fewer due to pruning or to the limited number of candidates.
             prune_depth: Each time we select a midpoint, remove from our pool
@@ -161,20 +228,23 @@ class MidpointMiracle(SearchAlgorithm):
             A list of at most 'keep_n' selected candidate midpoints.
         """
         selected_midpoints = []
-        while(len(sorted_candidates) > 0 and len(selected_midpoints) < keep_n):
-            curr = sorted_candidates.pop(0)
+        pruned = set()
+        for curr in sorted_candidates:
+            if len(selected_midpoints) >= keep_n:
+                break
+            if curr in pruned:
+                continue
             selected_midpoints.append(curr)
 
             # Prune away neighbors so that we select a diverse set of midpoints
             if prune_depth > 0:
-                pruned = set(self.graph_provider.get_neighbors(curr))
-                old_neighbors = pruned
+                old_neighbors = set(self.graph_provider.get_neighbors(curr))
+                pruned.update(old_neighbors)
                 for _ in range(prune_depth - 1):
                     new_neighbors = [n for node in old_neighbors for n in self.graph_provider.get_neighbors(node)]
                     new_neighbors = set(new_neighbors)
-                    pruned = pruned.union(new_neighbors)
+                    pruned.update(new_neighbors)
                     old_neighbors = new_neighbors
-                sorted_candidates = [node for node in sorted_candidates if node not in pruned]
 
         return selected_midpoints
 
@@ -314,7 +384,7 @@ class MidpointMiracle(SearchAlgorithm):
             An Exception if we have not computed the single-source data yet.
         """
         if self._single_source_data is None:
-            raise Exception(SS_NOT_COMPUTED_MSG)
+            raise Exception(self.SS_NOT_COMPUTED_MSG)
         ss_start = self._single_source_data['start']
         ss_end = self._single_source_data['end']
 
@@ -341,13 +411,11 @@ class MidpointMiracle(SearchAlgorithm):
             find by analyzing potential midpoints and choosing the best among
             a small set of high-quality ones.
         """
-        self._compute_single_source_data(start, end)
+        self._compute_single_source_data(start, end, max_path_len)
 
-        # Filter and sort candidate midpoints
-        filter_func = self._filter_func_factory(start, end, max_path_len)
-        midpoint_candidates = filter(filter_func, self.graph_provider.get_all_nodes())
-        sort_func = self._sort_func_factory(start, end)
-        sorted_candidates = sorted(midpoint_candidates, key=sort_func, reverse=True)
+        # Filter and sort candidate midpoints, sorting only those selection goes through
+        candidates, scores = self._score_candidates(start, end, max_path_len)
+        sorted_candidates = self._rank_candidates(candidates, scores, max(keep_n, 1))
 
         # Cleverly select some high-quality candidates and build full-path SearchResult's
         selected_midpoints = self._select_and_prune(sorted_candidates, keep_n, prune_depth)
@@ -359,4 +427,3 @@ class MidpointMiracle(SearchAlgorithm):
                 best_res = r
 
         return best_res
-
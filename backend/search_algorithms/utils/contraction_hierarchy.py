@@ -0,0 +1,279 @@
+"""Contains a class preprocessing a graph into a contraction hierarchy.
+
+Building a hierarchy takes a while, so it is meant to be done offline for
+the areas served constantly, from a snapshot of their graph:
+
+    python -m backend.search_algorithms.utils.contraction_hierarchy <snapshot> <output>
+
+and loaded by each worker at startup with ContractionHierarchy.load.
+"""
+import heapq
+import math
+import os
+import sys
+import numpy as np
+
+# Maximum number of nodes a witness search settles before giving up, in
+# which case a shortcut is added even though it may not be needed
+WITNESS_SETTLE_LIMIT = 100
+
+
+class ContractionHierarchy:
+    """A graph augmented with shortcuts, where every node is given a rank.
+
+    Nodes are contracted one at a time, least important first: a node is
+    removed from the graph, and a shortcut edge is added between two of its
+    neighbors whenever the path through it was the only shortest path
+    between them. A node's importance is the number of shortcuts its
+    contraction adds, minus the number of edges it removes, plus the number
+    of its neighbors already contracted, which spreads contractions evenly.
+
+    Every edge of the final graph leads either up, to a node of higher
+    rank, or down. A shortest path always goes up and then down, so a
+    query only follows upward edges from both ends (see
+    ContractionHierarchySearch), and visits a few hundred nodes at most.
+    Shortcuts remember the node they bypass, so paths can be unpacked into
+    edges of the original graph.
+
+    Attributes:
+        rank: A dict mapping each node to its contraction order.
+    """
+
+    def __init__(self, rank, edges):
+        """Assemble a hierarchy from its ranks and edges.
+
+        Args:
+            rank: A dict mapping each node to its contraction order.
+            edges: An iterable of (u, v, length, gain, middle) tuples, one per
+                edge of the augmented graph, where middle is the node a
+                shortcut bypasses, or None for an edge of the original graph.
+        """
+        self.rank = rank
+        # Map u -> v -> (length, gain, middle) for edges leading up from u...
+        self._up = {node: {} for node in rank}
+        # ...and v -> u -> (length, gain, middle) for edges leading down to v
+        self._down = {node: {} for node in rank}
+        for u, v, length, gain, middle in edges:
+            if rank[u] < rank[v]:
+                self._up[u][v] = (length, gain, middle)
+            else:
+                self._down[v][u] = (length, gain, middle)
+
+    @classmethod
+    def from_provider(cls, graph_provider, witness_settle_limit=WITNESS_SETTLE_LIMIT):
+        """Contract the graph of a provider.
+
+        Lazy loading is disabled meanwhile, so only the graph the provider
+        has already loaded is preprocessed.
+
+        Args:
+            graph_provider: The GraphProvider whose graph is preprocessed.
+            witness_settle_limit: Optional; the number of nodes a witness
+                search may settle.
+
+        Returns:
+            The ContractionHierarchy of the graph.
+        """
+        lazy_loading_enabled = getattr(graph_provider, 'lazy_loading_enabled', None)
+        graph_provider.lazy_loading_enabled = False
+        try:
+            nodes = list(graph_provider.get_all_nodes())
+            # Map u -> v -> (length, gain, middle) of the remaining graph, both ways
+            out_edges = {node: {} for node in nodes}
+            in_edges = {node: {} for node in nodes}
+            for u in nodes:
+                for v, length, gain in graph_provider.get_neighbor_edges(u):
+                    if v == u or v not in out_edges:
+                        continue
+                    if v not in out_edges[u] or length < out_edges[u][v][0]:
+                        out_edges[u][v] = in_edges[v][u] = (length, gain, None)
+        finally:
+            if lazy_loading_enabled is None:
+                del graph_provider.lazy_loading_enabled
+            else:
+                graph_provider.lazy_loading_enabled = lazy_loading_enabled
+
+        def witness_distances(source, avoided, max_dist, targets):
+            """Run a limited Dijkstra from source in the remaining graph, avoiding a node."""
+            dist = {source: 0.}
+            queue = [(0., source)]
+            remaining = set(targets)
+            settled = 0
+            while len(queue) > 0 and len(remaining) > 0 and settled < witness_settle_limit:
+                d, node = heapq.heappop(queue)
+                if d > dist[node]:
+                    continue
+                if d > max_dist:
+                    break
+                settled += 1
+                remaining.discard(node)
+                for neighbor, (length, _, _) in out_edges[node].items():
+                    alt_dist = d + length
+                    if neighbor != avoided and alt_dist < dist.get(neighbor, math.inf):
+                        dist[neighbor] = alt_dist
+                        heapq.heappush(queue, (alt_dist, neighbor))
+            return dist
+
+        def shortcuts_for(node):
+            """Find the shortcuts needed to contract a node."""
+            shortcuts = []
+            for u, (length_in, gain_in, _) in in_edges[node].items():
+                targets = {w: length_in + edge[0] for w, edge in out_edges[node].items() if w != u}
+                if len(targets) == 0:
+                    continue
+                dist = witness_distances(u, node, max(targets.values()), targets)
+                for w, length in targets.items():
+                    if dist.get(w, math.inf) > length:
+                        shortcuts.append((u, w, length, gain_in + out_edges[node][w][1]))
+            return shortcuts
+
+        contracted_neighbors = {node: 0 for node in nodes}
+
+        def priority(node, shortcuts):
+            removed = len(in_edges[node]) + len(out_edges[node])
+            return len(shortcuts) - removed + contracted_neighbors[node]
+
+        queue = [(priority(node, shortcuts_for(node)), i, node) for i, node in enumerate(nodes)]
+        heapq.heapify(queue)
+        rank = {}
+        edges = []
+        while len(queue) > 0:
+            _, i, node = heapq.heappop(queue)
+            # Priorities change as neighbors are contracted: check it is still the least important
+            shortcuts = shortcuts_for(node)
+            node_priority = priority(node, shortcuts)
+            if len(queue) > 0 and node_priority > queue[0][0]:
+                heapq.heappush(queue, (node_priority, i, node))
+                continue
+
+            rank[node] = len(rank)
+            for u, w, length, gain in shortcuts:
+                if w not in out_edges[u] or length < out_edges[u][w][0]:
+                    out_edges[u][w] = in_edges[w][u] = (length, gain, node)
+            # The edges left around the node lead to nodes contracted later
+            for w, (length, gain, middle) in out_edges.pop(node).items():
+                edges.append((node, w, length, gain, middle))
+                del in_edges[w][node]
+                contracted_neighbors[w] += 1
+            for u, (length, gain, middle) in in_edges.pop(node).items():
+                edges.append((u, node, length, gain, middle))
+                del out_edges[u][node]
+                contracted_neighbors[u] += 1
+
+        return cls(rank, edges)
+
+    @property
+    def num_shortcuts(self):
+        """The number of shortcut edges added by the contraction."""
+        return sum(
+            1 for table in [self._up, self._down] for row in table.values()
+            for _, _, middle in row.values() if middle is not None
+        )
+
+    def get_upward_edges(self, node):
+        """Get the edges leading from a node to nodes of higher rank.
+
+        Returns:
+            A list of (neighbor, length) tuples.
+        """
+        return [(neighbor, edge[0]) for neighbor, edge in self._up[node].items()]
+
+    def get_downward_edges(self, node):
+        """Get the edges leading to a node from nodes of higher rank.
+
+        Returns:
+            A list of (predecessor, length) tuples.
+        """
+        return [(pred, edge[0]) for pred, edge in self._down[node].items()]
+
+    def _edge(self, u, v):
+        """Get the (length, gain, middle) of the edge from u to v."""
+        if self.rank[u] < self.rank[v]:
+            return self._up[u][v]
+        return self._down[v][u]
+
+    def unpack_edges(self, path):
+        """Replace the shortcuts along a path by the original edges they bypass.
+
+        Args:
+            path: A list of nodes, consecutive nodes being joined by an edge
+                of the hierarchy.
+
+        Returns:
+            The list of (u, v, length, gain) tuples of the original edges
+            along the path, in order.
+        """
+        unpacked = []
+        for u, v in zip(path[:-1], path[1:]):
+            stack = [(u, v)]
+            while len(stack) > 0:
+                a, b = stack.pop()
+                length, gain, middle = self._edge(a, b)
+                if middle is None:
+                    unpacked.append((a, b, length, gain))
+                else:
+                    stack.append((middle, b))
+                    stack.append((a, middle))
+        return unpacked
+
+    def save(self, path):
+        """Write the hierarchy to a file.
+
+        Args:
+            path: The path of the file.
+        """
+        nodes = sorted(self.rank, key=self.rank.get)
+        edges = [
+            (u, v) + edge
+            for table, upward in [(self._up, True), (self._down, False)]
+            for a, row in table.items() for b, edge in row.items()
+            for u, v in [(a, b) if upward else (b, a)]
+        ]
+        middles = [self.rank[middle] if middle is not None else -1 for _, _, _, _, middle in edges]
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                node_ids=np.array(nodes, dtype=np.int64),
+                sources=np.array([self.rank[u] for u, _, _, _, _ in edges], dtype=np.int64),
+                targets=np.array([self.rank[v] for _, v, _, _, _ in edges], dtype=np.int64),
+                lengths=np.array([length for _, _, length, _, _ in edges], dtype=np.float64),
+                gains=np.array([gain for _, _, _, gain, _ in edges], dtype=np.float64),
+                middles=np.array(middles, dtype=np.int64)
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a hierarchy written by save.
+
+        Args:
+            path: The path of the file.
+
+        Returns:
+            The ContractionHierarchy stored in the file.
+        """
+        with np.load(path) as data:
+            # Nodes are stored in rank order
+            nodes = data['node_ids'].tolist()
+            sources = data['sources'].tolist()
+            targets = data['targets'].tolist()
+            lengths = data['lengths'].tolist()
+            gains = data['gains'].tolist()
+            middles = data['middles'].tolist()
+        rank = {node: i for i, node in enumerate(nodes)}
+        edges = (
+            (nodes[u], nodes[v], length, gain, nodes[middle] if middle >= 0 else None)
+            for u, v, length, gain, middle in zip(sources, targets, lengths, gains, middles)
+        )
+        return cls(rank, edges)
+
+
+if __name__ == '__main__':
+    from backend.graph_providers.array_graph_provider import ArrayGraphProvider
+
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python -m backend.search_algorithms.utils.contraction_hierarchy <snapshot> <output>")
+    hierarchy = ContractionHierarchy.from_provider(ArrayGraphProvider.from_snapshot(sys.argv[1]))
+    hierarchy.save(sys.argv[2])
+    print(f"Contracted {len(hierarchy.rank)} nodes, adding {hierarchy.num_shortcuts} shortcuts")
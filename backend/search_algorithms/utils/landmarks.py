@@ -0,0 +1,310 @@
+"""Contains a class computing landmark (ALT) lower bounds on path lengths.
+"""
+import heapq
+import math
+import os
+import numpy as np
+
+# Number of landmarks picked by default
+DEFAULT_NUM_LANDMARKS = 8
+
+
+class Landmarks:
+    """Shortest-path distances to and from a few landmarks, used as an A* heuristic.
+
+    For any landmark L, the triangle inequality gives two lower bounds on
+    the length d(v, t) of a path from v to t:
+
+        d(L, t) - d(L, v)   and   d(v, L) - d(t, L)
+
+    The heuristic is the largest of these bounds over all landmarks, which
+    is admissible and consistent. Landmarks are picked far apart, one at a
+    time, as the node farthest from those already picked, so that they
+    surround the graph and bound paths in every direction.
+
+    The tables need not hold exact distances: the bounds stay admissible
+    and consistent as long as d(L, v) <= d(L, u) + length(u, v) and
+    d(u, L) <= length(u, v) + d(v, L) for every edge (u, v). Removing edges
+    keeps this true, and when edges are added, the distances are lowered
+    where this stops holding. The tables can therefore follow a graph which
+    grows and shrinks without being recomputed, at the cost of looser
+    bounds once parts of the graph were removed. They can also be saved to
+    a file next to a frozen graph.
+
+    These guarantees hold for the graph between two changes. A search should
+    therefore read a snapshot of the tables taken when it starts, so that the
+    bounds do not change under the nodes it already queued. A search which
+    grows the graph while it runs still only gets bounds for the graph as it
+    was when it started, so its path is no longer guaranteed to be the
+    shortest.
+
+    Attributes:
+        num_landmarks: The number of landmarks to pick.
+        landmarks: The list of picked landmark node ids.
+        forward: Array of shape (landmarks, nodes) holding d(L, v).
+        backward: Array of shape (landmarks, nodes) holding d(v, L).
+    """
+
+    def __init__(self, num_landmarks=DEFAULT_NUM_LANDMARKS):
+        self.num_landmarks = num_landmarks
+        self._reset()
+
+    def _reset(self):
+        """Forget all landmarks and distances."""
+        self.landmarks = []
+        self.forward = np.empty((0, 0))
+        self.backward = np.empty((0, 0))
+        self._index = {}
+        # Whether a snapshot shares the tables, which must then be copied
+        # before they are changed in place
+        self._shared = False
+
+    @classmethod
+    def from_provider(cls, graph_provider, num_landmarks=DEFAULT_NUM_LANDMARKS):
+        """Pick landmarks in the graph of a provider and compute their distances.
+
+        Args:
+            graph_provider: The GraphProvider whose graph is preprocessed.
+            num_landmarks: Optional; the number of landmarks to pick.
+
+        Returns:
+            The Landmarks of the graph.
+        """
+        landmarks = cls(num_landmarks)
+        landmarks.build(graph_provider)
+        return landmarks
+
+    def snapshot(self):
+        """Freeze the current bounds for one search.
+
+        The snapshot shares the tables, which these landmarks copy before
+        they next change, so taking it is cheap and its bounds stay fixed
+        while the graph grows and shrinks.
+
+        Returns:
+            A Landmarks holding the current landmarks and distances.
+        """
+        frozen = Landmarks(self.num_landmarks)
+        frozen.landmarks = list(self.landmarks)
+        frozen.forward = self.forward
+        frozen.backward = self.backward
+        frozen._index = self._index
+        self._shared = True
+        return frozen
+
+    def _unshare(self):
+        """Copy the tables if a snapshot shares them, before changing them in place."""
+        if self._shared:
+            self.forward = self.forward.copy()
+            self.backward = self.backward.copy()
+            self._index = dict(self._index)
+            self._shared = False
+
+    def _register(self, nodes):
+        """Add columns of infinite distances for nodes not seen before.
+
+        Args:
+            nodes: An iterable of node ids.
+        """
+        new_nodes = [node for node in nodes if node not in self._index]
+        if len(new_nodes) == 0:
+            return
+        for node in new_nodes:
+            self._index[node] = len(self._index)
+        padding = np.full((len(self.landmarks), len(new_nodes)), math.inf)
+        self.forward = np.hstack((self.forward, padding))
+        self.backward = np.hstack((self.backward, padding.copy()))
+
+    def _relax(self, row, seeds, edges_of):
+        """Run Dijkstra from some nodes, lowering the distances of a table row in place.
+
+        Starting from nodes whose distance is already known, this only
+        visits nodes whose distance goes down, so it computes the distances
+        from scratch when seeded with a landmark alone, and repairs them
+        after edges were added when seeded with the tails of the new edges.
+
+        Args:
+            row: A row of 'forward' or 'backward', indexed like the nodes.
+            seeds: An iterable of node ids to start from.
+            edges_of: A function mapping a node to a list of (neighbor,
+                length, gain) tuples to follow.
+        """
+        index = self._index
+        queue = [(row[index[node]], node) for node in seeds if row[index[node]] < math.inf]
+        heapq.heapify(queue)
+        while len(queue) > 0:
+            dist, node = heapq.heappop(queue)
+            if dist > row[index[node]]:
+                continue
+            for neighbor, length, _ in edges_of(node):
+                j = index[neighbor]
+                alt_dist = dist + length
+                if alt_dist < row[j]:
+                    row[j] = alt_dist
+                    heapq.heappush(queue, (alt_dist, neighbor))
+
+    def _add_landmark(self, graph_provider, landmark):
+        """Append the distance rows of a new landmark."""
+        n = len(self._index)
+        forward = np.full(n, math.inf)
+        backward = np.full(n, math.inf)
+        forward[self._index[landmark]] = 0.
+        backward[self._index[landmark]] = 0.
+        self._relax(forward, [landmark], graph_provider.get_neighbor_edges)
+        self._relax(backward, [landmark], graph_provider.get_predecessor_edges)
+        self.landmarks.append(landmark)
+        self.forward = np.vstack((self.forward, forward))
+        self.backward = np.vstack((self.backward, backward))
+
+    def build(self, graph_provider):
+        """Pick the landmarks and compute their distances from scratch.
+
+        Lazy loading is disabled meanwhile, so only the graph the provider
+        has already loaded is preprocessed.
+
+        Args:
+            graph_provider: The GraphProvider whose graph is preprocessed.
+        """
+        lazy_loading_enabled = getattr(graph_provider, 'lazy_loading_enabled', None)
+        graph_provider.lazy_loading_enabled = False
+        try:
+            self._reset()
+            nodes = list(graph_provider.get_all_nodes())
+            if len(nodes) == 0:
+                return
+            self._register(nodes)
+            # Start from the node farthest from an arbitrary one
+            seed = np.full(len(nodes), math.inf)
+            seed[0] = 0.
+            self._relax(seed, [nodes[0]], graph_provider.get_neighbor_edges)
+            farthest = np.where(np.isfinite(seed), seed, -1.)
+            candidate = nodes[int(np.argmax(farthest))]
+            while len(self.landmarks) < min(self.num_landmarks, len(nodes)):
+                self._add_landmark(graph_provider, candidate)
+                # The next landmark is the node farthest from all picked ones
+                closest = self.forward.min(axis=0) + self.backward.min(axis=0)
+                closest = np.where(np.isfinite(closest), closest, -1.)
+                closest[[self._index[landmark] for landmark in self.landmarks]] = -1.
+                if closest.max() <= 0.:
+                    break
+                candidate = nodes[int(np.argmax(closest))]
+        finally:
+            if lazy_loading_enabled is None:
+                del graph_provider.lazy_loading_enabled
+            else:
+                graph_provider.lazy_loading_enabled = lazy_loading_enabled
+
+    def update(self, graph_provider, nodes):
+        """Extend the distances after edges were added to the graph.
+
+        Edges can only shorten paths, so distances are repaired by running
+        Dijkstra again from the nodes whose edges changed, which only visits
+        the nodes whose distance goes down. If no landmarks were picked yet,
+        the landmarks are built from scratch instead.
+
+        Args:
+            graph_provider: The GraphProvider whose graph grew.
+            nodes: An iterable of the ids of the nodes whose outgoing edges
+                were added or shortened, including all new nodes.
+        """
+        if len(self.landmarks) == 0:
+            self.build(graph_provider)
+            return
+        self._unshare()
+        lazy_loading_enabled = getattr(graph_provider, 'lazy_loading_enabled', None)
+        graph_provider.lazy_loading_enabled = False
+        try:
+            nodes = list(nodes)
+            # New edges lead from the changed nodes to their neighbors
+            heads = set(nodes)
+            for node in nodes:
+                heads.update(neighbor for neighbor, _, _ in graph_provider.get_neighbor_edges(node))
+            self._register(nodes)
+            self._register(heads)
+            for i in range(len(self.landmarks)):
+                self._relax(self.forward[i], nodes, graph_provider.get_neighbor_edges)
+                self._relax(self.backward[i], heads, graph_provider.get_predecessor_edges)
+        finally:
+            if lazy_loading_enabled is None:
+                del graph_provider.lazy_loading_enabled
+            else:
+                graph_provider.lazy_loading_enabled = lazy_loading_enabled
+
+    def remove(self, nodes):
+        """Drop the distances of nodes removed from the graph.
+
+        The distances of the remaining nodes are kept: paths only got longer,
+        so they still give valid bounds. Removed nodes which come back later
+        start over from an infinite distance, which update lowers again.
+
+        Args:
+            nodes: An iterable of the ids of the removed nodes.
+        """
+        removed = [self._index[node] for node in nodes if node in self._index]
+        if len(removed) == 0:
+            return
+        keep = np.ones(len(self._index), dtype=bool)
+        keep[removed] = False
+        kept_nodes = [node for node, i in self._index.items() if keep[i]]
+        self.forward = self.forward[:, keep]
+        self.backward = self.backward[:, keep]
+        self._index = {node: i for i, node in enumerate(kept_nodes)}
+
+    def heuristic(self, node, target):
+        """Get a lower bound on the length of a path between two nodes.
+
+        Args:
+            node: The node the path starts from.
+            target: The node the path leads to.
+
+        Returns:
+            The largest landmark bound, or 0 if there is none.
+        """
+        i = self._index.get(node)
+        j = self._index.get(target)
+        if i is None or j is None:
+            return 0.
+        forward = self.forward
+        backward = self.backward
+        with np.errstate(invalid='ignore'):
+            bounds = np.concatenate((forward[:, j] - forward[:, i], backward[:, i] - backward[:, j]))
+        # Infinite bounds would prove that there is no path, but the graph
+        # may still grow, so they are ignored: the heuristic is then only
+        # consistent among the nodes which can reach the target
+        bounds = bounds[np.isfinite(bounds)]
+        if len(bounds) == 0:
+            return 0.
+        return max(0., float(bounds.max()))
+
+    def save(self, path):
+        """Write the landmarks and their distance tables to a file.
+
+        Args:
+            path: The path of the file, which is typically kept next to the
+                snapshot of the graph the landmarks were computed on.
+        """
+        node_ids = np.array(list(self._index), dtype=np.int64)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, node_ids=node_ids, landmarks=np.array(self.landmarks, dtype=np.int64),
+                     forward=self.forward, backward=self.backward,
+                     num_landmarks=np.int64(self.num_landmarks))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read landmarks written by save.
+
+        Args:
+            path: The path of the file.
+
+        Returns:
+            The Landmarks stored in the file.
+        """
+        with np.load(path) as data:
+            landmarks = cls(int(data['num_landmarks']))
+            landmarks.landmarks = data['landmarks'].tolist()
+            landmarks.forward = data['forward']
+            landmarks.backward = data['backward']
+            landmarks._index = {node: i for i, node in enumerate(data['node_ids'].tolist())}
+        return landmarks
@@ -0,0 +1,145 @@
+"""Contains a class estimating path lengths from the great-circle distance between nodes.
+"""
+import numpy as np
+
+# Mean radius of the earth in meters, as used by osmnx to measure edge lengths
+EARTH_RADIUS = 6371009.
+
+# Number of targets whose distance vectors are kept, enough for the two
+# endpoints of a bidirectional search
+NUM_CACHED_TARGETS = 2
+
+# Edges whose ends are closer than this, in meters, do not bound the scale:
+# osmnx rounds edge lengths, so nodes a fraction of a millimeter apart can be
+# joined by an edge of length 0
+MIN_MEASURED_DISTANCE = 0.01
+
+
+def haversine(lng1, lat1, lng2, lat2):
+    """Compute great-circle distances in meters, elementwise.
+
+    Args:
+        lng1: The longitudes of the first points, in degrees.
+        lat1: The latitudes of the first points, in degrees.
+        lng2: The longitudes of the second points, in degrees.
+        lat2: The latitudes of the second points, in degrees.
+
+    Returns:
+        An array of the distances between the points.
+    """
+    lng1, lat1, lng2, lat2 = (np.radians(a) for a in (lng1, lat1, lng2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.)))
+
+
+class MetricHeuristic:
+    """Great-circle distances to the target node, used as an A* heuristic.
+
+    Node positions are in degrees while edge lengths are in meters, so the
+    straight-line distance between positions grossly underestimates path
+    lengths. The great-circle distance in meters does not, and since it
+    obeys the triangle inequality, it is a consistent heuristic as long as
+    no edge is shorter than the distance between its ends.
+
+    Edge lengths need not be measured the same way, so on graphs which are
+    not geographic the distances are scaled by the smallest ratio of an
+    edge length to the distance between its ends, capped at 1, ignoring
+    edges between nodes too close to measure. The heuristic then stays
+    consistent on any graph. On street networks, where edges are at least
+    as long as the straight line between their ends, it is the plain
+    great-circle distance, and the edges are not read at all.
+
+    Positions and the scale are read once, when the heuristic is first
+    used. The distances from all nodes to a target are then computed in one
+    vectorized pass the first time the target is asked for, and looked up
+    afterwards. Distances are symmetric, so the vector of either end of a
+    path will do. Nodes the graph gained since fall back to a single
+    distance.
+
+    Attributes:
+        graph_provider: The GraphProvider whose nodes are measured.
+        scale: The factor applied to great-circle distances, known once the
+            heuristic was first used.
+    """
+
+    def __init__(self, graph_provider):
+        self.graph_provider = graph_provider
+        self._index = None
+        # Map the most recent targets to their distance vectors
+        self._distances = {}
+
+    def _prepare(self):
+        """Read the positions of all nodes and the scale of the graph.
+
+        The graph is read through the static view of the provider, so only
+        the part already loaded is measured, and none of it is held on to.
+        """
+        geographic = self.graph_provider.geographic
+        with self.graph_provider.static_view() as graph_provider:
+            nodes = list(graph_provider.get_all_nodes())
+            self._index = {node: i for i, node in enumerate(nodes)}
+            self._lng, self._lat, _ = graph_provider.get_xyz(nodes)
+            if geographic:
+                self.scale = 1.
+                return
+            sources = []
+            targets = []
+            lengths = []
+            for i, node in enumerate(nodes):
+                for neighbor, length, _ in graph_provider.get_neighbor_edges(node):
+                    j = self._index.get(neighbor)
+                    if j is not None:
+                        sources.append(i)
+                        targets.append(j)
+                        lengths.append(length)
+
+        sources = np.array(sources, dtype=np.int64)
+        targets = np.array(targets, dtype=np.int64)
+        distances = haversine(self._lng[sources], self._lat[sources], self._lng[targets], self._lat[targets])
+        # Edges between nodes too close to measure (or at an unknown position) bound nothing
+        measured = distances >= MIN_MEASURED_DISTANCE
+        ratios = np.array(lengths, dtype=np.float64)[measured] / distances[measured]
+        self.scale = min(1., float(ratios.min())) if len(ratios) > 0 else 1.
+
+    def distances_to(self, target):
+        """Estimate the distances from all nodes to a target.
+
+        Args:
+            target: The node id of the target.
+
+        Returns:
+            An array of the estimates, indexed like the nodes were when the
+            heuristic was first used, or None if the target is unknown.
+        """
+        if self._index is None:
+            self._prepare()
+        if target not in self._distances:
+            j = self._index.get(target)
+            if j is None:
+                return None
+            if len(self._distances) >= NUM_CACHED_TARGETS:
+                del self._distances[next(iter(self._distances))]
+            distances = self.scale * haversine(self._lng, self._lat, self._lng[j], self._lat[j])
+            # Unknown positions give no bound
+            self._distances[target] = np.nan_to_num(distances, nan=0.)
+        return self._distances[target]
+
+    def heuristic(self, node, target):
+        """Get a lower bound on the length of a path between two nodes.
+
+        Args:
+            node: The node the path starts from.
+            target: The node the path leads to.
+
+        Returns:
+            The scaled great-circle distance between the nodes.
+        """
+        if target not in self._distances and node in self._distances:
+            node, target = target, node
+        distances = self.distances_to(target)
+        i = self._index.get(node)
+        if distances is not None and i is not None:
+            return float(distances[i])
+        lng, lat, _ = self.graph_provider.get_xyz([node, target])
+        distance = self.scale * haversine(lng[0], lat[0], lng[1], lat[1])
+        return float(np.nan_to_num(distance, nan=0.))
@@ -0,0 +1,110 @@
+"""Contains a class implementing an indexed priority queue for graph searches.
+"""
+
+# Number of children of each heap node: wider heaps are shallower, which
+# makes the frequent priority updates of searches cheaper
+ARITY = 4
+
+
+class PriorityQueue:
+    """A min-heap of keys, such as node ids, which knows where each key is.
+
+    The priority of a key already in the queue can be changed in place in
+    logarithmic time, instead of rebuilding the heap. Entries are plain
+    (priority, count, key) tuples, compared without calling back into
+    Python: the count orders keys of equal priority first-in first-out,
+    and is renewed whenever a priority changes.
+    """
+
+    def __init__(self):
+        self._heap = []
+        # Map each key to the index of its entry in the heap
+        self._position = {}
+        self._count = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, key):
+        return key in self._position
+
+    def __getitem__(self, key):
+        return self._heap[self._position[key]][0]
+
+    def __setitem__(self, key, priority):
+        """Add a key to the queue, or change its priority.
+
+        Args:
+            key: The key, which must be hashable.
+            priority: The new priority of the key.
+        """
+        entry = (priority, self._count, key)
+        self._count += 1
+        i = self._position.get(key)
+        if i is None:
+            self._heap.append(entry)
+            self._sift_up(len(self._heap) - 1, entry)
+        elif entry < self._heap[i]:
+            self._sift_up(i, entry)
+        else:
+            self._sift_down(i, entry)
+
+    def peekitem(self):
+        """Get the key of lowest priority without removing it.
+
+        Returns:
+            A (key, priority) tuple.
+
+        Raises:
+            IndexError: If the queue is empty.
+        """
+        priority, _, key = self._heap[0]
+        return key, priority
+
+    def popitem(self):
+        """Remove the key of lowest priority.
+
+        Returns:
+            A (key, priority) tuple.
+
+        Raises:
+            IndexError: If the queue is empty.
+        """
+        priority, _, key = self._heap[0]
+        del self._position[key]
+        last = self._heap.pop()
+        if len(self._heap) > 0:
+            self._sift_down(0, last)
+        return key, priority
+
+    def _sift_up(self, i, entry):
+        """Place an entry at index i or above, moving larger parents down."""
+        heap = self._heap
+        position = self._position
+        while i > 0:
+            parent = (i - 1) // ARITY
+            if not entry < heap[parent]:
+                break
+            heap[i] = heap[parent]
+            position[heap[i][2]] = i
+            i = parent
+        heap[i] = entry
+        position[entry[2]] = i
+
+    def _sift_down(self, i, entry):
+        """Place an entry at index i or below, moving smaller children up."""
+        heap = self._heap
+        position = self._position
+        n = len(heap)
+        while True:
+            first = ARITY * i + 1
+            if first >= n:
+                break
+            child = min(range(first, min(first + ARITY, n)), key=heap.__getitem__)
+            if not heap[child] < entry:
+                break
+            heap[i] = heap[child]
+            position[heap[i][2]] = i
+            i = child
+        heap[i] = entry
+        position[entry[2]] = i
@@ -0,0 +1,143 @@
+"""Unit tests for ArrayGraphProvider using mock data.
+"""
+import networkx as nx
+import pytest
+
+from play_graph_provider import PlayProvider
+from backend.graph_providers.graph_provider import GraphProvider
+from backend.graph_providers.array_graph_provider import ArrayGraphProvider
+from backend.search_algorithms.dijkstra import Dijkstra
+from backend.search_algorithms.midpoint_miracle import MidpointMiracle
+
+
+def build_example_graph():
+    # Same layout as the generic example in test_dijkstra, plus a longer
+    # parallel edge between 1 and 2 which should never be used
+    edges = {}
+    edges[(1,2)] = 3
+    edges[(1,3)] = 1
+    edges[(2,3)] = 7
+    edges[(2,4)] = 5
+    edges[(2,5)] = 1
+    edges[(3,4)] = 2
+    edges[(4,5)] = 7
+
+    node2ele = {1: 7., 2: 0., 3: 5., 4: 10., 5: 2.}
+
+    graph = nx.MultiDiGraph()
+    for node, ele in node2ele.items():
+        graph.add_node(node, x=float(node), y=-float(node), elevation=ele)
+    for (n1, n2), length in edges.items():
+        graph.add_edge(n1, n2, length=length)
+        graph.add_edge(n2, n1, length=length)
+    graph.add_edge(1, 2, length=30)
+    graph.add_edge(2, 1, length=30)
+    return graph
+
+
+def build_play_provider(graph):
+    nodes = list(graph.nodes)
+    neighbors = {node: list(graph.neighbors(node)) for node in nodes}
+    edges = {(n1, n2): data['length'] for n1, n2, data in graph.edges(data=True) if data['length'] < 30}
+    node2ele = {node: data['elevation'] for node, data in graph.nodes(data=True)}
+    return PlayProvider(nodes, neighbors, edges, node2ele)
+
+
+def test_from_graph():
+    graph = build_example_graph()
+    provider = ArrayGraphProvider.from_graph(graph, start=3, end=5)
+
+    assert provider.start == 3
+    assert provider.end == 5
+    assert list(provider.get_all_nodes()) == [1,2,3,4,5]
+    assert provider.get_neighbors(2) == [1,3,4,5]
+    # The shortest of the parallel edges is kept
+    assert provider.get_edge_distance(1, 2) == 3
+    assert provider.get_edge_distance(2, 1) == 3
+    assert provider.get_coords(4) == {'x': 4., 'y': -4., 'z': 10.}
+    with pytest.raises(KeyError):
+        provider.get_edge_distance(1, 5)
+    with pytest.raises(KeyError):
+        provider.get_edge_loss(1, 42)
+    # The edges of each node are grouped once, and each hop looks them up
+    assert provider.get_neighbor_edges(2) is provider.get_neighbor_edges(2)
+    assert all(type(length) is float for _, length, _ in provider.get_neighbor_edges(2))
+
+
+def test_from_provider():
+    graph = build_example_graph()
+    play_provider = build_play_provider(graph)
+    provider = ArrayGraphProvider.from_provider(play_provider)
+
+    assert list(provider.get_all_nodes()) == [1,2,3,4,5]
+    for node in graph.nodes:
+        assert provider.get_neighbors(node) == play_provider.get_neighbors(node)
+        assert provider.get_coords(node)['z'] == play_provider.get_coords(node)['z']
+        for neighbor in provider.get_neighbors(node):
+            assert provider.get_edge_distance(node, neighbor) == play_provider.get_edge_distance(node, neighbor)
+    # Lazy loading must not be left disabled on providers that did not have it
+    assert not hasattr(play_provider, 'lazy_loading_enabled')
+
+
+def test_coordinate_accessors_match_get_coords():
+    graph = build_example_graph()
+    provider = ArrayGraphProvider.from_graph(graph)
+    nodes = [4, 1, 4, 3]
+
+    for node in nodes:
+        coords = provider.get_coords(node)
+        assert provider.get_elevation(node) == coords['z']
+        assert provider.get_position(node) == (coords['x'], coords['y'])
+    x, y, z = provider.get_xyz(nodes)
+    assert x.tolist() == [4., 1., 4., 3.]
+    assert y.tolist() == [-4., -1., -4., -3.]
+    assert z.tolist() == [graph.nodes[node]['elevation'] for node in nodes]
+    assert [len(a) for a in provider.get_xyz([])] == [0, 0, 0]
+
+    for n1, n2 in graph.edges():
+        diff = graph.nodes[n2]['elevation'] - graph.nodes[n1]['elevation']
+        assert provider.get_edge_gain(n1, n2) == max(0., diff)
+        assert provider.get_edge_loss(n1, n2) == max(0., -diff)
+
+    for node in graph.nodes:
+        assert provider.get_neighbor_edges(node) == [
+            (n, provider.get_edge_distance(node, n), provider.get_edge_gain(node, n))
+            for n in provider.get_neighbors(node)
+        ]
+
+    for node in graph.nodes:
+        assert provider.get_predecessor_edges(node) == GraphProvider.get_predecessor_edges(provider, node)
+    assert sorted(provider.get_predecessor_edges(1)) == [(2, 3., 7.), (3, 1., 2.)]
+
+    # The defaults on GraphProvider go through get_coords
+    play_provider = build_play_provider(graph)
+    assert play_provider.get_elevation(4) == 10.
+    assert play_provider.get_xyz(nodes)[2].tolist() == z.tolist()
+    assert play_provider.get_edge_gain(1, 2) == provider.get_edge_gain(1, 2)
+    assert play_provider.get_edge_loss(1, 2) == provider.get_edge_loss(1, 2)
+    assert GraphProvider.get_neighbor_edges(play_provider, 2) == play_provider.get_neighbor_edges(2)
+
+
+def test_searches_match_play_provider():
+    graph = build_example_graph()
+    provider = ArrayGraphProvider.from_graph(graph)
+    play_provider = build_play_provider(graph)
+
+    for start, end in [(3, 5), (2, 3), (1, 4)]:
+        res = Dijkstra(provider).search(start, end)
+        expected = Dijkstra(play_provider).search(start, end)
+        assert res.path == expected.path
+        assert res.path_len == expected.path_len
+        assert res.ele_gain == expected.ele_gain
+
+    res = MidpointMiracle(provider).search(3, 5, 10)
+    expected = MidpointMiracle(play_provider).search(3, 5, 10)
+    assert res.path == expected.path
+    assert res.ele_gain == expected.ele_gain
+
+
+def test_nbytes():
+    provider = ArrayGraphProvider.from_graph(build_example_graph())
+    # 5 nodes with id, offset and 3 coordinates each, plus 14 edges with a
+    # target, a length, a gain and a loss
+    assert provider.nbytes == 5 * (8 + 8 + 3 * 8) + 8 + 14 * (4 + 3 * 8)
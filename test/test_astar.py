@@ -21,6 +21,9 @@ class PlayProvider(GraphProvider):
     def get_edge_distance(self, n1, n2):
         return self.edges.get((n1,n2))
 
+    def get_neighbor_edges(self, node):
+        return [(n, self.edges.get((node,n)), max(0., self.node2ele[n] - self.node2ele[node])) for n in self.neighbors[node]]
+
     def get_coords(self, node):
         return {'z': self.node2ele[node], 'x': self.coords[node][0], 'y': self.coords[node][1]}
 
@@ -0,0 +1,64 @@
+"""Unit tests for BidirectionalAStar, compared with the unidirectional searches.
+"""
+import random
+import networkx as nx
+import pytest
+
+from test_astar import build_graph_provider
+from test_contracted_graph_provider import build_chain_grid
+from backend.graph_providers.array_graph_provider import ArrayGraphProvider
+from backend.graph_providers.contracted_graph_provider import ContractedGraphProvider
+from backend.search_algorithms.a_star import AStar
+from backend.search_algorithms.bidirectional_a_star import BidirectionalAStar
+from backend.search_algorithms.dijkstra import Dijkstra
+
+
+def test_matches_astar():
+    graph_provider = build_graph_provider()
+    expected = AStar(graph_provider).search(5, 2)
+    res = BidirectionalAStar(graph_provider).search(5, 2)
+
+    assert res.path == expected.path == [5,1,2]
+    assert res.path_len == expected.path_len == 10
+    assert res.ele_gain == expected.ele_gain == 8
+
+
+def test_trivial_and_missing_paths():
+    graph = nx.MultiDiGraph()
+    for node in [1, 2, 3]:
+        graph.add_node(node, x=float(node), y=0., elevation=float(node))
+    graph.add_edge(1, 2, length=1.)
+    provider = ArrayGraphProvider.from_graph(graph)
+    search = BidirectionalAStar(provider)
+
+    res = search.search(1, 1)
+    assert res.path == [1]
+    assert res.path_len == 0
+    assert search.search(1, 2).ele_gain == 1.
+    # One-way edges are only followed forward
+    assert search.search(2, 1).path == []
+    assert search.search(1, 3).path == []
+    # Paths longer than allowed are not returned
+    assert search.search(1, 2, max_path_len=0.5).path == []
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_matches_dijkstra_on_random_graphs(seed):
+    n = 7
+    graph = build_chain_grid(n, subdivisions=2, seed=seed)
+    rng = random.Random(seed)
+    # Make some streets one-way
+    for u, v in list(graph.edges()):
+        if graph.has_edge(v, u) and rng.random() < 0.1:
+            graph.remove_edge(u, v)
+    provider = ArrayGraphProvider.from_graph(graph)
+
+    for _ in range(5):
+        start, end = rng.sample(range(n * n), 2)
+        contracted = ContractedGraphProvider(provider, keep=(start, end))
+        expected = Dijkstra(provider).search(start, end)
+        for p in [provider, contracted]:
+            res = BidirectionalAStar(p).search(start, end)
+            assert res.path_len == pytest.approx(expected.path_len)
+            assert p.expand_path(res.path) == expected.path
+            assert res.ele_gain == pytest.approx(expected.ele_gain)
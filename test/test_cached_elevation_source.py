@@ -0,0 +1,107 @@
+"""Unit tests for CachedElevationSource using a mock elevation source.
+"""
+import os
+import networkx as nx
+
+from backend.elevation_sources.elevation_source import ElevationSource
+from backend.elevation_sources.cached_elevation_source import CachedElevationSource, google_elevation_cache
+
+
+class PlaySource(ElevationSource):
+    """A mock source recording how many nodes it was asked about.
+    """
+    def __init__(self):
+        self.queried = 0
+
+    def add_node_elevations(self, graph):
+        for node, data in graph.nodes(data=True):
+            data['elevation'] = data['x'] + data['y']
+            self.queried += 1
+
+
+def build_graph(coords):
+    graph = nx.MultiDiGraph()
+    for node, (x, y) in enumerate(coords):
+        graph.add_node(node, x=x, y=y)
+    return graph
+
+
+def test_only_misses_are_fetched():
+    source = PlaySource()
+    cache = CachedElevationSource(source)
+
+    graph = build_graph([(1., 2.), (3., 4.)])
+    cache.add_node_elevations(graph)
+    assert source.queried == 2
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    # A second graph sharing a node (up to rounding) with the first
+    graph = build_graph([(1.000001, 2.), (5., 6.)])
+    cache.add_node_elevations(graph)
+    assert source.queried == 3
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert graph.nodes[0]['elevation'] == 3.
+    assert graph.nodes[1]['elevation'] == 11.
+
+    # Nothing left to fetch
+    cache.add_node_elevations(graph)
+    assert source.queried == 3
+    assert (cache.hits, cache.misses) == (3, 3)
+
+
+def test_lru_eviction():
+    source = PlaySource()
+    cache = CachedElevationSource(source, capacity=2)
+
+    cache.add_node_elevations(build_graph([(1., 1.), (2., 2.)]))
+    # Touch (1, 1) so that (2, 2) is the least recently used entry
+    cache.add_node_elevations(build_graph([(1., 1.), (3., 3.)]))
+    assert len(cache) == 2
+    assert source.queried == 3
+
+    cache.add_node_elevations(build_graph([(1., 1.)]))
+    assert source.queried == 3
+    cache.add_node_elevations(build_graph([(2., 2.)]))
+    assert source.queried == 4
+
+
+def test_disk_store(tmp_path):
+    path = os.path.join(str(tmp_path), 'elevations')
+    source = PlaySource()
+    cache = CachedElevationSource(source, capacity=1, disk_path=path)
+    cache.add_node_elevations(build_graph([(1., 1.), (2., 2.)]))
+    assert source.queried == 2
+
+    # Evicted from memory, but still on disk
+    graph = build_graph([(1., 1.), (2., 2.)])
+    cache.add_node_elevations(graph)
+    assert source.queried == 2
+    assert graph.nodes[0]['elevation'] == 2.
+
+    # Shared with a new process-wide cache
+    other_cache = CachedElevationSource(source, disk_path=path)
+    cache.close()
+    other_cache.add_node_elevations(build_graph([(2., 2.)]))
+    assert source.queried == 2
+    assert other_cache.hits == 1
+
+
+def test_shared_cache_stays_in_memory():
+    # Nothing is written to disk unless a path is configured
+    assert google_elevation_cache.disk_path is None
+    assert google_elevation_cache._get_disk() is None
+
+
+def test_disk_store_set_later(tmp_path):
+    path = os.path.join(str(tmp_path), 'elevations')
+    source = PlaySource()
+    cache = CachedElevationSource(source)
+    # The store is only opened when elevations are first fetched
+    cache.disk_path = path
+    cache.add_node_elevations(build_graph([(1., 1.)]))
+    cache.close()
+
+    other_cache = CachedElevationSource(source, disk_path=path)
+    other_cache.add_node_elevations(build_graph([(1., 1.)]))
+    assert source.queried == 1
+    other_cache.close()
@@ -0,0 +1,295 @@
+"""Unit tests for chunk eviction and frontier tracking in LoadingGraphProvider.
+
+Chunks are served from a pre-filled chunk store, so no network is needed.
+"""
+from collections import defaultdict, Counter, OrderedDict
+import networkx as nx
+import numpy as np
+import pytest
+
+from backend.graph_providers import loading_graph_provider
+from backend.graph_providers.loading_graph_provider import LoadingGraphProvider, CHUNK_SIZE
+from backend.graph_providers.utils.chunk_store import ChunkStore
+from backend.graph_providers.utils.spatial_index import GridSpatialIndex
+from backend.graph_providers.utils.chunk_loader import ChunkLoader
+from backend.graph_providers.utils.edge_table import EdgeTable
+from backend.search_algorithms.a_star import AStar
+from backend.search_algorithms.utils.landmarks import Landmarks
+from backend.search_algorithms.utils.metric_heuristic import MetricHeuristic
+
+# Grid nodes are spaced so that each chunk holds 2x2 of them
+STEP = CHUNK_SIZE / 2
+
+
+def node_id(i, j):
+    return (i + 1000) * 10000 + (j + 1000)
+
+
+def build_grid_graph(n):
+    graph = nx.MultiDiGraph()
+    for i in range(n):
+        for j in range(n):
+            graph.add_node(node_id(i, j), x=(i + 0.5) * STEP, y=(j + 0.5) * STEP, elevation=float(i * j))
+    for i in range(n):
+        for j in range(n):
+            for di, dj in [(1, 0), (0, 1)]:
+                if i + di < n and j + dj < n:
+                    graph.add_edge(node_id(i, j), node_id(i + di, j + dj), length=100.)
+                    graph.add_edge(node_id(i + di, j + dj), node_id(i, j), length=100.)
+    return graph
+
+
+@pytest.fixture
+def grid_cache(tmp_path, monkeypatch):
+    # A 12x12 grid of nodes covering 6x6 chunks, all of them in the store
+    graph = build_grid_graph(12)
+    store = ChunkStore(str(tmp_path), CHUNK_SIZE)
+    store.save_graph(graph, [(cx, cy) for cx in range(6) for cy in range(6)])
+
+    cache = loading_graph_provider.cache
+    monkeypatch.setitem(cache, 'loaded_chunks', defaultdict(lambda: defaultdict(lambda: False)))
+    monkeypatch.setitem(cache, 'lru', OrderedDict())
+    monkeypatch.setitem(cache, 'pins', Counter())
+    monkeypatch.setitem(cache, 'frontier', set())
+    monkeypatch.setitem(cache, 'edges', EdgeTable())
+    monkeypatch.setitem(cache, 'landmarks', Landmarks(2))
+    monkeypatch.setitem(cache, 'graph', nx.MultiDiGraph())
+    monkeypatch.setitem(cache, 'index', GridSpatialIndex(CHUNK_SIZE))
+    monkeypatch.setitem(cache, 'store', store)
+    monkeypatch.setitem(cache, 'loader', ChunkLoader(0))
+    monkeypatch.setattr(loading_graph_provider, 'MAX_LOADED_CHUNKS', 2)
+    return cache
+
+
+def point(i, j):
+    return ((j + 0.5) * STEP, (i + 0.5) * STEP)
+
+
+def test_evicts_least_recently_used(grid_cache):
+    # Both endpoints in chunk (2, 2): the initial area is chunks (1, 1) to (3, 3)
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    assert len(grid_cache['lru']) == 9
+    provider.release()
+    assert len(grid_cache['lru']) == 2
+    # Only the two most recently loaded chunks remain
+    assert list(grid_cache['lru']) == [(3, 2), (3, 3)]
+    assert not grid_cache['loaded_chunks'][2][2]
+
+    graph = grid_cache['graph']
+    assert len(grid_cache['index']) == len(graph)
+    # Nodes deep inside evicted chunks are gone...
+    assert node_id(2, 2) not in graph
+    # ...but nodes next to loaded chunks remain, with edges to loaded nodes only
+    assert node_id(5, 5) in graph
+    assert list(graph.neighbors(node_id(5, 5))) == [node_id(6, 5)]
+    assert grid_cache['edges'].lengths == EdgeTable.from_graph(graph).lengths
+    assert grid_cache['edges'].gains == EdgeTable.from_graph(graph).gains
+
+
+def test_pinned_chunks_are_kept(grid_cache):
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    other = LoadingGraphProvider(point(8, 8), point(9, 9))
+    assert len(grid_cache['lru']) == 17
+
+    # The first provider still pins its chunks
+    other.release()
+    assert len(grid_cache['lru']) == 9
+    assert all(grid_cache['loaded_chunks'][cx][cy] for cx in range(1, 4) for cy in range(1, 4))
+    provider.release()
+    assert len(grid_cache['lru']) == 2
+
+
+def test_search_reloads_evicted_chunks(grid_cache):
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    # Another search loads chunks (3, 3) to (5, 5), which are then evicted...
+    other = LoadingGraphProvider(point(8, 8), point(9, 9))
+    other.release()
+    # ...except for (3, 3), still pinned by the first provider
+    assert grid_cache['loaded_chunks'][3][3]
+    assert not grid_cache['loaded_chunks'][4][3]
+    graph = grid_cache['graph']
+    assert list(graph.neighbors(node_id(8, 7))) == [node_id(7, 7)]
+
+    # Expanding a node next to an evicted chunk loads it again
+    assert sorted(provider.get_neighbors(node_id(7, 7))) == [
+        node_id(6, 7), node_id(7, 6), node_id(7, 8), node_id(8, 7)
+    ]
+    assert grid_cache['loaded_chunks'][4][3]
+    assert len(list(graph.neighbors(node_id(8, 7)))) == 4
+    # Elevation is i * j, so going up i from (8, 7) gains 7
+    assert sorted(provider.get_neighbor_edges(node_id(8, 7))) == [
+        (node_id(7, 7), 100., 0.), (node_id(8, 6), 100., 0.),
+        (node_id(8, 8), 100., 8.), (node_id(9, 7), 100., 7.)
+    ]
+    assert sorted(provider.get_predecessor_edges(node_id(8, 7))) == [
+        (node_id(7, 7), 100., 7.), (node_id(8, 6), 100., 8.),
+        (node_id(8, 8), 100., 0.), (node_id(9, 7), 100., 0.)
+    ]
+
+    res = AStar(provider).search(provider.start, provider.end)
+    assert res.path_len == 200.
+    provider.release()
+    assert len(grid_cache['lru']) == 2
+
+
+def test_queued_nodes_are_kept(grid_cache):
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    other = LoadingGraphProvider(point(8, 8), point(9, 9))
+    # Expanding (7, 7) queues (8, 7), in chunk (4, 3) which only the other search loaded
+    assert node_id(8, 7) in provider.get_neighbors(node_id(7, 7))
+    assert (4, 3) in provider._pinned
+
+    # The other search is done, but the queued node is still fully loaded
+    other.release()
+    graph = grid_cache['graph']
+    assert grid_cache['loaded_chunks'][4][3]
+    assert len(list(graph.neighbors(node_id(8, 7)))) == 4
+    provider.release()
+    assert len(grid_cache['lru']) == 2
+
+
+def expected_frontier(cache):
+    graph = cache['graph']
+    index = cache['index']
+    return {
+        node for node in graph
+        if any(not cache['loaded_chunks'][cx][cy] for cx, cy in map(index.cell_of, graph.successors(node)))
+    }
+
+
+def test_frontier_tracks_loaded_region(grid_cache):
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    # Chunks (1, 1) to (3, 3) hold nodes 2 to 7: their outer ring is on the frontier...
+    ring = {node_id(i, j) for i in range(2, 8) for j in range(2, 8) if i in (2, 7) or j in (2, 7)}
+    assert ring <= grid_cache['frontier']
+    # ...but not the nodes inside it
+    assert node_id(3, 3) not in grid_cache['frontier']
+    assert grid_cache['frontier'] == expected_frontier(grid_cache)
+
+    # Loading chunk (4, 3) moves part of the frontier further east
+    provider.get_neighbors(node_id(7, 7))
+    assert grid_cache['loaded_chunks'][4][3]
+    assert node_id(7, 6) not in grid_cache['frontier']
+    assert node_id(9, 6) in grid_cache['frontier']
+    assert grid_cache['frontier'] == expected_frontier(grid_cache)
+
+
+def test_frontier_after_eviction(grid_cache):
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    provider.release()
+    # Nodes next to evicted chunks are on the frontier again
+    assert node_id(6, 5) in grid_cache['frontier']
+    assert node_id(5, 5) not in grid_cache['frontier']
+    assert grid_cache['frontier'] == expected_frontier(grid_cache)
+
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    assert grid_cache['frontier'] == expected_frontier(grid_cache)
+    provider.release()
+    assert grid_cache['frontier'] == expected_frontier(grid_cache)
+    assert grid_cache['edges'].lengths == EdgeTable.from_graph(grid_cache['graph']).lengths
+
+
+def test_interior_nodes_skip_chunk_checks(grid_cache, monkeypatch):
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    checked = []
+    is_chunk_loaded = provider._is_chunk_loaded
+    monkeypatch.setattr(provider, '_is_chunk_loaded', lambda *args: checked.append(args) or is_chunk_loaded(*args))
+    provider.get_neighbors(node_id(4, 4))
+    assert checked == []
+    provider.get_neighbors(node_id(2, 4))
+    assert len(checked) > 0
+    assert grid_cache['loaded_chunks'][0][2]
+
+
+def assert_landmark_bounds_hold(cache):
+    graph = cache['graph']
+    landmarks = cache['landmarks']
+    exact = dict(nx.all_pairs_dijkstra_path_length(graph, weight='length'))
+    for target in list(graph.nodes)[::7]:
+        for node in graph.nodes:
+            assert landmarks.heuristic(node, target) <= exact[node].get(target, float('inf')) + 1e-9
+
+
+def test_landmarks_follow_loaded_graph(grid_cache):
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    landmarks = grid_cache['landmarks']
+    assert len(landmarks.landmarks) == 2
+    assert landmarks.heuristic(provider.start, provider.end) > 0.
+    assert_landmark_bounds_hold(grid_cache)
+
+    # Loading more chunks extends the distances to the new nodes
+    other = LoadingGraphProvider(point(8, 8), point(9, 9))
+    graph = grid_cache['graph']
+    assert set(landmarks._index) == set(graph.nodes)
+    exact = nx.single_source_dijkstra_path_length(graph, landmarks.landmarks[0], weight='length')
+    for node, dist in exact.items():
+        assert landmarks.forward[0, landmarks._index[node]] == dist
+    assert_landmark_bounds_hold(grid_cache)
+
+    # Evicting chunks drops their nodes but keeps valid bounds
+    other.release()
+    provider.release()
+    assert set(landmarks._index) == set(graph.nodes)
+    assert_landmark_bounds_hold(grid_cache)
+
+
+def test_search_reads_frozen_landmarks(grid_cache):
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    other = LoadingGraphProvider(point(8, 8), point(9, 9))
+    other.release()
+    landmarks = grid_cache['landmarks']
+    graph = grid_cache['graph']
+    target = node_id(10, 10)
+    assert target not in graph
+
+    # The search loads the chunks around the target, which updates the
+    # landmarks, but not the snapshot guiding the search
+    frozen = landmarks.snapshot()
+    forward = frozen.forward.copy()
+    res = AStar(provider, frozen.heuristic).search(provider.start, target)
+    assert landmarks.forward is not frozen.forward
+    assert np.array_equal(frozen.forward, forward)
+    assert set(landmarks._index) == set(graph.nodes)
+    assert_landmark_bounds_hold(grid_cache)
+
+    # The path is not guaranteed to be the shortest, but it is a path
+    assert res.path[0] == provider.start and res.path[-1] == target
+    assert all(graph.has_edge(u, v) for u, v in zip(res.path, res.path[1:]))
+    assert res.path_len == sum(grid_cache['edges'].lengths[u][v] for u, v in zip(res.path, res.path[1:]))
+    # Here the grid leaves no shortcut for the loads to reveal
+    assert res.path_len == nx.dijkstra_path_length(graph, provider.start, target, weight='length')
+    provider.release()
+
+
+def test_evicting_adjacent_chunks_drops_isolated_stubs(grid_cache):
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    graph = grid_cache['graph']
+    with grid_cache['lock']:
+        # Node (2, 4) of chunk (1, 2) is kept, with its edge to (2, 3) in chunk (1, 1)...
+        provider._evict_chunk((1, 2))
+        assert list(graph.neighbors(node_id(2, 4))) == [node_id(2, 3)]
+        # ...until chunk (1, 1) goes as well
+        provider._evict_chunk((1, 1))
+
+    assert node_id(2, 4) not in graph
+    assert node_id(2, 4) not in grid_cache['frontier']
+    assert list(graph.neighbors(node_id(3, 4))) == [node_id(4, 4)]
+    assert all(graph.degree(node) > 0 for node in graph.nodes)
+    assert len(grid_cache['index']) == len(graph)
+    assert grid_cache['frontier'] == expected_frontier(grid_cache)
+    assert grid_cache['edges'].lengths == EdgeTable.from_graph(graph).lengths
+    assert set(grid_cache['landmarks']._index) == set(graph.nodes)
+
+
+def test_metric_heuristic_pins_nothing(grid_cache):
+    provider = LoadingGraphProvider(point(4, 4), point(5, 5))
+    pinned = set(provider._pinned)
+    pins = Counter(grid_cache['pins'])
+    heuristic = MetricHeuristic(provider)
+    assert heuristic.heuristic(provider.start, provider.end) > 0.
+    # Measuring the loaded graph leaves the chunks of the search as they were
+    assert len(heuristic._index) == len(grid_cache['graph'])
+    assert provider._pinned == pinned
+    assert grid_cache['pins'] == pins
+    provider.release()
+    assert len(grid_cache['lru']) == 2
@@ -0,0 +1,110 @@
+"""Unit tests for ChunkLoader using a mock fetch function.
+"""
+import threading
+import pytest
+
+from backend.graph_providers.utils.chunk_loader import ChunkLoader
+
+
+class PlayFetcher:
+    """A mock fetch function recording which chunks it was asked for.
+    """
+    def __init__(self, gate=None):
+        self.fetched = []
+        self.gate = gate
+        self.started = threading.Event()
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def __call__(self, chunks, tag):
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        with self._lock:
+            self.fetched.append(list(chunks))
+        if self.fail:
+            raise IOError("Download failed")
+        return {'chunks': list(chunks), 'tag': tag}
+
+
+def test_load_deduplicates():
+    loader = ChunkLoader(max_workers=2)
+    fetch = PlayFetcher()
+
+    graphs = loader.load([(0, 0), (0, 1)], fetch, 'a')
+    assert graphs == [{'chunks': [(0, 0), (0, 1)], 'tag': 'a'}]
+    # Not forgotten yet, so the same fetched graph is reused
+    assert loader.load([(0, 1)], fetch, 'b') == graphs
+    assert fetch.fetched == [[(0, 0), (0, 1)]]
+
+    loader.forget([(0, 0), (0, 1)])
+    assert (0, 1) not in loader
+    loader.load([(0, 1)], fetch, 'b')
+    assert fetch.fetched == [[(0, 0), (0, 1)], [(0, 1)]]
+
+
+def test_prefetch_then_load():
+    loader = ChunkLoader(max_workers=2)
+    fetch = PlayFetcher()
+
+    loader.prefetch([(2., (1, 0)), (1., (2, 0))], fetch, 'a')
+    loader.prefetch([(0., (1, 0))], fetch, 'b')
+    graphs = loader.load([(1, 0), (2, 0)], fetch, 'c')
+    assert sorted(chunk for graph in graphs for chunk in graph['chunks']) == [(1, 0), (2, 0)]
+    # Each chunk was fetched exactly once, by whichever thread got to it first
+    assert sorted(chunk for chunks in fetch.fetched for chunk in chunks) == [(1, 0), (2, 0)]
+
+
+def test_foreground_does_not_wait_for_queue():
+    gate = threading.Event()
+    loader = ChunkLoader(max_workers=1)
+    blocked_fetch = PlayFetcher(gate)
+    fetch = PlayFetcher()
+
+    # The only worker is stuck on the first chunk, so the second stays queued
+    loader.prefetch([(0., (0, 0)), (1., (5, 5))], blocked_fetch, 'a')
+    assert blocked_fetch.started.wait(5)
+    graphs = loader.load([(5, 5)], fetch, 'b')
+    assert graphs == [{'chunks': [(5, 5)], 'tag': 'b'}]
+    assert fetch.fetched == [[(5, 5)]]
+
+    gate.set()
+    assert loader.load([(0, 0)], fetch, 'c')[0]['tag'] == 'a'
+    assert blocked_fetch.fetched == [[(0, 0)]]
+
+
+def test_failed_fetch_can_be_retried():
+    loader = ChunkLoader(max_workers=1)
+    fetch = PlayFetcher()
+    fetch.fail = True
+    with pytest.raises(IOError):
+        loader.load([(3, 3)], fetch, 'a')
+    assert (3, 3) not in loader
+
+    fetch.fail = False
+    assert loader.load([(3, 3)], fetch, 'a')[0]['chunks'] == [(3, 3)]
+    assert len(fetch.fetched) == 2
+
+
+def test_unused_prefetches_are_dropped():
+    gate = threading.Event()
+    loader = ChunkLoader(max_workers=1, max_prefetched=2)
+    fetch = PlayFetcher(gate)
+
+    # The worker is stuck on the first chunk, so the second stays queued
+    loader.prefetch([(0., (0, 0)), (1., (0, 1))], fetch, 'a')
+    assert fetch.started.wait(5)
+    # The queued chunk makes room for the new one, the one being fetched cannot
+    loader.prefetch([(0., (0, 2)), (1., (0, 3))], fetch, 'a')
+    assert (0, 0) in loader and (0, 1) not in loader
+    assert (0, 2) in loader and (0, 3) not in loader
+
+    gate.set()
+    assert loader.load([(0, 0)], fetch, 'b')[0]['chunks'] == [(0, 0)]
+    loader.forget([(0, 0)])
+    # Fetched chunks no one asked for are dropped as well
+    for i in range(10):
+        loader.prefetch([(0., (1, i))], fetch, 'a')
+    assert len(loader._futures) <= 2
+    assert (1, 9) in loader
+    assert [(0, 1)] not in fetch.fetched
@@ -0,0 +1,54 @@
+"""Unit tests for ChunkStore using mock data.
+"""
+import networkx as nx
+import numpy as np
+
+from backend.graph_providers.utils.chunk_store import ChunkStore
+
+
+def build_two_chunk_graph():
+    # Nodes 1 and 2 lie in chunk (0, 0), node 3 in chunk (1, 0) and node 4
+    # outside both, as if kept by truncate_by_edge
+    graph = nx.MultiDiGraph()
+    graph.add_node(1, x=0.002, y=0.005, elevation=10., highway='crossing')
+    graph.add_node(2, x=0.008, y=0.005, elevation=12.)
+    graph.add_node(3, x=0.012, y=0.005, elevation=15.)
+    graph.add_node(4, x=0.025, y=0.005, elevation=11.)
+    for n1, n2, length in [(1, 2, 60.), (2, 3, 40.), (3, 4, 130.)]:
+        graph.add_edge(n1, n2, length=length, name='Main Street')
+        graph.add_edge(n2, n1, length=length, name='Main Street')
+    return graph
+
+
+def test_save_and_load_graph(tmp_path):
+    store = ChunkStore(str(tmp_path), 0.01)
+    graph = build_two_chunk_graph()
+
+    assert not store.contains(0, 0)
+    store.save_graph(graph, [(0, 0), (1, 0)])
+    assert store.contains(0, 0)
+    assert store.contains(1, 0)
+    assert not store.contains(2, 0)
+
+    loaded = store.load_graph([(0, 0), (1, 0)])
+    assert sorted(loaded.nodes) == [1, 2, 3, 4]
+    assert loaded.nodes[4] == {'x': 0.025, 'y': 0.005, 'elevation': 11.}
+    # Edges crossing the chunk boundary are stored in both chunks, but must
+    # not turn into parallel edges when the chunks are loaded together
+    assert sorted(loaded.edges(keys=True)) == sorted(graph.edges(keys=True))
+    assert loaded.get_edge_data(2, 3) == {0: {'length': 40.}}
+
+
+def test_chunk_contents(tmp_path):
+    store = ChunkStore(str(tmp_path), 0.01)
+    store.save_graph(build_two_chunk_graph(), [(0, 0), (1, 0)])
+
+    arrays = store.load(0, 0)
+    assert isinstance(arrays['node_ids'], np.memmap)
+    # Node 3 is kept as the endpoint of the edge crossing the boundary
+    assert sorted(arrays['node_ids'].tolist()) == [1, 2, 3]
+    assert arrays['node_coords'].shape == (3, 3)
+    assert len(arrays['edge_nodes']) == len(arrays['edge_lengths']) == 4
+
+    loaded = store.load_graph([(1, 0)])
+    assert sorted(loaded.nodes) == [2, 3, 4]
@@ -0,0 +1,119 @@
+"""Unit tests for ContractedGraphProvider, compared with searches on the full graph.
+"""
+import random
+import networkx as nx
+import pytest
+
+from backend.graph_providers.array_graph_provider import ArrayGraphProvider
+from backend.graph_providers.contracted_graph_provider import ContractedGraphProvider
+from backend.search_algorithms.dijkstra import Dijkstra
+
+
+def build_example_graph():
+    graph = nx.MultiDiGraph()
+    node2ele = {1: 0., 2: 1., 3: 2., 4: 1., 5: 0., 6: 0., 7: 0., 8: 3., 9: 5., 10: 2.5, 11: 1.,
+                20: 4., 21: 4., 22: 4.}
+    for node, ele in node2ele.items():
+        graph.add_node(node, x=float(node), y=0., elevation=ele)
+    # A two-way chain from 1 to 5 with a peak at 3, then two routes from 5 to 8
+    two_way = [(1, 2, 10.), (2, 3, 10.), (3, 4, 10.), (4, 5, 10.), (5, 6, 10.), (6, 7, 10.),
+               (7, 8, 10.), (5, 9, 5.), (9, 8, 5.), (20, 21, 1.), (21, 22, 1.), (22, 20, 1.)]
+    for u, v, length in two_way:
+        graph.add_edge(u, v, length=length)
+        graph.add_edge(v, u, length=length)
+    # A one-way detour from 8 back to 1
+    for u, v in [(8, 10), (10, 11), (11, 1)]:
+        graph.add_edge(u, v, length=1.)
+    return graph
+
+
+def build_chain_grid(n, subdivisions, seed):
+    """Build a grid whose edges are chains of several nodes, with random elevations.
+
+    Elevations vary steadily along most chains, with a bump in some of them.
+    """
+    rng = random.Random(seed)
+    graph = nx.MultiDiGraph()
+    next_id = n * n
+    for i in range(n):
+        for j in range(n):
+            graph.add_node(i * n + j, x=float(i), y=float(j), elevation=float(rng.randint(0, 3)))
+    for i in range(n):
+        for j in range(n):
+            for di, dj in [(1, 0), (0, 1)]:
+                if i + di >= n or j + dj >= n:
+                    continue
+                chain = [i * n + j]
+                z_u = graph.nodes[i * n + j]['elevation']
+                z_v = graph.nodes[(i + di) * n + j + dj]['elevation']
+                bump = rng.randrange(3 * subdivisions)
+                for k in range(subdivisions):
+                    t = (k + 1) / (subdivisions + 1)
+                    z = z_u + (z_v - z_u) * t + (5. if k == bump else 0.)
+                    graph.add_node(next_id, x=i + di * t, y=j + dj * t, elevation=z)
+                    chain.append(next_id)
+                    next_id += 1
+                chain.append((i + di) * n + j + dj)
+                for u, v in zip(chain[:-1], chain[1:]):
+                    length = rng.uniform(1., 2.)
+                    graph.add_edge(u, v, length=length)
+                    graph.add_edge(v, u, length=length)
+    return graph
+
+
+def test_contracts_monotonic_chains():
+    provider = ContractedGraphProvider(ArrayGraphProvider.from_graph(build_example_graph(), start=1, end=8))
+    # The chain from 1 to 5 is split at the peak 3, and the one from 5 to 8
+    # through 9 too, but elevation never falls from 5 to 8 through 6 and 7,
+    # nor rises from 8 to 1 through 10 and 11
+    assert sorted(provider.get_all_nodes()) == [1, 3, 5, 8, 9, 20, 21, 22]
+    assert provider.num_contracted == 6
+    assert provider.get_neighbors(1) == [3]
+    assert provider.get_edge_distance(1, 3) == 20.
+    assert provider.get_edge_distance(5, 8) == 30.
+    assert provider.get_edge_gain(5, 8) == 3.
+    assert provider.get_edge_gain(8, 5) == 0.
+    assert provider.get_edge_gain(3, 1) == 0.
+    assert provider.get_edge_loss(3, 1) == 2.
+    assert provider.get_edge_loss(5, 8) == 0.
+    assert sorted(provider.get_neighbor_edges(5)) == [(3, 20., 2.), (8, 30., 3.), (9, 5., 5.)]
+    # The one-way chain only goes one way
+    assert provider.get_edge_distance(8, 1) == 3.
+    assert 8 not in provider.get_neighbors(1)
+    # A cycle of nodes which could all be contracted is left alone
+    assert sorted(provider.get_neighbors(20)) == [21, 22]
+
+    assert provider.expand_path([1, 3, 5, 8]) == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert provider.expand_path([]) == []
+
+
+def test_start_and_end_are_kept():
+    provider = ContractedGraphProvider(ArrayGraphProvider.from_graph(build_example_graph(), start=2, end=7))
+    assert provider.start == 2
+    assert provider.end == 7
+    assert {2, 7} <= set(provider.get_all_nodes())
+    res = Dijkstra(provider).search(provider.start, provider.end)
+    assert res.path_len == 50.
+    assert provider.expand_path(res.path) == [2, 3, 4, 5, 6, 7]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_searches_match_full_graph(seed):
+    n = 6
+    graph = build_chain_grid(n, subdivisions=4, seed=seed)
+    rng = random.Random(seed)
+    start, end = rng.sample(range(n * n), 2)
+    full = ArrayGraphProvider.from_graph(graph, start=start, end=end)
+    contracted = ContractedGraphProvider(full)
+    assert len(contracted.get_all_nodes()) < len(graph) / 2
+
+    expected = Dijkstra(full).search(start, end)
+    res = Dijkstra(contracted).search(start, end)
+    assert res.path_len == pytest.approx(expected.path_len)
+    assert res.ele_gain == pytest.approx(expected.ele_gain)
+    assert contracted.expand_path(res.path) == expected.path
+    # The elevation gain of a path minimizing it is exact too
+    res = Dijkstra(contracted).search(start, end, expected.path_len * 1.5)
+    path = contracted.expand_path(res.path)
+    elevations = [full.get_coords(node)['z'] for node in path]
+    assert res.ele_gain == pytest.approx(sum(max(0., b - a) for a, b in zip(elevations[:-1], elevations[1:])))
@@ -0,0 +1,105 @@
+"""Unit tests for ContractionHierarchy and its search, compared with the other searches.
+"""
+import random
+import networkx as nx
+import pytest
+
+from test_astar import build_graph_provider
+from test_contracted_graph_provider import build_chain_grid
+from backend.graph_providers.array_graph_provider import ArrayGraphProvider
+from backend.search_algorithms.a_star import AStar
+from backend.search_algorithms.contraction_hierarchy_search import ContractionHierarchySearch
+from backend.search_algorithms.dijkstra import Dijkstra
+from backend.search_algorithms.utils.contraction_hierarchy import ContractionHierarchy
+
+
+def build_graph(n, seed):
+    graph = build_chain_grid(n, subdivisions=2, seed=seed)
+    rng = random.Random(seed)
+    # Make some streets one-way
+    for u, v in list(graph.edges()):
+        if graph.has_edge(v, u) and rng.random() < 0.1:
+            graph.remove_edge(u, v)
+    return graph
+
+
+def test_matches_astar():
+    graph_provider = build_graph_provider()
+    expected = AStar(graph_provider).search(5, 2)
+    hierarchy = ContractionHierarchy.from_provider(graph_provider)
+    res = ContractionHierarchySearch(graph_provider, hierarchy).search(5, 2)
+
+    assert res.path == expected.path == [5,1,2]
+    assert res.path_len == expected.path_len == 10
+    assert res.ele_gain == expected.ele_gain == 8
+
+
+def test_trivial_and_missing_paths():
+    graph = nx.MultiDiGraph()
+    for node in [1, 2, 3]:
+        graph.add_node(node, x=float(node), y=0., elevation=float(node))
+    graph.add_edge(1, 2, length=1.)
+    provider = ArrayGraphProvider.from_graph(graph)
+    search = ContractionHierarchySearch(provider, ContractionHierarchy.from_provider(provider))
+
+    res = search.search(1, 1)
+    assert res.path == [1]
+    assert res.path_len == 0
+    assert search.search(1, 2).ele_gain == 1.
+    # One-way edges are only followed forward
+    assert search.search(2, 1).path == []
+    assert search.search(1, 3).path == []
+    assert search.search(1, 4).path == []
+    # Paths longer than allowed are not returned
+    assert search.search(1, 2, max_path_len=0.5).path == []
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_matches_dijkstra_on_random_graphs(seed):
+    n = 7
+    provider = ArrayGraphProvider.from_graph(build_graph(n, seed))
+    hierarchy = ContractionHierarchy.from_provider(provider)
+    search = ContractionHierarchySearch(provider, hierarchy)
+    assert len(hierarchy.rank) == len(provider.get_all_nodes())
+
+    rng = random.Random(seed)
+    for _ in range(10):
+        start, end = rng.sample(range(n * n), 2)
+        expected = Dijkstra(provider).search(start, end)
+        res = search.search(start, end)
+        assert res.path == expected.path
+        assert res.path_len == pytest.approx(expected.path_len)
+        assert res.ele_gain == pytest.approx(expected.ele_gain)
+
+
+def test_witness_limit_only_adds_shortcuts():
+    provider = ArrayGraphProvider.from_graph(build_graph(6, 4))
+    hierarchy = ContractionHierarchy.from_provider(provider)
+    # Without witness searches, every path through a contracted node gets a shortcut
+    unlimited = ContractionHierarchy.from_provider(provider, witness_settle_limit=0)
+    assert unlimited.num_shortcuts > hierarchy.num_shortcuts
+
+    rng = random.Random(4)
+    for _ in range(5):
+        start, end = rng.sample(range(36), 2)
+        expected = Dijkstra(provider).search(start, end)
+        res = ContractionHierarchySearch(provider, unlimited).search(start, end)
+        assert res.path == expected.path
+        assert res.path_len == pytest.approx(expected.path_len)
+
+
+def test_save_and_load(tmp_path):
+    provider = ArrayGraphProvider.from_graph(build_graph(5, 5))
+    hierarchy = ContractionHierarchy.from_provider(provider)
+    path = str(tmp_path / 'graph.ch')
+    hierarchy.save(path)
+    loaded = ContractionHierarchy.load(path)
+
+    assert loaded.rank == hierarchy.rank
+    assert loaded.num_shortcuts == hierarchy.num_shortcuts
+    for start, end in [(0, 24), (24, 0), (3, 17)]:
+        expected = ContractionHierarchySearch(provider, hierarchy).search(start, end)
+        res = ContractionHierarchySearch(provider, loaded).search(start, end)
+        assert res.path == expected.path
+        assert res.path_len == expected.path_len
+        assert res.ele_gain == expected.ele_gain
@@ -0,0 +1,55 @@
+"""Unit tests for DemElevationSource using a synthetic elevation tile.
+"""
+import math
+import networkx as nx
+import numpy as np
+import pytest
+
+from backend.elevation_sources.dem_elevation_source import DemElevationSource, SRTM_VOID
+
+
+def write_tile(directory, name, side=11):
+    # Elevation grows by 1m per column (eastward) and 10m per row (southward)
+    rows, cols = np.mgrid[0:side, 0:side]
+    grid = (10 * rows + cols).astype('>i2')
+    grid[side - 1, side - 1] = SRTM_VOID
+    grid.tofile(str(directory / name))
+
+
+def test_tile_names():
+    source = DemElevationSource('.')
+    assert source._tile_name(42, -73) == 'N42W073.hgt'
+    assert source._tile_name(-1, 5) == 'S01E005.hgt'
+
+
+def test_bilinear_interpolation(tmp_path):
+    write_tile(tmp_path, 'N42W073.hgt')
+    source = DemElevationSource(str(tmp_path))
+
+    # Grid samples are 0.1 degrees apart in this small tile
+    lats = [42.95, 42.9, 42.85, 42.5]
+    lngs = [-72.95, -72.9, -72.85, -72.5]
+    elevations = source.get_elevations(lats, lngs)
+    assert elevations == pytest.approx([5.5, 11., 16.5, 55.])
+
+    # Voids propagate as missing data
+    assert math.isnan(source.get_elevations([42.01], [-72.01])[0])
+
+
+def test_missing_tile(tmp_path):
+    source = DemElevationSource(str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        source.get_elevations([10.5], [10.5])
+
+
+def test_add_node_elevations(tmp_path):
+    write_tile(tmp_path, 'N42W073.hgt')
+    write_tile(tmp_path, 'N42W072.hgt')
+    source = DemElevationSource(str(tmp_path))
+
+    graph = nx.MultiDiGraph()
+    graph.add_node(1, x=-72.9, y=42.9)
+    graph.add_node(2, x=-71.85, y=42.85)
+    source.add_node_elevations(graph)
+    assert graph.nodes[1]['elevation'] == 11.
+    assert graph.nodes[2]['elevation'] == 16.5
@@ -177,3 +177,16 @@ def test_search_end_is_source_same():
     assert res.path == [3,1,2,5]
     assert res.path_len == 5
     assert res.ele_gain == 4
+
+
+def test_single_source_cutoff():
+    graph_provider = build_generic_example()
+    dijkstra = Dijkstra(graph_provider)
+    full = dijkstra.single_source(3)
+    ss_res = dijkstra.single_source(3, cutoff=4)
+
+    # Only the nodes within the cutoff are settled, with the same results
+    assert ss_res['dist'] == {node: d for node, d in full['dist'].items() if d <= 4}
+    assert set(ss_res['prev']) == set(ss_res['dist']) == set(ss_res['ele_diff'])
+    assert all(ss_res['prev'][node] == full['prev'][node] for node in ss_res['prev'])
+    assert 5 not in ss_res['dist']
@@ -0,0 +1,64 @@
+"""Unit tests for EdgeTable.
+"""
+import networkx as nx
+import pytest
+
+from backend.graph_providers.utils.edge_table import EdgeTable
+
+
+def build_example_graph():
+    graph = nx.MultiDiGraph()
+    # The first parallel edge is not the shortest one
+    graph.add_edge(1, 2, length=50.)
+    graph.add_edge(1, 2, length=20.)
+    graph.add_edge(2, 1, length=30.)
+    graph.add_edge(2, 3, length=10.)
+    return graph
+
+
+def test_keeps_shortest_parallel_edge():
+    table = EdgeTable.from_graph(build_example_graph())
+    assert table.length(1, 2) == 20.
+    assert table.length(2, 1) == 30.
+    assert table.lengths[2][3] == 10.
+    assert len(table) == 3
+    with pytest.raises(KeyError):
+        table.length(3, 2)
+
+
+def test_update_after_changes():
+    graph = build_example_graph()
+    table = EdgeTable.from_graph(graph)
+
+    graph.add_edge(1, 2, length=5.)
+    graph.add_edge(3, 4, length=1.)
+    table.update(graph, [1, 3, 4])
+    assert table.length(1, 2) == 5.
+    assert table.length(3, 4) == 1.
+
+    graph.remove_node(1)
+    table.update(graph, [1, 2])
+    assert 1 not in table.lengths
+    assert table.lengths[2] == {3: 10.}
+
+    table.remove([2, 3])
+    assert table.lengths == {4: {}}
+    assert table.gains == {4: {}}
+    assert table.losses == {4: {}}
+
+
+def test_elevation_changes():
+    graph = build_example_graph()
+    graph.add_edge(3, 4, length=1.)
+    for node, ele in {1: 10., 2: 15., 3: 12.}.items():
+        graph.nodes[node]['elevation'] = ele
+    table = EdgeTable.from_graph(graph)
+
+    assert table.gain(1, 2) == 5.
+    assert table.loss(1, 2) == 0.
+    assert table.gain(2, 1) == 0.
+    assert table.loss(2, 1) == 5.
+    assert table.losses[2][3] == 3.
+    # Nodes without elevation count as flat
+    assert table.gain(3, 4) == 0.
+    assert table.loss(3, 4) == 0.
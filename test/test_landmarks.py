@@ -0,0 +1,132 @@
+"""Unit tests for Landmarks, compared with exact shortest-path distances.
+"""
+import random
+import networkx as nx
+import pytest
+
+from test_contracted_graph_provider import build_chain_grid
+from backend.graph_providers.array_graph_provider import ArrayGraphProvider
+from backend.search_algorithms.utils.landmarks import Landmarks
+from backend.search_algorithms.bidirectional_a_star import BidirectionalAStar
+from backend.search_algorithms.dijkstra import Dijkstra
+
+
+def build_graph(seed):
+    graph = build_chain_grid(5, subdivisions=1, seed=seed)
+    rng = random.Random(seed)
+    # Make some streets one-way
+    for u, v in list(graph.edges()):
+        if graph.has_edge(v, u) and rng.random() < 0.1:
+            graph.remove_edge(u, v)
+    return graph
+
+
+def distances(graph):
+    return dict(nx.all_pairs_dijkstra_path_length(graph, weight='length'))
+
+
+def assert_tables_exact(landmarks, graph):
+    exact = distances(graph)
+    for i, landmark in enumerate(landmarks.landmarks):
+        for node in graph.nodes:
+            j = landmarks._index[node]
+            assert landmarks.forward[i, j] == pytest.approx(exact[landmark].get(node, float('inf')))
+            assert landmarks.backward[i, j] == pytest.approx(exact[node].get(landmark, float('inf')))
+
+
+def assert_admissible_and_consistent(landmarks, graph):
+    exact = distances(graph)
+    for target in list(graph.nodes)[::3]:
+        assert landmarks.heuristic(target, target) == 0.
+        for node in graph.nodes:
+            h = landmarks.heuristic(node, target)
+            assert h <= exact[node].get(target, float('inf')) + 1e-9
+            # Bounds are only consistent among the nodes which can reach the target
+            for _, neighbor, data in graph.out_edges(node, data=True):
+                if target in exact[neighbor]:
+                    assert h <= data['length'] + landmarks.heuristic(neighbor, target) + 1e-9
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_build(seed):
+    graph = build_graph(seed)
+    landmarks = Landmarks.from_provider(ArrayGraphProvider.from_graph(graph), num_landmarks=4)
+
+    assert len(landmarks.landmarks) == 4
+    assert len(set(landmarks.landmarks)) == 4
+    assert_tables_exact(landmarks, graph)
+    assert_admissible_and_consistent(landmarks, graph)
+    # The bounds are useful: far apart nodes get a positive bound
+    exact = distances(graph)
+    start, end = max(((u, v) for u in exact for v in exact[u]), key=lambda pair: exact[pair[0]][pair[1]])
+    assert landmarks.heuristic(start, end) > 0.
+
+
+def test_search_with_landmarks():
+    graph = build_graph(2)
+    provider = ArrayGraphProvider.from_graph(graph)
+    landmarks = Landmarks.from_provider(provider, num_landmarks=3)
+    rng = random.Random(2)
+    for _ in range(5):
+        start, end = rng.sample(range(25), 2)
+        expected = Dijkstra(provider).search(start, end)
+        res = BidirectionalAStar(provider, heuristic=landmarks.heuristic).search(start, end)
+        assert res.path_len == pytest.approx(expected.path_len)
+        assert res.path == expected.path
+
+
+def test_update_after_graph_grows():
+    graph = build_graph(3)
+    # Start from the left half of the graph, then add the rest
+    left = graph.subgraph([node for node, x in graph.nodes(data='x') if x <= 2.]).copy()
+    landmarks = Landmarks.from_provider(ArrayGraphProvider.from_graph(left), num_landmarks=3)
+    assert_tables_exact(landmarks, left)
+
+    changed = [node for node in graph.nodes if node not in left or graph.out_degree(node) != left.out_degree(node)]
+    landmarks.update(ArrayGraphProvider.from_graph(graph), changed)
+    assert_tables_exact(landmarks, graph)
+    assert_admissible_and_consistent(landmarks, graph)
+
+
+def test_snapshot_stays_fixed():
+    graph = build_graph(3)
+    left = graph.subgraph([node for node, x in graph.nodes(data='x') if x <= 2.]).copy()
+    landmarks = Landmarks.from_provider(ArrayGraphProvider.from_graph(left), num_landmarks=3)
+    frozen = landmarks.snapshot()
+    assert frozen.forward is landmarks.forward
+    bounds = {node: frozen.heuristic(node, 0) for node in left.nodes}
+
+    changed = [node for node in graph.nodes if node not in left or graph.out_degree(node) != left.out_degree(node)]
+    landmarks.update(ArrayGraphProvider.from_graph(graph), changed)
+    # The landmarks follow the graph, while the snapshot still holds the left half
+    assert_tables_exact(landmarks, graph)
+    landmarks.remove([1])
+    assert 1 not in landmarks._index
+    assert_tables_exact(frozen, left)
+    assert {node: frozen.heuristic(node, 0) for node in left.nodes} == bounds
+    assert all(frozen.heuristic(node, 0) == 0. for node in graph.nodes if node not in left)
+
+
+def test_remove_keeps_valid_bounds():
+    graph = build_graph(4)
+    landmarks = Landmarks.from_provider(ArrayGraphProvider.from_graph(graph), num_landmarks=3)
+    removed = [node for node, x in graph.nodes(data='x') if x >= 3.]
+    landmarks.remove(removed)
+    graph.remove_nodes_from(removed)
+
+    assert all(landmarks.heuristic(node, 0) == 0. for node in removed)
+    assert landmarks.forward.shape == (3, len(graph))
+    assert_admissible_and_consistent(landmarks, graph)
+
+
+def test_save_and_load(tmp_path):
+    graph = build_graph(5)
+    landmarks = Landmarks.from_provider(ArrayGraphProvider.from_graph(graph), num_landmarks=2)
+    path = str(tmp_path / 'graph.landmarks')
+    landmarks.save(path)
+    loaded = Landmarks.load(path)
+
+    assert loaded.num_landmarks == 2
+    assert loaded.landmarks == landmarks.landmarks
+    for node in graph.nodes:
+        assert loaded.heuristic(node, 7) == landmarks.heuristic(node, 7)
@@ -0,0 +1,111 @@
+"""Unit tests for MetricHeuristic on graphs with geographic and abstract positions.
+"""
+import random
+import networkx as nx
+import pytest
+
+from test_astar import build_graph_provider
+from test_contracted_graph_provider import build_chain_grid
+from backend.graph_providers.array_graph_provider import ArrayGraphProvider
+from backend.search_algorithms.a_star import AStar
+from backend.search_algorithms.utils.metric_heuristic import MetricHeuristic, haversine
+
+
+class CountingProvider(ArrayGraphProvider):
+    """Count the nodes a search expands."""
+    expansions = 0
+
+    def get_neighbor_edges(self, node):
+        self.expansions += 1
+        return super().get_neighbor_edges(node)
+
+
+def build_geographic_graph(n, seed):
+    """Build a street grid around Amherst, whose edges are a bit longer than the straight line."""
+    graph = build_chain_grid(n, subdivisions=1, seed=seed)
+    rng = random.Random(seed)
+    for node, data in graph.nodes(data=True):
+        data['x'] = -72.52 + data['x'] * 0.001
+        data['y'] = 42.37 + data['y'] * 0.001
+    for u, v, data in graph.edges(data=True):
+        a, b = graph.nodes[u], graph.nodes[v]
+        data['length'] = float(haversine(a['x'], a['y'], b['x'], b['y'])) * rng.uniform(1., 1.2)
+    return graph
+
+
+def assert_admissible_and_consistent(heuristic, graph):
+    exact = dict(nx.all_pairs_dijkstra_path_length(graph, weight='length'))
+    for target in list(graph.nodes)[::5]:
+        assert heuristic.heuristic(target, target) == 0.
+        for node in graph.nodes:
+            h = heuristic.heuristic(node, target)
+            assert h <= exact[node].get(target, float('inf')) + 1e-9
+            for _, neighbor, data in graph.out_edges(node, data=True):
+                assert h <= data['length'] + heuristic.heuristic(neighbor, target) + 1e-9
+
+
+def test_haversine():
+    # A degree of latitude is about 111 km long
+    assert haversine(0., 0., 0., 1.) == pytest.approx(111195., rel=1e-4)
+    assert haversine(-72.52, 42.37, -72.52, 42.37) == 0.
+
+
+def test_geographic_graph():
+    graph = build_geographic_graph(5, seed=0)
+    heuristic = MetricHeuristic(ArrayGraphProvider.from_graph(graph))
+
+    assert_admissible_and_consistent(heuristic, graph)
+    # Street lengths are never shorter than the straight line, so distances are not scaled
+    assert heuristic.scale == 1.
+    assert heuristic.heuristic(0, 24) == pytest.approx(float(haversine(-72.52, 42.37, -72.516, 42.374)))
+
+
+def test_degenerate_edges_are_ignored():
+    graph = build_geographic_graph(5, seed=3)
+    # A node a fraction of a millimeter away, joined by an edge osmnx rounded to 0
+    graph.add_node(100, x=graph.nodes[0]['x'] + 1e-9, y=graph.nodes[0]['y'], elevation=0.)
+    graph.add_edge(0, 100, length=0.)
+    graph.add_edge(100, 0, length=0.)
+    heuristic = MetricHeuristic(ArrayGraphProvider.from_graph(graph))
+
+    assert heuristic.heuristic(0, 24) > 0.
+    assert heuristic.scale == 1.
+
+
+def test_geographic_graph_is_not_scanned():
+    graph = build_geographic_graph(5, seed=0)
+    provider = CountingProvider.from_graph(graph)
+    provider.geographic = True
+    heuristic = MetricHeuristic(provider)
+
+    assert heuristic.heuristic(0, 24) == pytest.approx(float(haversine(-72.52, 42.37, -72.516, 42.374)))
+    assert heuristic.scale == 1.
+    assert provider.expansions == 0
+
+
+def test_abstract_positions_are_scaled():
+    graph = build_chain_grid(5, subdivisions=1, seed=1)
+    heuristic = MetricHeuristic(ArrayGraphProvider.from_graph(graph))
+
+    assert_admissible_and_consistent(heuristic, graph)
+    assert 0. < heuristic.scale < 1e-4
+    # The mock provider of the AStar tests has no precise positions either
+    assert MetricHeuristic(build_graph_provider()).heuristic(5, 2) <= 10.
+
+
+def test_fewer_expansions():
+    graph = build_geographic_graph(12, seed=2)
+    rng = random.Random(2)
+    with_heuristic = CountingProvider.from_graph(graph)
+    without_heuristic = CountingProvider.from_graph(graph)
+    # Measuring the graph reads every edge once, which is not counted
+    heuristic = MetricHeuristic(with_heuristic)
+    heuristic.distances_to(0)
+    with_heuristic.expansions = 0
+    for _ in range(5):
+        start, end = rng.sample(range(144), 2)
+        res = AStar(with_heuristic, heuristic=heuristic.heuristic).search(start, end)
+        assert res.path[0] == start and res.path[-1] == end
+        AStar(without_heuristic, heuristic=lambda node, target: 0.).search(start, end)
+
+    assert with_heuristic.expansions < 0.7 * without_heuristic.expansions
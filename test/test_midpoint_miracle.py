@@ -1,6 +1,11 @@
 """Unit tests for MidpointMiracle using mock data.
 """
+from concurrent.futures import ProcessPoolExecutor
+
 from play_graph_provider import PlayProvider
+from test_contracted_graph_provider import build_chain_grid
+from backend.graph_providers.array_graph_provider import ArrayGraphProvider
+from backend.search_algorithms.dijkstra import Dijkstra
 from backend.search_algorithms.midpoint_miracle import MidpointMiracle
 
 
@@ -121,3 +126,65 @@ def test_pruning():
     assert res_prune.path == [1,3,5,6]
     assert res_prune.ele_gain == 13.
     assert res_prune.path_len == 3.
+
+
+def test_single_source_is_bounded():
+    # The single-source searches stop at the maximum path length
+    graph_provider = build_pruning_best_graph_provider()
+    mm = MidpointMiracle(graph_provider)
+    res = mm.search(1, 2, 1.)
+
+    assert res.path == [1,2]
+    assert mm._single_source_data['start']['dist'] == {1: 0., 2: 1., 3: 1.}
+    assert mm._single_source_data['end']['dist'] == {2: 0., 1: 1., 4: 1., 6: 1.}
+
+
+def test_parallel_sweeps_match_sequential(tmp_path):
+    provider = ArrayGraphProvider.from_graph(build_chain_grid(6, subdivisions=2, seed=0))
+    path = str(tmp_path / 'graph.snapshot')
+    provider.save_snapshot(path)
+    snapshot_provider = ArrayGraphProvider.from_snapshot(path)
+    assert snapshot_provider.snapshot_path == path
+
+    max_path_len = 1.3 * Dijkstra(provider).search(0, 35).path_len
+    sequential = MidpointMiracle(provider)
+    expected = sequential.search(0, 35, max_path_len)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        parallel = MidpointMiracle(snapshot_provider, executor)
+        res = parallel.search(0, 35, max_path_len)
+        # Searches reuse the graph the workers already loaded
+        assert parallel.search(0, 35, max_path_len).path == res.path
+
+    assert res.path == expected.path
+    assert res.path_len == expected.path_len
+    assert res.ele_gain == expected.ele_gain
+    assert parallel._single_source_data == sequential._single_source_data
+
+
+def test_candidates_ranked_like_a_full_sort():
+    provider = ArrayGraphProvider.from_graph(build_chain_grid(6, subdivisions=2, seed=1))
+    mm = MidpointMiracle(provider)
+    max_path_len = 1.5 * Dijkstra(provider).search(3, 32).path_len
+    mm._compute_single_source_data(3, 32, max_path_len)
+    candidates, scores = mm._score_candidates(3, 32, max_path_len)
+
+    # Filter and sort each node one at a time instead
+    dist_from_start = mm._single_source_data['start']['dist']
+    dist_to_end = mm._single_source_data['end']['dist']
+    ele_start = provider.get_elevation(3)
+    ele_end = provider.get_elevation(32)
+
+    def score(node):
+        ele = provider.get_elevation(node)
+        return max(0., ele - ele_start, ele_end - ele)
+    expected = [
+        node for node in provider.get_all_nodes()
+        if dist_from_start.get(node, float('inf')) + dist_to_end.get(node, float('inf')) <= max_path_len
+        and not (provider.get_elevation(node) >= min(ele_start, ele_end) and provider.get_elevation(node) < ele_start)
+    ]
+    expected.sort(key=score, reverse=True)
+
+    assert candidates == [node for node in provider.get_all_nodes() if node in set(expected)]
+    assert len(set(scores.tolist())) < len(candidates)
+    for batch_size in [1, 3, 10, len(expected) + 1]:
+        assert list(mm._rank_candidates(candidates, scores, batch_size)) == expected
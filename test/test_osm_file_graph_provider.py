@@ -0,0 +1,115 @@
+"""Unit tests for OsmFileGraphProvider, reading a small hand-written extract.
+"""
+import pytest
+
+from backend.graph_providers import osm_file_graph_provider
+from backend.graph_providers.osm_file_graph_provider import OsmFileGraphProvider
+from backend.graph_providers.utils.osm_file import read_osm_graph, is_walkable
+from backend.search_algorithms.a_star import AStar
+
+# A square of footways with a private shortcut through the middle, a one-way
+# street, a motorway and a disconnected footway
+EXAMPLE_OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <bounds minlat="42.0" minlon="-72.0" maxlat="42.01" maxlon="-71.99"/>
+  <node id="1" lat="42.000" lon="-72.000"/>
+  <node id="2" lat="42.001" lon="-72.000"/>
+  <node id="3" lat="42.001" lon="-71.999"/>
+  <node id="4" lat="42.000" lon="-71.999"/>
+  <node id="5" lat="42.0005" lon="-71.9995"/>
+  <node id="6" lat="42.005" lon="-71.995"/>
+  <node id="7" lat="42.006" lon="-71.995"/>
+  <node id="8" lat="42.002" lon="-71.999"/>
+  <node id="9" lat="42.009" lon="-71.991"/>
+  <way id="100">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/><nd ref="3"/>
+    <tag k="highway" v="footway"/>
+    <tag k="name" v="Main Path"/>
+  </way>
+  <way id="101">
+    <nd ref="3"/><nd ref="4"/><nd ref="1"/>
+    <tag k="highway" v="residential"/>
+    <tag k="oneway" v="yes"/>
+  </way>
+  <way id="102">
+    <nd ref="1"/><nd ref="5"/><nd ref="3"/>
+    <tag k="highway" v="service"/>
+    <tag k="access" v="private"/>
+  </way>
+  <way id="103">
+    <nd ref="3"/><nd ref="8"/><nd ref="9"/>
+    <tag k="highway" v="motorway"/>
+  </way>
+  <way id="104">
+    <nd ref="6"/><nd ref="7"/>
+    <tag k="highway" v="footway"/>
+  </way>
+  <way id="105">
+    <nd ref="1"/><nd ref="3"/>
+    <tag k="building" v="yes"/>
+  </way>
+</osm>
+"""
+
+
+class PlayElevationSource:
+    """A mock elevation source setting the elevation of a node to its id.
+    """
+    def add_node_elevations(self, graph):
+        for node, data in graph.nodes(data=True):
+            data['elevation'] = float(node)
+
+
+@pytest.fixture
+def osm_path(tmp_path):
+    path = tmp_path / 'map.osm'
+    path.write_text(EXAMPLE_OSM)
+    return str(path)
+
+
+def test_is_walkable():
+    assert is_walkable({'highway': 'footway'})
+    assert is_walkable({'highway': 'service', 'access': 'yes'})
+    assert not is_walkable({'building': 'yes'})
+    assert not is_walkable({'highway': 'motorway_link'})
+    assert not is_walkable({'highway': 'path', 'foot': 'no'})
+    assert not is_walkable({'highway': 'pedestrian', 'area': 'yes'})
+
+
+def test_read_osm_graph(osm_path):
+    graph = read_osm_graph(osm_path)
+    # Only the square remains: the private and motorway ways are filtered
+    # out, and the disconnected footway is not the largest component
+    assert sorted(graph.nodes) == [1, 2, 3, 4]
+    assert graph.nodes[2] == {'y': 42.001, 'x': -72.0}
+    # Walk networks are bidirectional, even along one-way streets
+    assert sorted(graph.edges()) == [(1, 2), (1, 4), (2, 1), (2, 3), (3, 2), (3, 4), (4, 1), (4, 3)]
+    data = graph.get_edge_data(1, 2)[0]
+    assert data['osmid'] == 100
+    assert data['name'] == 'Main Path'
+    assert data['highway'] == 'footway'
+    assert data['oneway'] is False
+    # 0.001 degrees of latitude
+    assert data['length'] == pytest.approx(111.2, abs=0.1)
+
+    assert sorted(read_osm_graph(osm_path, retain_all=True).nodes) == [1, 2, 3, 4, 6, 7]
+    # Nodes outside the bounding box are dropped
+    assert sorted(read_osm_graph(osm_path, bbox=(42.0015, 41.999, -71.9995, -72.001)).nodes) == [1, 2]
+
+
+def test_provider(osm_path, monkeypatch):
+    monkeypatch.setattr(osm_file_graph_provider, 'extracts', {})
+    source = PlayElevationSource()
+    provider = OsmFileGraphProvider((42.0, -72.0), (42.001, -71.999), source, path=osm_path)
+    assert provider.start == 1
+    assert provider.end == 3
+    assert provider.get_coords(4)['z'] == 4.
+    assert provider.get_edge_distance(1, 2) == pytest.approx(111.2, abs=0.1)
+
+    res = AStar(provider).search(provider.start, provider.end)
+    assert res.path in ([1, 2, 3], [1, 4, 3])
+
+    # The extract is only parsed once
+    other = OsmFileGraphProvider((42.001, -72.0), (42.0, -71.999), source, path=osm_path)
+    assert other.graph.nodes[1] is provider.graph.nodes[1]
+    assert len(osm_file_graph_provider.extracts) == 1
@@ -0,0 +1,49 @@
+"""Unit tests for PriorityQueue, compared with sorting.
+"""
+import random
+import pytest
+
+from backend.search_algorithms.utils.priority_queue import PriorityQueue
+
+
+def test_pop_in_priority_order():
+    queue = PriorityQueue()
+    for key, priority in [('a', 3.), ('b', 1.), ('c', 2.)]:
+        queue[key] = priority
+
+    assert len(queue) == 3
+    assert 'a' in queue and 'd' not in queue
+    assert queue['a'] == 3.
+    assert queue.peekitem() == ('b', 1.)
+    assert [queue.popitem() for _ in range(3)] == [('b', 1.), ('c', 2.), ('a', 3.)]
+    assert 'b' not in queue
+    with pytest.raises(IndexError):
+        queue.popitem()
+
+
+def test_ties_are_first_in_first_out():
+    queue = PriorityQueue()
+    for key in range(10):
+        queue[key] = 0.
+    # Changing a priority counts as inserting the key again
+    queue[3] = 0.
+    assert [queue.popitem()[0] for _ in range(10)] == [0, 1, 2, 4, 5, 6, 7, 8, 9, 3]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_random_updates(seed):
+    rng = random.Random(seed)
+    queue = PriorityQueue()
+    expected = {}
+    for _ in range(2000):
+        if len(expected) > 0 and rng.random() < 0.3:
+            key, priority = queue.popitem()
+            assert priority == min(expected.values())
+            assert expected.pop(key) == priority
+        else:
+            # Priorities go down as well as up
+            key = rng.randrange(100)
+            expected[key] = queue[key] = rng.randrange(50)
+        assert len(queue) == len(expected)
+    popped = [queue.popitem()[1] for _ in range(len(expected))]
+    assert popped == sorted(expected.values())
@@ -0,0 +1,124 @@
+"""Unit tests for RegionCache and its reuse by BoundedGraphProvider.
+
+Downloads are replaced by a synthetic grid graph, so no network is needed.
+"""
+import networkx as nx
+import osmnx
+
+from backend.graph_providers import bounded_graph_provider
+from backend.graph_providers.bounded_graph_provider import BoundedGraphProvider
+from backend.graph_providers.utils.region_cache import RegionCache
+from backend.search_algorithms.a_star import AStar
+
+
+class PlayElevationSource:
+    """A mock elevation source counting the graphs it was asked for.
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def add_node_elevations(self, graph):
+        self.calls += 1
+        for node, data in graph.nodes(data=True):
+            data['elevation'] = float(node % 7)
+
+
+def build_grid_graph(north, south, east, west, step=0.001):
+    """Build a grid of nodes every 'step' degrees inside a bounding box."""
+    graph = nx.MultiDiGraph()
+    rows = int(round((north - south) / step)) + 1
+    cols = int(round((east - west) / step)) + 1
+    for i in range(rows):
+        for j in range(cols):
+            graph.add_node(i * 1000 + j, y=south + i * step, x=west + j * step)
+    for i in range(rows):
+        for j in range(cols):
+            for di, dj in [(1, 0), (0, 1)]:
+                if i + di < rows and j + dj < cols:
+                    u, v = i * 1000 + j, (i + di) * 1000 + j + dj
+                    graph.add_edge(u, v, length=100.)
+                    graph.add_edge(v, u, length=100.)
+    return graph
+
+
+def test_find_contained_region():
+    cache = RegionCache(capacity=2)
+    source = PlayElevationSource()
+    graph = build_grid_graph(0.01, 0., 0.01, 0.)
+    cache.add((0.01, 0., 0.01, 0.), graph, source)
+
+    region = cache.find((0.005, 0.002, 0.006, 0.001), source)
+    assert region is not None
+    subgraph = region.subgraph((0.005, 0.002, 0.006, 0.001))
+    assert len(subgraph) == 4 * 6
+    assert all(0.002 <= data['y'] <= 0.005 for _, data in subgraph.nodes(data=True))
+    assert region.subgraph(region.bbox) is graph
+
+    # Partly outside the region, or with elevations from another source
+    assert cache.find((0.015, 0.002, 0.006, 0.001), source) is None
+    assert cache.find((0.005, 0.002, 0.006, 0.001), PlayElevationSource()) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_subgraph_keeps_largest_component():
+    cache = RegionCache()
+    source = PlayElevationSource()
+    graph = build_grid_graph(0.01, 0., 0.01, 0.)
+    # Cut the rows 2 to 5 between columns 2 and 3: the region stays connected
+    # through the other rows, but the bounding box below does not
+    for i in range(2, 6):
+        u, v = i * 1000 + 2, i * 1000 + 3
+        graph.remove_edge(u, v)
+        graph.remove_edge(v, u)
+    region = cache.add((0.01, 0., 0.01, 0.), graph, source)
+    assert nx.is_weakly_connected(graph)
+
+    subgraph = region.subgraph((0.005, 0.002, 0.006, 0.001))
+    assert len(subgraph) == 4 * 4
+    assert nx.is_weakly_connected(subgraph)
+    assert all(data['x'] >= 0.003 - 1e-9 for _, data in subgraph.nodes(data=True))
+
+
+def test_lru_eviction():
+    cache = RegionCache(capacity=2)
+    source = PlayElevationSource()
+    for k in range(3):
+        bbox = (k + 0.01, k, 0.01, 0.)
+        cache.add(bbox, build_grid_graph(*bbox), source)
+        # Keep the first region in use
+        assert cache.find((0.005, 0., 0.005, 0.), source) is not None
+    assert len(cache) == 2
+    assert cache.find((0.005, 0., 0.005, 0.), source) is not None
+    assert cache.find((1.005, 1., 0.005, 0.), source) is None
+    assert cache.find((2.005, 2., 0.005, 0.), source) is not None
+
+
+def test_contained_regions_are_replaced():
+    cache = RegionCache(capacity=4)
+    source = PlayElevationSource()
+    cache.add((0.005, 0., 0.005, 0.), build_grid_graph(0.005, 0., 0.005, 0.), source)
+    cache.add((0.01, 0., 0.01, 0.), build_grid_graph(0.01, 0., 0.01, 0.), source)
+    assert len(cache) == 1
+
+
+def test_provider_reuses_region(monkeypatch):
+    downloads = []
+
+    def graph_from_bbox(north, south, east, west, **kwargs):
+        downloads.append((north, south, east, west))
+        return build_grid_graph(north, south, east, west)
+
+    monkeypatch.setattr(osmnx.graph, 'graph_from_bbox', graph_from_bbox)
+    monkeypatch.setattr(bounded_graph_provider, 'region_cache', RegionCache())
+    source = PlayElevationSource()
+
+    outer = BoundedGraphProvider((0.03, 0.03), (0.06, 0.06), source)
+    inner = BoundedGraphProvider((0.04, 0.04), (0.05, 0.05), source)
+    assert len(downloads) == 1
+    assert source.calls == 1
+    # The reused graph only covers the bounding box of the inner request
+    assert len(inner.graph) < len(outer.graph)
+    assert min(data['y'] for _, data in inner.graph.nodes(data=True)) >= 0.03 - 1e-9
+
+    res = AStar(inner).search(inner.start, inner.end)
+    assert res.path_len == 2000.
@@ -0,0 +1,89 @@
+"""Unit tests for graph snapshots, saved and loaded through ArrayGraphProvider.
+"""
+import networkx as nx
+import numpy as np
+import pytest
+
+from test_array_graph_provider import build_example_graph
+from backend.graph_providers.array_graph_provider import ArrayGraphProvider
+from backend.graph_providers.utils import snapshot
+from backend.graph_providers.utils.snapshot import read_snapshot, HEADER_SIZE
+from backend.search_algorithms.dijkstra import Dijkstra
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / 'graph.snapshot')
+    ArrayGraphProvider.from_graph(build_example_graph()).save_snapshot(path)
+    return path
+
+
+def test_round_trip(snapshot_path):
+    provider = ArrayGraphProvider.from_graph(build_example_graph())
+    loaded = ArrayGraphProvider.from_snapshot(snapshot_path, start=1, end=5)
+    assert loaded.start == 1
+    assert loaded.end == 5
+    for name in ['node_ids', 'offsets', 'targets', 'lengths', 'x', 'y', 'z', 'gains', 'losses']:
+        assert np.array_equal(getattr(loaded, name), getattr(provider, name), equal_nan=True)
+    # The arrays are read-only views of the mapped file, not copies
+    for name in ['lengths', 'gains', 'losses']:
+        assert isinstance(getattr(loaded, name).base, np.memmap)
+        assert not getattr(loaded, name).flags.writeable
+
+    # Node ids are looked up in the mapped file as well
+    assert not isinstance(loaded._index, dict)
+    assert list(loaded.get_all_nodes()) == list(provider.get_all_nodes())
+    assert all(loaded._index[node] == i for node, i in provider._index.items())
+    assert 42 not in loaded.get_all_nodes()
+    with pytest.raises(KeyError):
+        loaded.get_neighbors(42)
+
+    assert loaded.find_nodes_near([(-2.1, 2.1), (-5., 5.)]) == [2, 5]
+    res = Dijkstra(loaded).search(1, 5)
+    expected = Dijkstra(provider).search(1, 5)
+    assert (res.path, res.path_len, res.ele_gain) == (expected.path, expected.path_len, expected.ele_gain)
+
+
+def test_unsorted_node_ids(tmp_path):
+    path = str(tmp_path / 'graph.snapshot')
+    graph = nx.relabel_nodes(build_example_graph(), {1: 50, 2: 10, 3: 40, 4: 20, 5: 30})
+    provider = ArrayGraphProvider.from_graph(graph)
+    provider.save_snapshot(path)
+    loaded = ArrayGraphProvider.from_snapshot(path)
+
+    assert list(loaded.get_all_nodes()) == [50, 10, 40, 20, 30]
+    assert all(loaded._index[node] == i for node, i in provider._index.items())
+    assert loaded.get_coords(20) == provider.get_coords(20)
+    for missing in [0, 15, 60]:
+        assert missing not in loaded.get_all_nodes()
+    res = Dijkstra(loaded).search(50, 30)
+    expected = Dijkstra(provider).search(50, 30)
+    assert (res.path, res.path_len, res.ele_gain) == (expected.path, expected.path_len, expected.ele_gain)
+
+
+def test_rejects_corrupted_snapshot(snapshot_path):
+    with open(snapshot_path, 'r+b') as f:
+        f.seek(HEADER_SIZE + 3)
+        byte = f.read(1)
+        f.seek(HEADER_SIZE + 3)
+        f.write(bytes([byte[0] ^ 0xff]))
+    with pytest.raises(ValueError, match='checksum'):
+        read_snapshot(snapshot_path)
+    # Verification can be skipped for a faster start
+    read_snapshot(snapshot_path, verify=False)
+
+
+def test_rejects_other_files(snapshot_path, tmp_path, monkeypatch):
+    path = tmp_path / 'not_a_snapshot'
+    path.write_bytes(b'\0' * 100)
+    with pytest.raises(ValueError, match='not a graph snapshot'):
+        read_snapshot(str(path))
+
+    with open(snapshot_path, 'ab') as f:
+        f.write(b'\0')
+    with pytest.raises(ValueError, match='bytes'):
+        read_snapshot(snapshot_path)
+
+    monkeypatch.setattr(snapshot, 'FORMAT_VERSION', snapshot.FORMAT_VERSION + 1)
+    with pytest.raises(ValueError, match='version'):
+        read_snapshot(snapshot_path)
@@ -0,0 +1,60 @@
+"""Unit tests for GridSpatialIndex, checked against a brute-force scan.
+"""
+import math
+import random
+import pytest
+
+from backend.graph_providers.utils.spatial_index import GridSpatialIndex
+
+
+def brute_force_nearest(nodes, point):
+    lat, lng = point
+    return min(nodes, key=lambda node: math.hypot(node[1] - lng, node[2] - lat))[0]
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(520)
+    nodes = [(i, rng.uniform(-72.55, -72.45), rng.uniform(42.35, 42.42)) for i in range(500)]
+    index = GridSpatialIndex(0.01)
+    index.insert(nodes)
+    assert len(index) == 500
+
+    # Points inside, at the edge of and far away from the indexed area
+    points = [(rng.uniform(42.3, 42.5), rng.uniform(-72.6, -72.4)) for _ in range(200)]
+    points += [(0., 0.), (42.42, -72.45)]
+    expected = [brute_force_nearest(nodes, point) for point in points]
+    assert index.nearest_many(points) == expected
+    assert index.nearest(points[0]) == expected[0]
+
+
+def test_incremental_inserts():
+    index = GridSpatialIndex(0.01)
+    index.insert([(1, -72.505, 42.385)])
+    assert index.nearest((42.395, -72.495)) == 1
+
+    # A node inserted later, in a new cell, becomes the nearest
+    index.insert([(2, -72.495, 42.395), (1, -72.505, 42.385)])
+    assert len(index) == 2
+    assert 2 in index
+    assert index.nearest((42.395, -72.495)) == 2
+    assert index.nearest_many([(42.385, -72.505), (42.396, -72.494)]) == [1, 2]
+
+
+def test_empty_index():
+    with pytest.raises(ValueError):
+        GridSpatialIndex().nearest((42., -72.))
+
+
+def test_remove():
+    index = GridSpatialIndex(0.01)
+    index.insert([(1, -72.505, 42.385), (2, -72.504, 42.386), (3, -72.495, 42.395)])
+    assert index.cell_of(1) == (-7251, 4238)
+    assert sorted(index.nodes_in_cell((-7251, 4238))) == [1, 2]
+
+    index.remove([1, 3, 4])
+    assert len(index) == 1
+    assert 1 not in index
+    assert index.cell_of(3) is None
+    assert index.nodes_in_cell((-7251, 4238)) == [2]
+    assert index.nodes_in_cell((-7250, 4239)) == []
+    assert index.nearest((42.395, -72.495)) == 2